@@ -0,0 +1,65 @@
+import multiprocessing
+import resource
+import time
+
+
+def measurePrediction(seriesLength, chunkSize, resultQueue):
+    """
+    Predicts on a series of the given length and measures the increase in the
+    peak memory (resident set size) of the process caused by the prediction.
+    This is run in a separate process for each measurement so that the peak
+    memory of one measurement does not hide the peak of another
+
+    :param seriesLength: length of the series
+    :param chunkSize: chunk size of the prediction, if None then the prediction
+    is done on the whole series at once
+    :param resultQueue: queue in which the increase in the peak memory in MiB
+    and the time taken in seconds are put
+    """
+
+    import numpy as np
+    from ts.model import DeepNN
+
+    model = DeepNN(lag=24)
+    targetSeries = np.random.rand(seriesLength, 1)
+
+    # Warm up on a short series, so that one-time allocations are not measured
+    model.predict(targetSeries[:1000], chunkSize=chunkSize)
+
+    peakMemoryBefore = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    startTime = time.time()
+    model.predict(targetSeries, chunkSize=chunkSize)
+    timeTaken = time.time() - startTime
+
+    peakMemoryAfter = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    resultQueue.put(((peakMemoryAfter - peakMemoryBefore) / 1024, timeTaken))
+
+
+def main():
+
+    seriesLengthList = [100000, 1000000, 4000000]
+    chunkSizeList = [None, 100000]
+
+    context = multiprocessing.get_context('spawn')
+
+    for seriesLength in seriesLengthList:
+        for chunkSize in chunkSizeList:
+            resultQueue = context.Queue()
+            process = context.Process(
+                target=measurePrediction,
+                args=(seriesLength, chunkSize, resultQueue)
+            )
+            process.start()
+            peakMemoryIncrease, timeTaken = resultQueue.get()
+            process.join()
+
+            print('DeepNN'
+                  + f' | series length: {seriesLength}'
+                  + f' | chunk size: {chunkSize}'
+                  + f' | peak memory increase: {peakMemoryIncrease : .1f} MiB'
+                  + f' | time taken: {timeTaken : .2f} sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import time
+import numpy as np
+from ts.model import DeepNN
+
+
+def main():
+
+    numUpdates = 2000
+
+    for numTargetVariables, numExoVariables, lag in [(1, 0, 24), (2, 3, 24)]:
+        model = DeepNN(
+            lag=lag,
+            numTargetVariables=numTargetVariables,
+            numExoVariables=numExoVariables
+        )
+
+        targetSeries = np.random.rand(lag + numUpdates, numTargetVariables)
+        exogenousSeries = np.random.rand(lag + numUpdates, numExoVariables) \
+            if numExoVariables > 0 else None
+
+        def exoHistory(endTime):
+            return None if exogenousSeries is None else exogenousSeries[endTime - lag - 1: endTime]
+
+        # Rebuilding the inputs from the raw history and calling predict
+        model.predict(targetSeries[:lag + 1], exoHistory(lag + 1))
+        startTime = time.time()
+        for endTime in range(lag + 1, lag + 201):
+            model.predict(targetSeries[endTime - lag - 1: endTime], exoHistory(endTime))
+        predictLatency = (time.time() - startTime) / 200
+
+        forecaster = model.getOnlineForecaster(
+            targetSeries[:lag],
+            None if exogenousSeries is None else exogenousSeries[:lag]
+        )
+        forecaster.update(
+            targetSeries[lag],
+            None if exogenousSeries is None else exogenousSeries[lag]
+        )
+        startTime = time.time()
+        for t in range(lag, lag + numUpdates):
+            forecaster.update(
+                targetSeries[t],
+                None if exogenousSeries is None else exogenousSeries[t]
+            )
+        onlineLatency = (time.time() - startTime) / numUpdates
+
+        print('DeepNN'
+              + f' | target variables: {numTargetVariables}'
+              + f' | exogenous variables: {numExoVariables}'
+              + f' | predict latency: {predictLatency * 1000 : .3f} ms'
+              + f' | online update latency: {onlineLatency * 1000 : .3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import time
+import tensorflow as tf
+from ts.data.generate.univariate.nonexo import StandardGenerator
+from ts.model import ExtremeTime2
+
+
+def timeBatchTraining(model, targetSeriesList, sequenceLength):
+    """
+    Trains the model on all the series together for a single iteration and
+    measures the throughput
+
+    :param model: ExtremeTime2 model
+    :param targetSeriesList: list of target series to train on
+    :param sequenceLength: length of each training sequence
+    :return: timesteps trained on per second, summed over all the series
+    """
+
+    numTimesteps = sum(
+        targetSeries.shape[0] - model.forecastHorizon - model.windowSize
+        for targetSeries in targetSeriesList
+    )
+
+    startTime = time.time()
+    model.trainBatch(
+        targetSeriesList,
+        sequenceLength,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False
+    )
+
+    return numTimesteps / (time.time() - startTime)
+
+
+def main():
+
+    n = 1000
+    sequenceLength = 100
+    numStreamsList = [1, 8, 32, 128]
+
+    generator = StandardGenerator('extreme_short')
+    targetSeriesList = [generator.generate(n) for _ in range(max(numStreamsList))]
+
+    model = ExtremeTime2()
+
+    # Warm up, so that the tracing cost is not measured
+    timeBatchTraining(model, [targetSeriesList[0][:500]], sequenceLength)
+
+    for numStreams in numStreamsList:
+        throughput = timeBatchTraining(model, targetSeriesList[:numStreams], sequenceLength)
+        print(f'{ExtremeTime2.__name__}'
+              + f' | streams: {numStreams}'
+              + f' | timesteps per sec: {throughput : .2f}')
+
+
+if __name__ == '__main__':
+    main()
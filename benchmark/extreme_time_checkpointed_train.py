@@ -0,0 +1,80 @@
+import multiprocessing
+import resource
+import time
+
+
+def measureTraining(sequenceLength, checkpointLength, resultQueue):
+    """
+    Trains a model on a single sequence of the given length and measures the
+    increase in the peak memory (resident set size) of the process caused by
+    training. This is run in a separate process for each measurement so that
+    the peak memory of one measurement does not hide the peak of another
+
+    :param sequenceLength: length of the training sequence
+    :param checkpointLength: chunk length of gradient checkpointing, if None
+    then gradient checkpointing is not used
+    :param resultQueue: queue in which the increase in the peak memory in MiB
+    and the time taken in seconds are put
+    """
+
+    import tensorflow as tf
+    from ts.data.generate.univariate.nonexo import StandardGenerator
+    from ts.model import ExtremeTime
+
+    model = ExtremeTime()
+    targetSeries = StandardGenerator('extreme_short').generate(
+        model.windowSize + sequenceLength + 2
+    )
+
+    # Warm up on a short series, so that one-time allocations are not measured
+    model.train(
+        targetSeries[:model.windowSize + 10], 10,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False,
+        checkpointLength=checkpointLength
+    )
+
+    peakMemoryBefore = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    startTime = time.time()
+    model.train(
+        targetSeries, sequenceLength,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False,
+        checkpointLength=checkpointLength
+    )
+    timeTaken = time.time() - startTime
+
+    peakMemoryAfter = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    resultQueue.put(((peakMemoryAfter - peakMemoryBefore) / 1024, timeTaken))
+
+
+def main():
+
+    sequenceLengthList = [250, 1000, 4000]
+    checkpointLengthList = [None, 50]
+
+    context = multiprocessing.get_context('spawn')
+
+    for sequenceLength in sequenceLengthList:
+        for checkpointLength in checkpointLengthList:
+            resultQueue = context.Queue()
+            process = context.Process(
+                target=measureTraining,
+                args=(sequenceLength, checkpointLength, resultQueue)
+            )
+            process.start()
+            peakMemoryIncrease, timeTaken = resultQueue.get()
+            process.join()
+
+            print('ExtremeTime'
+                  + f' | sequence length: {sequenceLength}'
+                  + f' | checkpoint length: {checkpointLength}'
+                  + f' | peak memory increase: {peakMemoryIncrease : .1f} MiB'
+                  + f' | time taken: {timeTaken : .2f} sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+import numpy as np
+import tensorflow as tf
+from ts.data.generate.univariate.nonexo import StandardGenerator
+from ts.utility import Utility
+from ts.model import ExtremeTime, ExtremeTime2
+
+
+def main():
+
+    n = 3000
+    trainN = 2500
+    memorySize = 1000
+    numPrototypesList = [None, 200, 50, 10]
+
+    targetSeries = StandardGenerator('extreme_short').generate(n)
+    trainSeries, testSeries = Utility.trainTestSplit(targetSeries, trainN)
+
+    # the forecasted timesteps (forecast horizon 1) on which extreme events occur
+    testTargets = testSeries[1:]
+    isExtreme = np.abs(testTargets - np.mean(testTargets)) \
+        > np.percentile(np.abs(testTargets - np.mean(testTargets)), 95)
+
+    modelSavePath = os.path.join(tempfile.mkdtemp(), 'model')
+
+    for modelClass in [ExtremeTime, ExtremeTime2]:
+        model = modelClass(memorySize=memorySize, windowSize=20)
+        model.train(
+            trainSeries,
+            sequenceLength=250,
+            optimizer=tf.optimizers.Adam(),
+            verboseLevel=0,
+            returnLosses=False,
+            compiled=True
+        )
+        model.save(modelSavePath)
+
+        for numPrototypes in numPrototypesList:
+            model = modelClass.load(modelSavePath)
+
+            if numPrototypes is not None:
+                model.compactMemory(numPrototypes)
+                model.save(modelSavePath + '-compact')
+                modelSize = os.path.getsize(modelSavePath + '-compact')
+            else:
+                modelSize = os.path.getsize(modelSavePath)
+
+            startTime = time.time()
+            loss, pred = model.evaluate(testSeries, returnPred=True)
+            latency = 1000. * (time.time() - startTime) / testSeries.shape[0]
+
+            extremeLoss = np.mean(np.square(pred[isExtreme] - testTargets[isExtreme]))
+
+            print(f'{modelClass.__name__}'
+                  + f' | prototypes: {numPrototypes}'
+                  + f' | memory size: {model.memory.shape[0]}'
+                  + f' | model size: {modelSize / 1024 : .1f} KiB'
+                  + f' | latency: {latency : .3f} ms'
+                  + f' | test loss: {loss : .5f}'
+                  + f' | extreme event loss: {extremeLoss : .5f}')
+
+
+if __name__ == '__main__':
+    main()
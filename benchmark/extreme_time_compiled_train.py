@@ -0,0 +1,54 @@
+import time
+import tensorflow as tf
+from ts.data.generate.univariate.nonexo import StandardGenerator
+from ts.model import ExtremeTime, ExtremeTime2
+
+
+def timeTraining(model, targetSeries, sequenceLength, compiled):
+    """
+    Trains the model for a single iteration and measures the throughput
+
+    :param model: ExtremeTime or ExtremeTime2 model
+    :param targetSeries: target series to train on
+    :param sequenceLength: length of each training sequence
+    :param compiled: whether to use the compiled training path
+    :return: timesteps trained on per second
+    """
+
+    numTimesteps = targetSeries.shape[0] - model.forecastHorizon - model.windowSize
+
+    startTime = time.time()
+    model.train(
+        targetSeries,
+        sequenceLength,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False,
+        compiled=compiled
+    )
+
+    return numTimesteps / (time.time() - startTime)
+
+
+def main():
+
+    n = 1000
+    sequenceLength = 100
+    targetSeries = StandardGenerator('extreme_short').generate(n)
+
+    for modelClass in [ExtremeTime, ExtremeTime2]:
+        for compiled in [False, True]:
+            model = modelClass()
+
+            if compiled:
+                # Warm up, so that the tracing cost is not measured
+                timeTraining(model, targetSeries[:500], sequenceLength, compiled)
+
+            throughput = timeTraining(model, targetSeries, sequenceLength, compiled)
+            print(f'{modelClass.__name__}'
+                  + f' | compiled: {compiled}'
+                  + f' | timesteps per sec: {throughput : .2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import time
+import numpy as np
+import tensorflow as tf
+from ts.data.generate.univariate.nonexo import StandardGenerator
+from ts.utility import Utility
+from ts.model import ExtremeTime, ExtremeTime2
+
+
+def timePrediction(model, memorySize, numSteps=500):
+    """
+    Measures the latency of a single graph compiled prediction step of
+    the model on a randomly filled memory of the given size
+
+    :param model: ExtremeTime or ExtremeTime2 model built with the given memory size
+    :param memorySize: number of memory slots
+    :param numSteps: number of prediction steps to average the latency over
+    :return: mean latency per prediction step in milliseconds
+    """
+
+    if isinstance(model, ExtremeTime):
+        memory = tf.random.normal((memorySize, model.encoderStateSize), dtype=tf.float64)
+        memoryOutputs = tf.random.normal((memorySize,), dtype=tf.float64)
+        stateSize = model.lstmStateSize
+    else:
+        memory = tf.random.normal((memorySize, model.embeddingSize), dtype=tf.float64)
+        memoryOutputs = tf.random.normal((memorySize, model.contextSize), dtype=tf.float64)
+        stateSize = model.embeddingSize
+
+    predictionStep = tf.function(
+        lambda state: model.computePrediction(state, memory, memoryOutputs)
+    )
+
+    state = tf.random.normal((1, stateSize), dtype=tf.float64)
+    predictionStep(state)
+
+    startTime = time.time()
+    for _ in range(numSteps):
+        predictionStep(state)
+
+    return 1000. * (time.time() - startTime) / numSteps
+
+
+def main():
+
+    n = 3000
+    trainN = 2500
+    memorySize = 1000
+    attentionTopKList = [None, 200, 50, 10]
+
+    targetSeries = StandardGenerator('extreme_short').generate(n)
+    trainSeries, testSeries = Utility.trainTestSplit(targetSeries, trainN)
+
+    print('Accuracy of top k attention on a trained model')
+    for modelClass in [ExtremeTime, ExtremeTime2]:
+        model = modelClass(memorySize=memorySize, windowSize=20)
+        model.train(
+            trainSeries,
+            sequenceLength=250,
+            optimizer=tf.optimizers.Adam(),
+            verboseLevel=0,
+            returnLosses=False,
+            compiled=True
+        )
+
+        stateSnapshot = model.snapshotState()
+        _, densePred = model.evaluate(testSeries, returnPred=True)
+
+        for attentionTopK in attentionTopKList:
+            model.attentionTopK = attentionTopK
+
+            model.restoreState(stateSnapshot)
+            loss, pred = model.evaluate(testSeries, returnPred=True)
+
+            print(f'{modelClass.__name__}'
+                  + f' | memory size: {memorySize}'
+                  + f' | top k: {attentionTopK}'
+                  + f' | test loss: {loss : .5f}'
+                  + f' | max deviation from dense: {np.max(np.abs(pred - densePred)) : .5f}')
+
+    print('Latency of a compiled prediction step')
+    for modelClass in [ExtremeTime, ExtremeTime2]:
+        for largeMemorySize in [1000, 10000, 50000]:
+            model = modelClass(memorySize=largeMemorySize)
+
+            for attentionTopK in attentionTopKList:
+                model.attentionTopK = attentionTopK
+                latency = timePrediction(model, largeMemorySize)
+
+                print(f'{modelClass.__name__}'
+                      + f' | memory size: {largeMemorySize}'
+                      + f' | top k: {attentionTopK}'
+                      + f' | latency: {latency : .3f} ms')
+
+
+if __name__ == '__main__':
+    main()
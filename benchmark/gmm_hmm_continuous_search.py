@@ -0,0 +1,39 @@
+import time
+import numpy as np
+from ts.model import GmmHmmForecast
+
+
+def main():
+
+    dim = 3
+    xTrain = np.random.uniform(-1, 1, size=(1000, dim))
+    xTest = np.random.uniform(-1, 1, size=(30, dim))
+
+    model = GmmHmmForecast(4, 3, dim, d=10, numIterations=10)
+    model.train([xTrain])
+
+    startTime = time.time()
+    _, continuousLikelihoods = model.predict(
+        xTest, None, returnMaxLikelihood=True, searchMode='continuous'
+    )
+    continuousTime = time.time() - startTime
+
+    print(f'GmmHmmForecast | continuous | time: {continuousTime : .2f} sec')
+
+    for numValues in [10, 20, 40, 80]:
+        discParamSet = [np.linspace(-1.5, 1.5, numValues) for _ in range(dim)]
+
+        startTime = time.time()
+        _, gridLikelihoods = model.predict(xTest, discParamSet, returnMaxLikelihood=True)
+        gridTime = time.time() - startTime
+
+        gap = np.array(continuousLikelihoods) - np.array(gridLikelihoods)
+        print('GmmHmmForecast'
+              + f' | grid: {numValues} values per dimension'
+              + f' | time: {gridTime : .2f} sec'
+              + ' | continuous log likelihood minus grid log likelihood:'
+              + f' mean {gap.mean() : .4f}, min {gap.min() : .4f}')
+
+
+if __name__ == '__main__':
+    main()
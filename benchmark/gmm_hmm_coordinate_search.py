@@ -0,0 +1,71 @@
+import time
+import numpy as np
+from ts.model import GmmHmmForecast
+
+
+def timePrediction(model, X, discParamSet, **searchKwargs):
+    """
+    Predicts on the observation sequence and measures the time taken
+
+    :param model: trained GmmHmmForecast model
+    :param X: observation sequence
+    :param discParamSet: discrete set of values of each component
+    :param searchKwargs: arguments which select the search mode of predict
+    :return: predictions, their log likelihoods and the time taken in seconds
+    """
+
+    startTime = time.time()
+    pred, maxLikelihoodValues = model.predict(
+        X, discParamSet, returnMaxLikelihood=True, **searchKwargs
+    )
+
+    return pred, np.array(maxLikelihoodValues), time.time() - startTime
+
+
+def main():
+
+    dim = 4
+    xTrain = np.random.uniform(-1, 1, size=(1000, dim))
+
+    model = GmmHmmForecast(4, 3, dim, d=10, numIterations=10)
+    model.train([xTrain])
+
+    coordinateKwargs = {'searchMode': 'coordinate', 'searchBudget': 2000, 'numRestarts': 5}
+
+    # Likelihood gap against the exhaustive search on small cases
+    for numValues in [5, 10, 20]:
+        discParamSet = [np.linspace(-1, 1, numValues) for _ in range(dim)]
+        xTest = np.random.uniform(-1, 1, size=(model.d + 20, dim))
+
+        exhaustivePred, exhaustiveLikelihoods, exhaustiveTime = \
+            timePrediction(model, xTest, discParamSet)
+        coordinatePred, coordinateLikelihoods, coordinateTime = \
+            timePrediction(model, xTest, discParamSet, **coordinateKwargs)
+
+        gap = exhaustiveLikelihoods - coordinateLikelihoods
+        samePrediction = np.mean(np.all(exhaustivePred == coordinatePred, axis=1))
+        print('GmmHmmForecast'
+              + f' | candidates: {numValues ** dim}'
+              + f' | exhaustive: {exhaustiveTime : .2f} sec'
+              + f' | coordinate: {coordinateTime : .2f} sec'
+              + f' | same prediction: {samePrediction : .0%}'
+              + f' | mean gap: {gap.mean() : .4f}'
+              + f' | max gap: {gap.max() : .4f}')
+
+    # A large case, on which the exhaustive search is timed on a single timestep
+    discParamSet = [np.linspace(-1, 1, 50) for _ in range(dim)]
+    xTest = np.random.uniform(-1, 1, size=(model.d + 1, dim))
+
+    _, exhaustiveLikelihoods, exhaustiveTime = timePrediction(model, xTest, discParamSet)
+    _, coordinateLikelihoods, coordinateTime = \
+        timePrediction(model, xTest, discParamSet, **coordinateKwargs)
+
+    print('GmmHmmForecast'
+          + f' | candidates: {50 ** dim}'
+          + f' | exhaustive: {exhaustiveTime : .2f} sec'
+          + f' | coordinate: {coordinateTime : .3f} sec'
+          + f' | gap: {exhaustiveLikelihoods[0] - coordinateLikelihoods[0] : .4f}')
+
+
+if __name__ == '__main__':
+    main()
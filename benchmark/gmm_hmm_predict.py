@@ -0,0 +1,58 @@
+import itertools
+import time
+import numpy as np
+from ts.model import GmmHmmForecast
+
+
+def rescoringPredict(model, X, discParamSet):
+    """
+    Predicts by scoring the whole conditioning window followed by every
+    candidate observation, as done before candidates were scored in a batch
+
+    :param model: trained GmmHmmForecast model
+    :param X: observation sequence of shape (n, dimension)
+    :param discParamSet: discrete set of values of each component
+    :return: predictions of shape (n - d, dimension)
+    """
+
+    pred = []
+    for t in range(model.d, X.shape[0]):
+        chosenObs, maxLikelihood = None, None
+        for candidate in itertools.product(*discParamSet):
+            likelihood = model.model.score(np.concatenate([X[t - model.d: t], [candidate]]))
+            if maxLikelihood is None or likelihood > maxLikelihood:
+                chosenObs, maxLikelihood = candidate, likelihood
+        pred.append(chosenObs)
+
+    return np.array(pred)
+
+
+def main():
+
+    dim = 2
+    xTrain = np.random.uniform(-1, 1, size=(500, dim))
+    xTest = np.random.uniform(-1, 1, size=(30, dim))
+
+    model = GmmHmmForecast(4, 3, dim, d=10, numIterations=5)
+    model.train([xTrain])
+
+    for numValues in [5, 10, 20]:
+        discParamSet = [np.linspace(-1, 1, numValues) for _ in range(dim)]
+
+        startTime = time.time()
+        rescoringPred = rescoringPredict(model, xTest, discParamSet)
+        rescoringTime = time.time() - startTime
+
+        startTime = time.time()
+        pred = model.predict(xTest, discParamSet)
+        predictTime = time.time() - startTime
+
+        print('GmmHmmForecast'
+              + f' | candidates per timestep: {numValues ** dim}'
+              + f' | rescoring windows: {rescoringTime : .2f} sec'
+              + f' | batched candidates: {predictTime : .3f} sec'
+              + f' | same predictions: {np.array_equal(rescoringPred, pred)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import time
+import numpy as np
+from ts.model import GmmHmmForecast
+
+
+def main():
+
+    dim = 2
+    numPredictions = 100
+    discParamSet = [np.linspace(-1, 1, 5) for _ in range(dim)]
+    xTrain = np.random.uniform(-1, 1, size=(500, dim))
+
+    for latency in [10, 100, 1000]:
+        model = GmmHmmForecast(4, 3, dim, d=latency, numIterations=5)
+        model.train([xTrain])
+
+        xTest = np.random.uniform(-1, 1, size=(latency + numPredictions, dim))
+
+        for slidingWindow in [False, True]:
+            startTime = time.time()
+            model.predict(xTest, discParamSet, slidingWindow=slidingWindow)
+            timeTaken = time.time() - startTime
+
+            print('GmmHmmForecast'
+                  + f' | d: {latency}'
+                  + f' | sliding window: {slidingWindow}'
+                  + f' | time per timestep: {timeTaken / numPredictions * 1000 : .2f} ms')
+
+
+if __name__ == '__main__':
+    main()
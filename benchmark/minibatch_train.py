@@ -0,0 +1,52 @@
+import time
+import numpy as np
+import tensorflow as tf
+from ts.model import DeepNN, GruForecast
+
+
+def timeTraining(model, trainSequences, **trainKwargs):
+    """
+    Trains the model for a single iteration and measures the time taken
+
+    :param model: DeepNN or RnnForecast model
+    :param trainSequences: training sequences
+    :param trainKwargs: arguments which select the input mode of train
+    :return: time taken in seconds
+    """
+
+    startTime = time.time()
+    model.train(
+        trainSequences,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False,
+        **trainKwargs
+    )
+
+    return time.time() - startTime
+
+
+def main():
+
+    # a single huge sequence along with many tiny ones
+    trainSequences = [np.random.rand(50000, 1)] \
+        + [np.random.rand(40, 1) for _ in range(1000)]
+
+    for modelClass, batchedKwargs in [
+        (DeepNN, {'batchSize': 256}),
+        (GruForecast, {'batchSize': 64, 'windowLength': 32})
+    ]:
+        for trainKwargs in [{}, batchedKwargs]:
+            model = modelClass(lag=24) if modelClass is DeepNN else modelClass()
+
+            # Warm up, so that the tracing cost is not measured
+            timeTraining(model, trainSequences[:5], **trainKwargs)
+
+            timeTaken = timeTraining(model, trainSequences, **trainKwargs)
+            print(f'{modelClass.__name__}'
+                  + f' | input mode: {trainKwargs if trainKwargs else "sequence per batch"}'
+                  + f' | epoch time: {timeTaken : .2f} sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import time
+import numpy as np
+from ts.model import GruForecast, LstmForecast
+
+
+def main():
+
+    targetSeriesList = [
+        np.random.rand(length, 1)
+        for length in np.random.randint(200, 1000, size=(500,))
+    ]
+
+    for modelClass in [GruForecast, LstmForecast]:
+        model = modelClass(stateSize=32, numRnnLayers=2)
+
+        # Warm up, so that the tracing cost is not measured
+        model.predict(targetSeriesList[0])
+        model.predictBatch(targetSeriesList[:2])
+
+        startTime = time.time()
+        for targetSeries in targetSeriesList:
+            model.predict(targetSeries)
+        predictTime = time.time() - startTime
+
+        for batchSize in [64, 256]:
+            startTime = time.time()
+            model.predictBatch(targetSeriesList, batchSize=batchSize)
+            batchTime = time.time() - startTime
+
+            print(f'{modelClass.__name__}'
+                  + f' | number of series: {len(targetSeriesList)}'
+                  + f' | predict per series: {predictTime : .2f} sec'
+                  + f' | predictBatch (batch size {batchSize}): {batchTime : .2f} sec')
+
+
+if __name__ == '__main__':
+    main()
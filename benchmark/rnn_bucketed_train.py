@@ -0,0 +1,53 @@
+import time
+import numpy as np
+import tensorflow as tf
+from ts.data.generate.univariate.nonexo import StandardGenerator
+from ts.model import GruForecast, LstmForecast
+
+
+def timeTraining(model, trainSequences, batchSize):
+    """
+    Trains the model for a single iteration and measures the time taken
+
+    :param model: RnnForecast model
+    :param trainSequences: training sequences
+    :param batchSize: If None, then each training sequence is a batch, else
+    the number of sequences in each padded mini batch
+    :return: time taken in seconds
+    """
+
+    startTime = time.time()
+    model.train(
+        trainSequences,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False,
+        batchSize=batchSize
+    )
+
+    return time.time() - startTime
+
+
+def main():
+
+    generator = StandardGenerator('extreme_short')
+    trainSequences = [
+        np.expand_dims(generator.generate(length), axis=1)
+        for length in np.random.randint(100, 300, size=(400,))
+    ]
+
+    for modelClass in [GruForecast, LstmForecast]:
+        for batchSize in [None, 16, 64]:
+            model = modelClass(stateSize=32)
+
+            # Warm up, so that the tracing cost is not measured
+            timeTraining(model, trainSequences[:10], batchSize)
+
+            timeTaken = timeTraining(model, trainSequences, batchSize)
+            print(f'{modelClass.__name__}'
+                  + f' | batch size: {batchSize}'
+                  + f' | sequences per second: {len(trainSequences) / timeTaken : .1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import time
+import numpy as np
+from ts.model import GruForecast, LstmForecast
+
+
+def naiveRollout(model, targetSeries, steps):
+    """
+    Forecasts the next steps timesteps by repeatedly predicting on the whole
+    history extended by the forecasts, as done without rollout
+
+    :param model: RnnForecast model with forecast horizon 1
+    :param targetSeries: history of the target variables
+    :param steps: number of future timesteps to be forecast
+    :return: forecasts of shape (steps, numTargetVariables)
+    """
+
+    for step in range(steps):
+        pred = np.reshape(model.predict(targetSeries), targetSeries.shape)
+        targetSeries = np.concatenate([targetSeries, pred[-1:]])
+
+    return targetSeries[-steps:]
+
+
+def main():
+
+    steps = 30
+
+    for modelClass in [GruForecast, LstmForecast]:
+        for historyLength in [500, 5000]:
+            model = modelClass(numRnnLayers=2)
+            targetSeries = np.random.rand(historyLength, 1)
+
+            # Warm up, so that the tracing cost is not measured
+            naiveRollout(model, targetSeries[:10], 2)
+            model.rollout(targetSeries[:10], 2)
+
+            startTime = time.time()
+            naivePred = naiveRollout(model, targetSeries, steps)
+            naiveTime = time.time() - startTime
+
+            startTime = time.time()
+            rolloutPred = model.rollout(targetSeries, steps)
+            rolloutTime = time.time() - startTime
+
+            print(f'{modelClass.__name__}'
+                  + f' | history length: {historyLength}'
+                  + f' | steps: {steps}'
+                  + f' | repeated predict: {naiveTime : .2f} sec'
+                  + f' | rollout: {rolloutTime : .3f} sec'
+                  + f' | max difference: {np.max(np.abs(naivePred - rolloutPred)) : .1e}')
+
+
+if __name__ == '__main__':
+    main()
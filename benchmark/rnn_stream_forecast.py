@@ -0,0 +1,35 @@
+import time
+import numpy as np
+from ts.model import GruForecast, LstmForecast
+
+
+def main():
+
+    numSteps = 200
+
+    for modelClass in [GruForecast, LstmForecast]:
+        for historyLength in [1000, 10000]:
+            model = modelClass(numRnnLayers=2)
+            targetSeries = np.random.rand(historyLength + numSteps, 1)
+
+            # Predicting on the whole history on every tick
+            model.predict(targetSeries[:historyLength])
+            startTime = time.time()
+            for endTime in range(historyLength, historyLength + 20):
+                model.predict(targetSeries[:endTime + 1])
+            predictLatency = (time.time() - startTime) / 20
+
+            forecaster = model.getStreamForecaster(targetSeries[:historyLength])
+            startTime = time.time()
+            for t in range(historyLength, historyLength + numSteps):
+                forecaster.step(targetSeries[t])
+            streamLatency = (time.time() - startTime) / numSteps
+
+            print(f'{modelClass.__name__}'
+                  + f' | history length: {historyLength}'
+                  + f' | predict latency: {predictLatency * 1000 : .2f} ms'
+                  + f' | stream step latency: {streamLatency * 1000 : .2f} ms')
+
+
+if __name__ == '__main__':
+    main()
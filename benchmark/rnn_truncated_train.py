@@ -0,0 +1,82 @@
+import multiprocessing
+import resource
+import time
+
+
+def measureTraining(sequenceLength, bpttLength, resultQueue):
+    """
+    Trains a model on a single sequence of the given length and measures the
+    increase in the peak memory (resident set size) of the process caused by
+    training. This is run in a separate process for each measurement so that
+    the peak memory of one measurement does not hide the peak of another
+
+    :param sequenceLength: length of the training sequence
+    :param bpttLength: chunk length of truncated backpropagation through time,
+    if None then the model is trained on the whole sequence at once
+    :param resultQueue: queue in which the increase in the peak memory in MiB
+    and the time taken in seconds are put
+    """
+
+    import numpy as np
+    import tensorflow as tf
+    from ts.data.generate.univariate.nonexo import StandardGenerator
+    from ts.model import LstmForecast
+
+    model = LstmForecast(stateSize=64)
+    targetSeries = np.expand_dims(
+        StandardGenerator('extreme_short').generate(sequenceLength + 1),
+        axis=1
+    )
+
+    # Warm up on a short series, so that one-time allocations are not measured
+    model.train(
+        [targetSeries[:100]],
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False,
+        bpttLength=bpttLength
+    )
+
+    peakMemoryBefore = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    startTime = time.time()
+    model.train(
+        [targetSeries],
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        returnLosses=False,
+        bpttLength=bpttLength
+    )
+    timeTaken = time.time() - startTime
+
+    peakMemoryAfter = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    resultQueue.put(((peakMemoryAfter - peakMemoryBefore) / 1024, timeTaken))
+
+
+def main():
+
+    sequenceLengthList = [2000, 8000, 32000]
+    bpttLengthList = [None, 200]
+
+    context = multiprocessing.get_context('spawn')
+
+    for sequenceLength in sequenceLengthList:
+        for bpttLength in bpttLengthList:
+            resultQueue = context.Queue()
+            process = context.Process(
+                target=measureTraining,
+                args=(sequenceLength, bpttLength, resultQueue)
+            )
+            process.start()
+            peakMemoryIncrease, timeTaken = resultQueue.get()
+            process.join()
+
+            print('LstmForecast'
+                  + f' | sequence length: {sequenceLength}'
+                  + f' | bptt length: {bpttLength}'
+                  + f' | peak memory increase: {peakMemoryIncrease : .1f} MiB'
+                  + f' | time taken: {timeTaken : .2f} sec')
+
+
+if __name__ == '__main__':
+    main()
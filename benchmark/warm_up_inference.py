@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+import numpy as np
+from ts.model import DeepNN, GruForecast
+
+
+def measureLatencies(model, numTargetVariables, lengths):
+    """
+    Predicts on series of the given lengths and measures the latency of each
+
+    :param model: DeepNN or RnnForecast model
+    :param numTargetVariables: number of target variables of the model
+    :param lengths: lengths of the series, one prediction is done for each
+    :return: latencies in milliseconds
+    """
+
+    latencies = []
+    for length in lengths:
+        targetSeries = np.random.rand(length, numTargetVariables)
+
+        startTime = time.time()
+        model.predict(targetSeries)
+        latencies.append((time.time() - startTime) * 1000)
+
+    return np.array(latencies)
+
+
+def main():
+
+    lengths = np.random.randint(50, 500, size=(200,))
+    modelSavePath = os.path.join(tempfile.mkdtemp(), 'model')
+
+    for modelClass, model in [
+        (DeepNN, DeepNN(lag=24)),
+        (GruForecast, GruForecast(numRnnLayers=2))
+    ]:
+        model.save(modelSavePath)
+
+        for warmUp in [False, True]:
+            loadedModel = modelClass.load(modelSavePath, warmUp=warmUp)
+            latencies = measureLatencies(loadedModel, 1, lengths)
+
+            print(f'{modelClass.__name__}'
+                  + f' | warm up: {warmUp}'
+                  + f' | first call: {latencies[0] : .2f} ms'
+                  + f' | p50: {np.percentile(latencies[1:], 50) : .2f} ms'
+                  + f' | p99 (all calls): {np.percentile(latencies, 99) : .2f} ms')
+
+    os.remove(modelSavePath)
+
+
+if __name__ == '__main__':
+    main()
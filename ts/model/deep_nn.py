@@ -2,7 +2,7 @@ import pickle
 import numpy as np
 import tensorflow as tf
 
-from ts.utility import Utility, SaveCallback
+from ts.utility import Utility, ForecastDataset, SaveCallback
 from ts.log import GlobalLogger
 
 
@@ -10,11 +10,14 @@ class DeepNN:
     """ Deep Neural Network based forecasting model """
 
     @staticmethod
-    def load(modelLoadPath):
+    def load(modelLoadPath, warmUp=False):
         """
         Loads the model from the provided filepath
 
         :param modelLoadPath: path from where to load the model
+        :param warmUp: If True, then the compiled inference function of the
+        model is traced on loading (see warmUp), hence the first prediction
+        is as fast as the ones after it
         :return: model which is loaded from the given path
         """
 
@@ -36,6 +39,9 @@ class DeepNN:
         model.buildModel()
         model.model.set_weights(loadDict['weights'])
 
+        if warmUp:
+            model.warmUp()
+
         GlobalLogger.getLogger().log('Loading Complete', 1, DeepNN.load.__name__)
 
         return model
@@ -89,7 +95,9 @@ class DeepNN:
             optimizer=tf.optimizers.Adam(),
             modelSavePath=None,
             verboseLevel=1,
-            returnLosses=True
+            returnLosses=True,
+            batchSize=None,
+            shuffleBufferSize=1024
     ):
         """
         Train the model on the provided data sequences
@@ -105,6 +113,11 @@ class DeepNN:
         :param verboseLevel: Verbosity Level, higher value means more information
         :param returnLosses: If True, then return losses of every iteration, else
         does not return losses
+        :param batchSize: If None, then each training sequence is a batch, else
+        the inputs of all the training sequences are shuffled together and
+        are provided in mini batches of batchSize inputs (see ForecastDataset)
+        :param shuffleBufferSize: Size of the buffer from which the inputs are
+        randomly drawn, used only if batchSize is not None
         :return: If returnLosses is True, then return list of losses of every
         iteration, else None
         """
@@ -114,6 +127,27 @@ class DeepNN:
 
         self.model.compile(optimizer=optimizer, loss=tf.keras.losses.MSE)
 
+        if batchSize is None:
+            trainData = DnnDataSequence(
+                trainSequences,
+                self.forecastHorizon,
+                self.numTargetVariables,
+                self.numExoVariables,
+                self.lag
+            )
+        else:
+            trainData = ForecastDataset(
+                trainSequences,
+                self.forecastHorizon,
+                self.numTargetVariables,
+                self.numExoVariables,
+                windowLength=self.lag + 1,
+                batchSize=batchSize,
+                windowShift=1,
+                shuffleBufferSize=shuffleBufferSize,
+                flattenWindows=True
+            ).getDataset()
+
         callbacks = None
         if modelSavePath is not None:
             callbacks = [SaveCallback(
@@ -123,13 +157,7 @@ class DeepNN:
 
         logger.log('Begin Training Model', 1, self.train.__name__)
         history = self.model.fit(
-            DnnDataSequence(
-                trainSequences,
-                self.forecastHorizon,
-                self.numTargetVariables,
-                self.numExoVariables,
-                self.lag
-            ),
+            trainData,
             epochs=numIterations,
             verbose=verboseLevel,
             callbacks=callbacks
@@ -142,6 +170,7 @@ class DeepNN:
             self,
             targetSeries,
             exogenousSeries=None,
+            chunkSize=None
     ):
         """
         Forecast using the model parameters on the provided input data
@@ -155,11 +184,24 @@ class DeepNN:
         numpy array of shape (lag + nPred, numExoVariables), it can be None only if
         numExoVariables is 0 in which case the exogenous variables are not
         considered
+        :param chunkSize: If not None, then the predictions are computed on
+        chunks of chunkSize timesteps at a time (see predictChunks), this bounds
+        the memory used for the inputs of the network, else they are computed
+        on the whole series at once
         :return: Forecast targets predicted by the model, it has shape
         (nPred, numTargetVariables), the horizon of the targets is the
         same as self.forecastHorizon
         """
 
+        if chunkSize is not None:
+            chunks = list(self.predictChunks(targetSeries, exogenousSeries, chunkSize))
+
+            # No timestep is predicted on if the series has only lag timesteps
+            if len(chunks) == 0:
+                chunks = [np.zeros((0, self.numTargetVariables), dtype=self.model.dtype)]
+
+            return tf.squeeze(np.concatenate(chunks, axis=0))
+
         logger = GlobalLogger.getLogger()
 
         logger.log(f'Target Series Shape: {targetSeries.shape}', 2, self.predict.__name__)
@@ -174,7 +216,81 @@ class DeepNN:
         X = DeepNN.prepareDataPredDNN(targetSeries, exogenousSeries, self.lag)
 
         logger.log('Begin Prediction', 1, self.predict.__name__)
-        return tf.squeeze(self.model.predict(np.expand_dims(X, axis=0), verbose=0))
+        return tf.squeeze(self.forward(X))
+
+    def predictChunks(
+            self,
+            targetSeries,
+            exogenousSeries=None,
+            chunkSize=10000
+    ):
+        """
+        Forecast using the model parameters on the provided input data, one
+        chunk of timesteps at a time. The inputs of a chunk are built from only
+        the timesteps of the chunk and the lag timesteps before it, hence the
+        series can be too large to be held in memory as the inputs of the
+        network (e.g. it can be a numpy memmap). This is a generator, the
+        predictions of a chunk are yielded as soon as they are computed
+
+        :param targetSeries: Multivariate Series of the Target Variable, it
+        should be a numpy array of shape (lag + nPred, numTargetVariables)
+        :param exogenousSeries: Series of exogenous Variables, it should be a
+        numpy array of shape (lag + nPred, numExoVariables), it can be None only if
+        numExoVariables is 0 in which case the exogenous variables are not
+        considered
+        :param chunkSize: Number of timesteps predicted on in each chunk
+        :return: Generator of the forecast targets predicted by the model on each
+        chunk, each has shape (chunkSize, numTargetVariables) except the last one
+        which may have fewer timesteps. Concatenated, they are the same as the
+        forecast targets returned by predict
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        logger.log(f'Target Series Shape: {targetSeries.shape}', 2, self.predictChunks.__name__)
+        assert (self.checkShapeValid(targetSeries, exogenousSeries))
+
+        for chunkStartTime in range(0, targetSeries.shape[0] - self.lag, chunkSize):
+            chunkEndTime = min(chunkStartTime + self.lag + chunkSize, targetSeries.shape[0])
+            logger.log(
+                f'Chunk start: {chunkStartTime}, Chunk end: {chunkEndTime}',
+                2,
+                self.predictChunks.__name__
+            )
+
+            X = DeepNN.prepareDataPredDNN(
+                targetSeries[chunkStartTime: chunkEndTime],
+                None if exogenousSeries is None else exogenousSeries[chunkStartTime: chunkEndTime],
+                self.lag
+            )
+
+            yield self.forward(X)
+
+    def getOnlineForecaster(
+            self,
+            targetSeries,
+            exogenousSeries=None
+    ):
+        """
+        Creates an online forecaster of this model, which forecasts on the
+        arrival of every single observation (see DnnOnlineForecaster)
+
+        :param targetSeries: History of the target variables, it should be a
+        numpy array of shape (n, numTargetVariables) where n >= lag
+        :param exogenousSeries: History of the exogenous variables, it should be
+        a numpy array of shape (n, numExoVariables), it can be None only if
+        numExoVariables is 0 in which case the exogenous variables are not
+        considered
+        :return: DnnOnlineForecaster of this model
+        """
+
+        GlobalLogger.getLogger().log(
+            'Creating Online Forecaster',
+            1,
+            self.getOnlineForecaster.__name__
+        )
+
+        return DnnOnlineForecaster(self, targetSeries, exogenousSeries)
 
     def evaluate(
             self,
@@ -225,7 +341,7 @@ class DeepNN:
         )
 
         logger.log('Begin Evaluation', 1, self.predict.__name__)
-        Ypred = self.model.predict(X, verbose=0)
+        Ypred = self.forward(X)
 
         assert (Ytrue.shape == Ypred.shape)
 
@@ -236,6 +352,43 @@ class DeepNN:
         else:
             return loss
 
+    def forward(self, X):
+        """
+        Runs the model on the inputs using a graph compiled function whose
+        input signature does not depend on the number of inputs, hence it is
+        traced only once, on its first call (see warmUp), and not again for
+        series of new lengths
+
+        :param X: Inputs of shape (n, (lag + 1) * (numTargetVariables + numExoVariables))
+        :return: Output of the model, numpy array of shape (n, numTargetVariables)
+        """
+
+        if self.compiledForward is None:
+            inputDimension = (self.numTargetVariables + self.numExoVariables) * (self.lag + 1)
+            self.compiledForward = tf.function(
+                self.model,
+                input_signature=[tf.TensorSpec(
+                    shape=(None, inputDimension),
+                    dtype=tf.keras.backend.floatx()
+                )]
+            )
+
+        return self.compiledForward(X.astype(tf.keras.backend.floatx())).numpy()
+
+    def warmUp(self):
+        """
+        Traces the compiled inference function used by predict, predictChunks
+        and evaluate (see forward), so that it is not traced on the first
+        prediction, e.g. when the model is loaded by a serving worker
+
+        :return: None
+        """
+
+        GlobalLogger.getLogger().log('Warming Up', 1, self.warmUp.__name__)
+
+        inputDimension = (self.numTargetVariables + self.numExoVariables) * (self.lag + 1)
+        self.forward(np.zeros((1, inputDimension)))
+
     def save(
             self,
             modelSavePath
@@ -277,6 +430,8 @@ class DeepNN:
         inputDimension = (self.numExoVariables + self.numTargetVariables) * (self.lag + 1)
 
         self.model = tf.keras.Sequential()
+        self.compiledForward = None
+
         for i in range(self.numLayers):
             self.model.add(tf.keras.layers.Dense(
                 units=self.numUnitsPerLayer,
@@ -331,15 +486,7 @@ class DeepNN:
             exogenousSeries
         )
 
-        X = []
-
-        for i in range(lag, Xtemp.shape[0]):
-            vecLen = (lag + 1) * Xtemp.shape[1]
-            vec = np.reshape(Xtemp[i - lag: i + 1, :], (vecLen,))
-            X.append(vec)
-
-        X = np.array(X)
-        return X
+        return DeepNN.buildLagWindows(Xtemp, lag)
 
     @staticmethod
     def prepareDataTrainDNN(
@@ -370,17 +517,36 @@ class DeepNN:
             forecastHorizon
         )
 
-        X = []
+        X = DeepNN.buildLagWindows(Xtemp, lag)
         Y = Ytemp[lag:]
 
-        for i in range(lag, Xtemp.shape[0]):
-            vecLen = (lag + 1) * Xtemp.shape[1]
-            vec = np.reshape(Xtemp[i - lag: i + 1, :], (vecLen,))
-            X.append(vec)
-
-        X = np.array(X)
         return X, Y
 
+    @staticmethod
+    def buildLagWindows(Xtemp, lag):
+        """
+        Builds the input of every timestep from the lag timesteps before it
+        and the timestep itself. Since the rows of Xtemp are laid out one after
+        another in memory, the input of a timestep is a contiguous block of
+        memory, hence the inputs are a strided view of Xtemp and nothing is
+        copied. The view is read only, as its rows overlap
+
+        :param Xtemp: Feature data of shape (n, d)
+        :param lag: The lag to be considered
+        :return: Inputs of shape (n - lag, (lag + 1) * d), the input of the
+        timestep i + lag is the concatenation of Xtemp[i], ..., Xtemp[i + lag]
+        """
+
+        Xtemp = np.ascontiguousarray(Xtemp)
+        n, d = Xtemp.shape
+
+        return np.lib.stride_tricks.as_strided(
+            Xtemp,
+            shape=(max(n - lag, 0), (lag + 1) * d),
+            strides=(Xtemp.strides[0], Xtemp.strides[1]),
+            writeable=False
+        )
+
     @staticmethod
     def lossFunc(Ytrue, Ypred):
         """
@@ -421,6 +587,7 @@ class DnnDataSequence(tf.keras.utils.Sequence):
         self.numTargetVariables = numTargetVariables
         self.numExoVariables = numExoVariables
         self.lag = lag
+        self.cache = [None] * len(trainSequences)
 
     def __len__(self):
         """ Gets the Number of Batches """
@@ -429,12 +596,16 @@ class DnnDataSequence(tf.keras.utils.Sequence):
 
     def __getitem__(self, idx):
         """
-        Gets the batch corresponding to the provided index
+        Gets the batch corresponding to the provided index, the batch of
+        each index is prepared only once and is cached for the later epochs
 
         :param idx: Index of the batch which is requested
         :return: The (idx)th batch
         """
 
+        if self.cache[idx] is not None:
+            return self.cache[idx]
+
         if type(self.trainSequences[idx]) is tuple:
             targetSeries = self.trainSequences[idx][0]
             exogenousSeries = self.trainSequences[idx][1]
@@ -449,11 +620,119 @@ class DnnDataSequence(tf.keras.utils.Sequence):
         )
         assert (Utility.isExoShapeValid(exogenousSeries, self.numExoVariables))
 
-        X, Y = DeepNN.prepareDataTrainDNN(
+        self.cache[idx] = DeepNN.prepareDataTrainDNN(
             targetSeries,
             exogenousSeries,
             self.forecastHorizon,
             self.lag
         )
 
-        return X, Y
+        return self.cache[idx]
+
+
+class DnnOnlineForecaster:
+    """
+    Online (streaming) forecaster of a DeepNN model, it forecasts on the
+    arrival of every single observation. The last lag + 1 inputs are held
+    in a preallocated ring buffer, every input is written twice into a buffer
+    of 2 * (lag + 1) rows, at its position and lag + 1 rows after it, hence
+    the last lag + 1 inputs are always a contiguous block of the buffer and
+    the input of the network is a view of it, nothing is allocated or copied
+    """
+
+    def __init__(
+            self,
+            model,
+            targetSeries,
+            exogenousSeries=None
+    ):
+        """
+        Create DnnOnlineForecaster instance using the provided model and history
+
+        :param model: DeepNN model using which to forecast
+        :param targetSeries: History of the target variables, it should be a
+        numpy array of shape (n, numTargetVariables) where n >= lag, only its
+        last lag timesteps are used
+        :param exogenousSeries: History of the exogenous variables, it should be
+        a numpy array of shape (n, numExoVariables), it can be None only if
+        numExoVariables is 0 in which case the exogenous variables are not
+        considered
+        """
+
+        assert (model.checkShapeValid(targetSeries, exogenousSeries))
+        assert (targetSeries.shape[0] >= model.lag)
+
+        self.model = model
+        self.windowLength = model.lag + 1
+        self.numTargetVariables = model.numTargetVariables
+        self.numExoVariables = model.numExoVariables
+
+        self.buffer = np.zeros(
+            (2 * self.windowLength, self.numTargetVariables + self.numExoVariables),
+            dtype=tf.keras.backend.floatx()
+        )
+        self.position = 0
+
+        history = Utility.prepareDataPred(targetSeries, exogenousSeries)
+        for timestep in range(history.shape[0] - model.lag, history.shape[0]):
+            self.write(history[timestep, :self.numTargetVariables],
+                       history[timestep, self.numTargetVariables:])
+
+        self.compiledForward = tf.function(
+            self.forward,
+            input_signature=[tf.TensorSpec(
+                shape=(1, self.buffer.shape[1] * self.windowLength),
+                dtype=self.buffer.dtype
+            )]
+        )
+
+    def write(self, targetObs, exogenousObs):
+        """
+        Writes the input of a timestep into the ring buffer
+
+        :param targetObs: Target variables of the timestep, of shape (numTargetVariables,)
+        :param exogenousObs: Exogenous variables of the timestep, of shape
+        (numExoVariables,), or None if numExoVariables is 0
+        """
+
+        for row in (self.position, self.position + self.windowLength):
+            self.buffer[row, :self.numTargetVariables] = targetObs
+            if exogenousObs is not None:
+                self.buffer[row, self.numTargetVariables:] = exogenousObs
+
+        self.position = (self.position + 1) % self.windowLength
+
+    def forward(self, X):
+        """
+        Runs the dense layers of the model on the input
+
+        :param X: Input of shape (1, (lag + 1) * (numTargetVariables + numExoVariables))
+        :return: Output of the network, of shape (1, numTargetVariables)
+        """
+
+        for layer in self.model.model.layers:
+            X = layer(X)
+
+        return X
+
+    def update(self, targetObs, exogenousObs=None):
+        """
+        Receives the observation of the next timestep and forecasts using it
+        and the lag timesteps before it
+
+        :param targetObs: Observed target variables, it should be a numpy array
+        of shape (numTargetVariables,)
+        :param exogenousObs: Observed exogenous variables, it should be a numpy
+        array of shape (numExoVariables,), it can be None only if numExoVariables is 0
+        :return: Forecast target of shape (numTargetVariables,), its horizon is
+        the same as the forecastHorizon of the model
+        """
+
+        assert (exogenousObs is not None or self.numExoVariables == 0)
+
+        self.write(targetObs, exogenousObs)
+
+        # after the write, the last lag + 1 inputs begin at self.position
+        X = self.buffer[self.position: self.position + self.windowLength].reshape(1, -1)
+
+        return self.compiledForward(X).numpy()[0]
@@ -1,3 +1,4 @@
+import functools
 import pickle
 import time
 
@@ -38,8 +39,15 @@ class ExtremeTime:
         model.inputDimension = loadDict['inputDimension']
         model.encoderStateSize = loadDict['encoderStateSize']
         model.lstmStateSize = loadDict['lstmStateSize']
+        model.batchEncoding = loadDict.get('batchEncoding', True)
+        model.memoryRefreshFraction = loadDict.get('memoryRefreshFraction', 1.0)
+        model.memoryRefreshPeriod = loadDict.get('memoryRefreshPeriod', None)
+        model.attentionTopK = loadDict.get('attentionTopK', None)
+        model.dtype = tf.as_dtype(loadDict.get('dtype', 'float64'))
+        model.resetMemoryBank()
         model.memory = loadDict['memory']
         model.q = loadDict['q']
+        model.memoryLogCounts = loadDict.get('memoryLogCounts', None)
 
         model.buildModel()
         model.gruEncoder.set_weights(loadDict['gruEncoder'])
@@ -60,6 +68,11 @@ class ExtremeTime:
             encoderStateSize=10,
             lstmStateSize=10,
             numExoVariables=0,
+            batchEncoding=True,
+            memoryRefreshFraction=1.0,
+            memoryRefreshPeriod=None,
+            attentionTopK=None,
+            dtype='float64',
             loadModel=False
     ):
         """
@@ -74,6 +87,24 @@ class ExtremeTime:
         :param encoderStateSize: Size of the hidden state of the GRU encoder
         :param lstmStateSize: Size of the hidden state of the LSTM used in the model
         :param numExoVariables: Number of exogenous variables the model takes as input
+        :param batchEncoding: If True, then all the memory windows are encoded
+        together in a single batched pass of the GRU encoder, else each window
+        is encoded separately one timestep at a time. Both produce the same memory
+        :param memoryRefreshFraction: Fraction of the memory windows which are
+        re-sampled and re-encoded before training on each sequence, the encodings
+        of the rest of the windows are reused from the previous sequence (without
+        being differentiated through). The windows which were encoded the longest
+        time ago are the ones which are re-encoded. If it is 1, then the whole
+        memory is rebuilt before every sequence
+        :param memoryRefreshPeriod: If not None, then the whole memory is rebuilt
+        after every memoryRefreshPeriod partial refreshes of the memory
+        :param attentionTopK: If not None, then at every timestep only the
+        attentionTopK memory slots with the highest attention scores are attended
+        to (i.e. the softmax is taken over only these), else all the memory slots
+        are attended to
+        :param dtype: Floating point type of the model, i.e. of its layers, memory
+        and states, e.g. 'float64' or 'float32' (which is faster). It only applies
+        to this model, the default float type of Keras is left unchanged
         :param loadModel: True or False - do not use this parameter !,
         this is for internal use only (i.e. it is an implementation detail)
         If True, then object is normally created, else object is created
@@ -81,8 +112,6 @@ class ExtremeTime:
         is created by the static load method
         """
 
-        tf.keras.backend.set_floatx('float64')
-
         if loadModel:
             return
 
@@ -95,12 +124,19 @@ class ExtremeTime:
         self.encoderStateSize = encoderStateSize
         self.lstmStateSize = lstmStateSize
         self.inputDimension = numExoVariables + 1
+        self.batchEncoding = batchEncoding
+        self.memoryRefreshFraction = memoryRefreshFraction
+        self.memoryRefreshPeriod = memoryRefreshPeriod
+        self.attentionTopK = attentionTopK
+        self.dtype = tf.as_dtype(dtype)
         self.memory = None
         self.q = None
+        self.memoryLogCounts = None
+        self.resetMemoryBank()
 
         logger.log('Building Model Parameters', 1, self.__init__.__name__)
 
-        self.lstm = self.gruEncoder = None
+        self.lstm = self.lstmRnn = self.gruEncoder = self.gruEncoderRnn = None
         self.outDense = self.embeddingDense = None
         self.buildModel()
 
@@ -111,7 +147,7 @@ class ExtremeTime:
             self.predict.__name__
         )
 
-        self.b = tf.Variable(0, dtype=tf.float64)
+        self.b = tf.Variable(0, dtype=self.dtype)
 
     def train(
             self,
@@ -122,7 +158,9 @@ class ExtremeTime:
             optimizer=tf.optimizers.Adam(),
             modelSavePath=None,
             verboseLevel=1,
-            returnLosses=True
+            returnLosses=True,
+            compiled=False,
+            checkpointLength=None
     ):
         """
         Train the Model Parameters on the provided data
@@ -144,11 +182,20 @@ class ExtremeTime:
         :param returnLosses: If True, then losses are returned, else losses are not
         returned
         is returned, else None is returned
+        :param compiled: If True, then the loss and gradients of each sequence are
+        computed by a graph compiled function (see trainSequenceCompiled), else
+        they are computed eagerly
+        :param checkpointLength: If not None, then the loss and gradients of each
+        sequence are computed eagerly with gradient checkpointing, where the
+        sequence is split into chunks of checkpointLength timesteps (see
+        trainSequenceCheckpointed), this bounds the memory used by training on
+        long sequences. It cannot be used along with compiled
         """
 
         logger = GlobalLogger.getLogger()
         verbose = ConsoleLogger(verboseLevel)
 
+        assert (not compiled or checkpointLength is None)
         assert (Utility.isExoShapeValid(exogenousSeries, self.inputDimension - 1))
         X, Y = Utility.prepareDataTrain(targetSeries, exogenousSeries, self.forecastHorizon)
 
@@ -159,6 +206,15 @@ class ExtremeTime:
         logger.log('Begin Training', 1, self.train.__name__)
 
         losses = []
+        if compiled:
+            trainSequence = self.trainSequenceCompiled
+        elif checkpointLength is not None:
+            trainSequence = functools.partial(
+                self.trainSequenceCheckpointed,
+                checkpointLength=checkpointLength
+            )
+        else:
+            trainSequence = self.trainSequence
 
         for iteration in range(numIterations):
 
@@ -173,7 +229,7 @@ class ExtremeTime:
                 seqEndTime = min(seqStartTime + sequenceLength, n - 1)
 
                 startTime = time.time()
-                loss = self.trainSequence(X, Y, seqStartTime, seqEndTime, optimizer)
+                loss = trainSequence(X, Y, seqStartTime, seqEndTime, optimizer)
                 endTime = time.time()
                 timeTaken = endTime - startTime
 
@@ -213,6 +269,7 @@ class ExtremeTime:
             self,
             targetSeries,
             exogenousSeries=None,
+            vectorized=False
     ):
         """
         Forecast using the model parameters on the provided input data
@@ -223,6 +280,9 @@ class ExtremeTime:
         numpy array of shape (n, numExoVariables), it can be None only if
         numExoVariables is 0 in which case the exogenous variables are not
         considered
+        :param vectorized: If True, then all the timesteps are predicted together
+        (see predictSequence), else they are predicted one timestep at a time.
+        Both give the same forecasts
         :return: Forecast targets predicted by the model, it has shape (n,), the
         horizon of the targets is the same as self.forecastHorizon
         """
@@ -234,21 +294,96 @@ class ExtremeTime:
         X = Utility.prepareDataPred(targetSeries, exogenousSeries)
 
         n = X.shape[0]
-        Ypred = [None] * n
 
-        for t in range(n):
-            Ypred[t] = self.predictTimestep(X, t)
+        if vectorized:
+            Ypred = self.predictSequence(X).numpy()
+        else:
+            Ypred = [None] * n
+
+            for t in range(n):
+                Ypred[t] = self.predictTimestep(X, t)
+
+            Ypred = np.array(Ypred)
 
-        Ypred = np.array(Ypred)
         logger.log(f'Output Shape: {Ypred.shape}', 2, self.predict.__name__)
 
         return Ypred
 
+    def predictNext(
+            self,
+            targetValue,
+            exogenousValue=None
+    ):
+        """
+        Forecast using the model parameters on a single new observation. The
+        recurrent state carried by the model is advanced by one timestep, hence
+        calling this on every observation of a series gives the same forecasts
+        as calling predict on the whole series
+
+        :param targetValue: Value of the target variable at the current timestep
+        :param exogenousValue: Exogenous variables at the current timestep, it should
+        be a numpy array of shape (numExoVariables,), it can be None only if
+        numExoVariables is 0
+        :return: Forecast target predicted by the model, the horizon of the target
+        is the same as self.forecastHorizon
+        """
+
+        X = self.prepareObservation(targetValue, exogenousValue)
+
+        return self.predictTimestep(X, 0).numpy()
+
+    def update(
+            self,
+            targetValue,
+            exogenousValue=None
+    ):
+        """
+        Advance the recurrent state carried by the model by one timestep using
+        a single new observation, without computing the forecast
+
+        :param targetValue: Value of the target variable at the current timestep
+        :param exogenousValue: Exogenous variables at the current timestep, it should
+        be a numpy array of shape (numExoVariables,), it can be None only if
+        numExoVariables is 0
+        :return: None
+        """
+
+        X = self.prepareObservation(targetValue, exogenousValue)
+
+        self.lstmStateList = self.lstm(X, self.lstmStateList)[1]
+
+    def snapshotState(self):
+        """
+        Get a snapshot of the recurrent state carried by the model. Along with
+        restoreState, this allows multiple streams of observations to share a
+        single model, by restoring a stream's state before calling predictNext
+        or update on its observation and taking its snapshot afterwards
+
+        :return: Snapshot of the LSTM states
+        """
+
+        return self.lstmStateList
+
+    def restoreState(self, stateSnapshot):
+        """
+        Restore the recurrent state carried by the model from a snapshot
+
+        :param stateSnapshot: Snapshot of the LSTM states returned by snapshotState,
+        if None then the initial state is restored
+        :return: None
+        """
+
+        if stateSnapshot is None:
+            stateSnapshot = self.getInitialLstmStates()
+
+        self.lstmStateList = stateSnapshot
+
     def evaluate(
             self,
             targetSeries,
             exogenousSeries=None,
-            returnPred=False
+            returnPred=False,
+            vectorized=False
     ):
         """
         Forecast using the model parameters on the provided data, evaluates
@@ -265,6 +400,8 @@ class ExtremeTime:
         are not considered
         :param returnPred: If True, then return predictions along with loss, else
         return on loss
+        :param vectorized: If True, then all the timesteps are predicted together,
+        else they are predicted one timestep at a time
         :return: If True, then return predictions along with loss of the predicted
         and true targets, else return only loss
         """
@@ -284,7 +421,7 @@ class ExtremeTime:
             )
             assert (exogenousSeries.shape[0] == n)
 
-        Ypred = self.predict(targetSeries[:n], exogenousSeries)
+        Ypred = self.predict(targetSeries[:n], exogenousSeries, vectorized)
 
         loss = tf.keras.losses.MSE(targetSeries[self.forecastHorizon:], Ypred)
 
@@ -320,8 +457,14 @@ class ExtremeTime:
             'inputDimension': self.inputDimension,
             'encoderStateSize': self.encoderStateSize,
             'lstmStateSize': self.lstmStateSize,
+            'batchEncoding': self.batchEncoding,
+            'memoryRefreshFraction': self.memoryRefreshFraction,
+            'memoryRefreshPeriod': self.memoryRefreshPeriod,
+            'attentionTopK': self.attentionTopK,
+            'dtype': self.dtype.name,
             'memory': self.memory,
             'q': self.q,
+            'memoryLogCounts': self.memoryLogCounts,
             'gruEncoder': self.gruEncoder.get_weights(),
             'lstmStateList': self.lstmStateList,
             'outDense': self.outDense.get_weights(),
@@ -352,14 +495,14 @@ class ExtremeTime:
         logger.log(f'Sequence start: {seqStartTime}, Sequence end: {seqEndTime}', 2, self.trainSequence.__name__)
 
         with tf.GradientTape() as tape:
-            self.buildMemory(X, Y, seqStartTime)
+            self.updateMemory(X, Y, seqStartTime)
 
             Ypred = []
             for t in range(seqStartTime, seqEndTime + 1):
                 pred = self.predictTimestep(X, t)
                 Ypred.append(pred)
 
-            Ypred = tf.convert_to_tensor(Ypred, dtype=tf.float64)
+            Ypred = tf.convert_to_tensor(Ypred, dtype=self.dtype)
             logger.log(f'Prediction Shape: {Ypred.shape}', 2, self.trainSequence.__name__)
 
             loss = tf.keras.losses.MSE(
@@ -368,12 +511,7 @@ class ExtremeTime:
             )
             logger.log(f'Loss: {loss}', 2, self.trainSequence.__name__)
 
-        trainableVars = \
-            self.gruEncoder.trainable_variables \
-            + self.lstm.trainable_variables \
-            + self.outDense.trainable_variables \
-            + self.embeddingDense.trainable_variables \
-            + [self.b]
+        trainableVars = self.getTrainableVariables()
 
         logger.log('Performing Gradient Descent', 1, self.trainSequence.__name__)
 
@@ -387,6 +525,236 @@ class ExtremeTime:
 
         return loss
 
+    def trainSequenceCheckpointed(self, X, Y, seqStartTime, seqEndTime, optimizer, checkpointLength):
+        """
+        Same as trainSequence, but with gradient checkpointing. The encoding of
+        the memory windows and the predictions on each chunk of checkpointLength
+        timesteps are computed without recording their intermediate values, only
+        their inputs and outputs are kept. The intermediate values are recomputed
+        when the gradients are computed, hence the memory used grows with the
+        number of chunks rather than the number of timesteps
+
+        :param X: Features, has shape (n, self.inputShape)
+        :param Y: Targets, has shape (n,)
+        :param seqStartTime: Sequence Start Time
+        :param seqEndTime: Sequence End Time
+        :param optimizer: The optimization algorithm
+        :param checkpointLength: Number of timesteps in each chunk
+        :return: The loss value resulted from training on the sequence
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        logger.log('Begin Checkpointed Training on Sequence', 1, self.trainSequenceCheckpointed.__name__)
+        logger.log(
+            f'Sequence start: {seqStartTime}, Sequence end: {seqEndTime}',
+            2,
+            self.trainSequenceCheckpointed.__name__
+        )
+
+        computeChunkPredictions = tf.recompute_grad(self.computeChunkPredictions)
+
+        with tf.GradientTape() as tape:
+            self.updateMemory(X, Y, seqStartTime, checkpointed=True)
+
+            Ypred = []
+            hiddenState, cellState = self.lstmStateList
+            for chunkStartTime in range(seqStartTime, seqEndTime + 1, checkpointLength):
+                chunkEndTime = min(chunkStartTime + checkpointLength, seqEndTime + 1)
+                logger.log(
+                    f'Chunk start: {chunkStartTime}, Chunk end: {chunkEndTime - 1}',
+                    2,
+                    self.trainSequenceCheckpointed.__name__
+                )
+
+                chunkPred, hiddenState, cellState = computeChunkPredictions(
+                    tf.convert_to_tensor(X[chunkStartTime: chunkEndTime], dtype=self.dtype),
+                    self.memory,
+                    self.q,
+                    hiddenState,
+                    cellState
+                )
+                Ypred.append(chunkPred)
+
+            self.lstmStateList = [hiddenState, cellState]
+
+            Ypred = tf.concat(Ypred, axis=0)
+            logger.log(f'Prediction Shape: {Ypred.shape}', 2, self.trainSequenceCheckpointed.__name__)
+
+            loss = tf.keras.losses.MSE(
+                Y[seqStartTime: seqEndTime + 1],
+                Ypred
+            )
+            logger.log(f'Loss: {loss}', 2, self.trainSequenceCheckpointed.__name__)
+
+        trainableVars = self.getTrainableVariables()
+
+        logger.log('Performing Gradient Descent', 1, self.trainSequenceCheckpointed.__name__)
+
+        grads = tape.gradient(loss, trainableVars)
+        assert (len(trainableVars) == len(grads))
+
+        optimizer.apply_gradients(zip(
+            grads,
+            trainableVars
+        ))
+
+        return loss
+
+    def computeChunkPredictions(self, Xchunk, memory, q, hiddenState, cellState):
+        """
+        Predicts on every timestep of a chunk of a sequence one timestep at a
+        time, this is the unit of recomputation of trainSequenceCheckpointed
+
+        :param Xchunk: Chunk features, has shape (chunkLength, self.inputShape)
+        :param memory: Memory states, it has shape (self.memorySize, self.encoderStateSize)
+        :param q: Memory outputs, it has shape (self.memorySize,)
+        :param hiddenState: Hidden state of the LSTM at the start of the chunk
+        :param cellState: Cell state of the LSTM at the start of the chunk
+        :return: The predicted values on the timesteps of the chunk which has shape
+        (chunkLength,), and the hidden and cell states of the LSTM at the end of
+        the chunk
+        """
+
+        Ypred = []
+        for t in range(Xchunk.shape[0]):
+            hiddenState, (hiddenState, cellState) = self.lstm(
+                tf.expand_dims(Xchunk[t], axis=0),
+                [hiddenState, cellState]
+            )
+
+            Ypred.append(self.computePrediction(hiddenState, memory, q))
+
+        return tf.stack(Ypred), hiddenState, cellState
+
+    def trainSequenceCompiled(self, X, Y, seqStartTime, seqEndTime, optimizer):
+        """
+        Same as trainSequence, but the memory build, the prediction rollout
+        and the loss along with its gradients are computed by a graph compiled
+        function. The function has a length agnostic input signature, hence it
+        is traced only once irrespective of the sequence lengths
+
+        :param X: Features, has shape (n, self.inputShape)
+        :param Y: Targets, has shape (n,)
+        :param seqStartTime: Sequence Start Time
+        :param seqEndTime: Sequence End Time
+        :param optimizer: The optimization algorithm
+        :return: The loss value resulted from training on the sequence
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        logger.log('Begin Compiled Training on Sequence', 1, self.trainSequenceCompiled.__name__)
+        logger.log(
+            f'Sequence start: {seqStartTime}, Sequence end: {seqEndTime}',
+            2,
+            self.trainSequenceCompiled.__name__
+        )
+
+        if self.compiledSequenceGradients is None:
+            logger.log('Compiling Sequence Gradients', 1, self.trainSequenceCompiled.__name__)
+            self.compiledSequenceGradients = tf.function(
+                self.computeSequenceGradients,
+                input_signature=[
+                    tf.TensorSpec((None, self.windowSize, self.inputDimension), self.dtype),
+                    tf.TensorSpec((None,), tf.int64),
+                    tf.TensorSpec((self.memorySize, self.encoderStateSize), self.dtype),
+                    tf.TensorSpec((self.memorySize,), self.dtype),
+                    tf.TensorSpec((None, self.inputDimension), self.dtype),
+                    tf.TensorSpec((None,), self.dtype),
+                    [
+                        tf.TensorSpec((1, self.lstmStateSize), self.dtype),
+                        tf.TensorSpec((1, self.lstmStateSize), self.dtype)
+                    ]
+                ]
+            )
+
+        refreshSlots, windowStartTimes = self.sampleMemoryWindows(seqStartTime)
+        windows = self.gatherWindows(X, windowStartTimes)
+
+        if refreshSlots.shape[0] == self.memorySize:
+            memory = tf.zeros((self.memorySize, self.encoderStateSize), dtype=self.dtype)
+        else:
+            memory = self.memory
+
+        self.memoryLogCounts = None
+        loss, grads, self.memory, self.q, self.lstmStateList = \
+            self.compiledSequenceGradients(
+                tf.convert_to_tensor(windows, dtype=self.dtype),
+                tf.convert_to_tensor(refreshSlots, dtype=tf.int64),
+                memory,
+                self.getMemoryOutputs(Y),
+                tf.convert_to_tensor(X[seqStartTime: seqEndTime + 1], dtype=self.dtype),
+                tf.convert_to_tensor(Y[seqStartTime: seqEndTime + 1], dtype=self.dtype),
+                self.lstmStateList
+            )
+
+        logger.log(f'Loss: {loss}', 2, self.trainSequenceCompiled.__name__)
+        logger.log('Performing Gradient Descent', 1, self.trainSequenceCompiled.__name__)
+
+        optimizer.apply_gradients(zip(
+            grads,
+            self.getTrainableVariables()
+        ))
+
+        return loss
+
+    def computeSequenceGradients(self, windows, refreshSlots, memory, q, Xseq, Yseq, lstmStateList):
+        """
+        Updates the memory by encoding the given windows into the given memory
+        slots, predicts on every timestep of the sequence and computes the loss
+        along with its gradients. This is meant to be compiled into a graph
+        using tf.function
+
+        :param windows: Memory windows to be encoded, has shape
+        (numRefresh, self.windowSize, self.inputShape)
+        :param refreshSlots: Memory slots of the windows, has shape (numRefresh,)
+        :param memory: Memory states before the update, has shape
+        (self.memorySize, self.encoderStateSize)
+        :param q: Memory outputs, has shape (self.memorySize,)
+        :param Xseq: Sequence features, has shape (seqLength, self.inputShape)
+        :param Yseq: Sequence targets, has shape (seqLength,)
+        :param lstmStateList: LSTM states at the start of the sequence
+        :return: loss, gradients of the loss with respect to the trainable variables,
+        memory, memory outputs and the LSTM states at the end of the sequence
+        """
+
+        trainableVars = self.getTrainableVariables()
+        seqLength = tf.shape(Xseq)[0]
+
+        with tf.GradientTape() as tape:
+            memory = tf.tensor_scatter_nd_update(
+                tf.stop_gradient(memory),
+                tf.expand_dims(refreshSlots, axis=1),
+                self.gruEncoderRnn(windows)
+            )
+
+            def rolloutStep(t, hiddenState, cellState, Ypred):
+                hiddenState, cellState = self.lstm(
+                    tf.expand_dims(Xseq[t], axis=0),
+                    [hiddenState, cellState]
+                )[1]
+
+                pred = self.computePrediction(hiddenState, memory, q)
+                return t + 1, hiddenState, cellState, Ypred.write(t, pred)
+
+            _, hiddenState, cellState, Ypred = tf.while_loop(
+                lambda t, *_: t < seqLength,
+                rolloutStep,
+                [
+                    tf.constant(0),
+                    lstmStateList[0],
+                    lstmStateList[1],
+                    tf.TensorArray(self.dtype, size=seqLength)
+                ]
+            )
+
+            loss = tf.keras.losses.MSE(Yseq, Ypred.stack())
+
+        grads = tape.gradient(loss, trainableVars)
+
+        return loss, grads, memory, q, [hiddenState, cellState]
+
     def buildMemory(self, X, Y, currentTime):
         """
         Build Model Memory using the timesteps seen up till now
@@ -404,25 +772,248 @@ class ExtremeTime:
         logger.log(f'Current Time: {currentTime}', 2, self.buildMemory.__name__)
         assert (currentTime >= self.windowSize)
 
+        _, windowStartTimes = self.sampleMemoryWindows(currentTime, fullRefresh=True)
+
+        self.memory = self.encodeWindows(X, windowStartTimes)
+        self.q = self.getMemoryOutputs(Y)
+        self.memoryLogCounts = None
+
+        logger.log(f'Memory Shape: {self.memory.shape}, Out Shape: {self.q.shape}', 2, self.buildMemory.__name__)
+
+    def updateMemory(self, X, Y, currentTime, checkpointed=False):
+        """
+        Update Model Memory using the timesteps seen up till now. Only the
+        windows of the memory slots selected by sampleMemoryWindows are
+        re-encoded, the encodings of the other slots are kept as they are
+
+        :param X: Features, has shape (n, self.inputShape)
+        :param Y: Targets, has shape (n,)
+        :param currentTime: current timestep, memory would be built only using the
+        timestep earlier than the current timestep
+        :param checkpointed: If True, then the windows are encoded with gradient
+        checkpointing (see encodeWindows)
+        :return: None
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        logger.log('Updating Memory', 1, self.updateMemory.__name__)
+        logger.log(f'Current Time: {currentTime}', 2, self.updateMemory.__name__)
+        assert (currentTime >= self.windowSize)
+
+        refreshSlots, windowStartTimes = self.sampleMemoryWindows(currentTime)
+        logger.log(f'Number of Refreshed Slots: {refreshSlots.shape[0]}', 2, self.updateMemory.__name__)
+
+        if refreshSlots.shape[0] == self.memorySize:
+            self.memory = self.encodeWindows(X, windowStartTimes, checkpointed)
+        else:
+            self.memory = tf.tensor_scatter_nd_update(
+                tf.stop_gradient(self.memory),
+                np.expand_dims(refreshSlots, axis=1),
+                self.encodeWindows(X, windowStartTimes, checkpointed)
+            )
+
+        self.q = self.getMemoryOutputs(Y)
+        self.memoryLogCounts = None
+
+    def compactMemory(self, numPrototypes, numIterations=20):
+        """
+        Compacts the memory built after training into a smaller number of
+        prototypes, by clustering the memory states using k-means. Each prototype
+        is the centroid of its cluster, and its output is the mean of the outputs
+        (q values) of the cluster. The log of the size of each cluster is added
+        to the attention scores of its prototype, so that a prototype receives
+        as much attention as its whole cluster would have. The compacted memory
+        is used for prediction and is saved along with the model, it is replaced
+        the next time the memory is built
+
+        :param numPrototypes: Number of prototypes, clusters to which no memory
+        state is assigned are dropped
+        :param numIterations: Maximum number of iterations of k-means
+        :return: None
+        """
+
+        logger = GlobalLogger.getLogger()
+        logger.log('Compacting Memory', 1, self.compactMemory.__name__)
+
+        assert (self.memory is not None and self.memoryLogCounts is None)
+
+        prototypes, assignments = Utility.kMeans(
+            self.memory.numpy(),
+            numPrototypes,
+            numIterations
+        )
+
+        counts = np.bincount(assignments, minlength=prototypes.shape[0])
+        isNonEmpty = counts > 0
+        q = np.bincount(assignments, weights=self.q.numpy(), minlength=prototypes.shape[0])
+
+        self.memory = tf.convert_to_tensor(prototypes[isNonEmpty], dtype=self.dtype)
+        self.q = tf.convert_to_tensor(q[isNonEmpty] / counts[isNonEmpty], dtype=self.dtype)
+        self.memoryLogCounts = tf.convert_to_tensor(np.log(counts[isNonEmpty]), dtype=self.dtype)
+        self.resetMemoryBank()
+
+        logger.log(f'Memory Shape: {self.memory.shape}, Out Shape: {self.q.shape}', 2, self.compactMemory.__name__)
+
+    def sampleMemoryWindows(self, currentTime, fullRefresh=False):
+        """
+        Selects the memory slots which are to be re-encoded, samples new windows
+        for them and updates the memory bank bookkeeping (i.e. the start time and
+        the staleness of the window of each slot). All the slots are selected
+        if fullRefresh is True, if there is no memory yet, if memoryRefreshFraction
+        is 1 or if memoryRefreshPeriod partial refreshes have already been performed.
+        Otherwise the memoryRefreshFraction stalest slots are selected along with
+        those slots whose windows do not end before the current timestep
+
+        :param currentTime: current timestep, every sampled window ends
+        before the current timestep
+        :param fullRefresh: If True, then all the slots are selected
+        :return: Selected slots which is a numpy array of shape (numRefresh,) and
+        the start times of their sampled windows, which is a numpy array of
+        shape (numRefresh,)
+        """
+
+        fullRefresh = \
+            fullRefresh \
+            or self.memory is None \
+            or self.memoryWindowStartTimes is None \
+            or self.memoryRefreshFraction >= 1 \
+            or (
+                self.memoryRefreshPeriod is not None
+                and self.numPartialRefreshes >= self.memoryRefreshPeriod
+            )
+
+        if fullRefresh:
+            refreshSlots = np.arange(self.memorySize)
+            self.memoryWindowStartTimes = np.zeros(self.memorySize, dtype=np.int64)
+            self.memoryStaleness = np.zeros(self.memorySize, dtype=np.int64)
+            self.numPartialRefreshes = 0
+        else:
+            numRefresh = int(np.ceil(self.memoryRefreshFraction * self.memorySize))
+            stalestSlots = np.argsort(-self.memoryStaleness, kind='stable')[:numRefresh]
+            invalidSlots = np.nonzero(
+                self.memoryWindowStartTimes > currentTime - self.windowSize
+            )[0]
+
+            refreshSlots = np.union1d(stalestSlots, invalidSlots)
+            self.memoryStaleness += 1
+            self.numPartialRefreshes += 1
+
+        windowStartTimes = self.sampleWindowStartTimes(currentTime, refreshSlots.shape[0])
+        self.memoryWindowStartTimes[refreshSlots] = windowStartTimes
+        self.memoryStaleness[refreshSlots] = 0
+
+        return refreshSlots, windowStartTimes
+
+    def resetMemoryBank(self):
+        """
+        Resets the memory bank bookkeeping, hence the next memory update
+        rebuilds the whole memory
+
+        :return: None
+        """
+
+        self.memoryWindowStartTimes = None
+        self.memoryStaleness = None
+        self.numPartialRefreshes = 0
+
+    def getMemoryOutputs(self, Y):
+        """
+        Get the outputs (i.e. q values) of the windows in the memory
+
+        :param Y: Targets, has shape (n,)
+        :return: Memory outputs, it has shape (self.memorySize,)
+        """
+
+        return tf.convert_to_tensor(
+            Y[self.memoryWindowStartTimes + self.windowSize - 1],
+            dtype=self.dtype
+        )
+
+    def encodeWindows(self, X, windowStartTimes, checkpointed=False):
+        """
+        Encodes the windows starting at the provided timesteps using the GRU
+        encoder, either all together or one by one depending on batchEncoding
+
+        :param X: Features, has shape (n, self.inputShape)
+        :param windowStartTimes: Starting timestep of each window, it is a numpy
+        array of shape (numWindows,)
+        :param checkpointed: If True, then the windows are encoded all together
+        with gradient checkpointing, i.e. the intermediate GRU states are not
+        recorded and are recomputed when the gradients are computed
+        :return: The encoded windows, it has shape (numWindows, self.encoderStateSize)
+        """
+
+        if self.batchEncoding or checkpointed:
+            return self.runGruOnWindows(X, windowStartTimes, checkpointed)
+
+        return tf.stack([
+            self.runGruOnWindow(X, windowStartTime)
+            for windowStartTime in windowStartTimes
+        ])
+
+    def sampleWindowStartTimes(self, currentTime, numWindows=None):
+        """
+        Samples the starting timesteps of the windows which are to be
+        stored in the memory
+
+        :param currentTime: current timestep, every sampled window ends
+        before the current timestep
+        :param numWindows: Number of windows to sample, if None then
+        self.memorySize windows are sampled
+        :return: Window start times, it is a numpy array of shape (numWindows,)
+        """
+
+        if numWindows is None:
+            numWindows = self.memorySize
+
         sampleLow = 0
         sampleHigh = currentTime - self.windowSize
 
-        self.memory = [None] * self.memorySize
-        self.q = [None] * self.memorySize
+        return np.array([
+            np.random.randint(sampleLow, sampleHigh + 1)
+            for _ in range(numWindows)
+        ], dtype=np.int64)
 
-        for i in range(self.memorySize):
-            windowStartTime = np.random.randint(
-                sampleLow,
-                sampleHigh + 1
-            )
+    def gatherWindows(self, X, windowStartTimes):
+        """
+        Gathers the windows starting at the provided timesteps
 
-            self.memory[i] = self.runGruOnWindow(X, windowStartTime)
-            self.q[i] = Y[windowStartTime + self.windowSize - 1]
+        :param X: Features, has shape (n, self.inputShape)
+        :param windowStartTimes: Starting timestep of each window, it is a numpy
+        array of shape (numWindows,)
+        :return: The windows, it has shape (numWindows, self.windowSize, self.inputShape)
+        """
 
-        self.memory = tf.stack(self.memory)
-        self.q = tf.convert_to_tensor(self.q, dtype=tf.float64)
+        return X[
+            np.expand_dims(windowStartTimes, axis=1)
+            + np.arange(self.windowSize)
+        ]
 
-        logger.log(f'Memory Shape: {self.memory.shape}, Out Shape: {self.q.shape}', 2, self.buildMemory.__name__)
+    def runGruOnWindows(self, X, windowStartTimes, checkpointed=False):
+        """
+        Runs GRU on all the windows together as a single batch and returns
+        the final state of each window
+
+        :param X: Features, has shape (n, self.inputShape)
+        :param windowStartTimes: Starting timestep of each window, it is a numpy
+        array of shape (numWindows,)
+        :param checkpointed: If True, then the intermediate GRU states are not
+        recorded for the gradient computation, they are recomputed instead
+        :return: The final states after running on the windows, it has shape
+        (numWindows, self.encoderStateSize)
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        windows = self.gatherWindows(X, windowStartTimes)
+        logger.log(f'Windows Shape: {windows.shape}', 2, self.runGruOnWindows.__name__)
+
+        gruEncoderRnn = tf.recompute_grad(self.gruEncoderRnn) if checkpointed else self.gruEncoderRnn
+        finalStates = gruEncoderRnn(tf.convert_to_tensor(windows, dtype=self.dtype))
+        logger.log(f'GRU final states shape: {finalStates.shape}', 2, self.runGruOnWindows.__name__)
+
+        return finalStates
 
     def runGruOnWindow(self, X, windowStartTime):
         """
@@ -469,56 +1060,262 @@ class ExtremeTime:
         )[1]
 
         lstmHiddenState = self.lstmStateList[0]
+        pred = self.computePrediction(
+            lstmHiddenState,
+            self.memory,
+            self.q,
+            self.memoryLogCounts
+        )
+
+        logger.log(f'Prediction: {pred}', 2, self.predictTimestep.__name__)
+
+        return pred
+
+    def predictSequence(self, X):
+        """
+        Predict on all the Timesteps of a sequence together. The LSTM is run
+        over the whole sequence in a single pass, after which the attention
+        over the memory and the blending of the outputs is computed for all
+        the timesteps at once (see computeSequencePredictions)
+
+        :param X: Features, has shape (n, self.inputShape)
+        :return: The predicted values on all the timesteps, it has shape (n,)
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        if self.compiledSequencePredictions is None:
+            logger.log('Compiling Sequence Predictions', 1, self.predictSequence.__name__)
+            self.compiledSequencePredictions = tf.function(
+                self.computeSequencePredictions,
+                input_signature=[
+                    tf.TensorSpec((None, self.inputDimension), self.dtype),
+                    tf.TensorSpec((None, self.encoderStateSize), self.dtype),
+                    tf.TensorSpec((None,), self.dtype),
+                    tf.TensorSpec((None,), self.dtype),
+                    [
+                        tf.TensorSpec((1, self.lstmStateSize), self.dtype),
+                        tf.TensorSpec((1, self.lstmStateSize), self.dtype)
+                    ]
+                ]
+            )
+
+        memoryLogCounts = self.memoryLogCounts
+        if memoryLogCounts is None:
+            memoryLogCounts = tf.zeros(self.memory.shape[0], dtype=self.dtype)
+
+        Ypred, self.lstmStateList = self.compiledSequencePredictions(
+            tf.convert_to_tensor(X, dtype=self.dtype),
+            self.memory,
+            self.q,
+            memoryLogCounts,
+            self.lstmStateList
+        )
+
+        logger.log(f'Prediction Shape: {Ypred.shape}', 2, self.predictSequence.__name__)
+
+        return Ypred
+
+    def computeSequencePredictions(self, X, memory, q, memoryLogCounts, lstmStateList):
+        """
+        Computes the predictions on all the timesteps of a sequence. The attention
+        weights of all the timesteps are computed as a single (n, memorySize)
+        matrix. This is meant to be compiled into a graph using tf.function
+
+        :param X: Features, has shape (n, self.inputShape)
+        :param memory: Memory states, it has shape (self.memorySize, self.encoderStateSize)
+        :param q: Memory outputs, it has shape (self.memorySize,)
+        :param memoryLogCounts: Log of the number of windows represented by each
+        memory state, it has shape (self.memorySize,)
+        :param lstmStateList: LSTM states at the start of the sequence
+        :return: The predicted values on all the timesteps which has shape (n,)
+        and the LSTM states at the end of the sequence
+        """
+
+        lstmOutputs = self.lstmRnn(
+            tf.expand_dims(X, axis=0),
+            initial_state=lstmStateList
+        )
+
+        lstmHiddenStates = tf.squeeze(lstmOutputs[0], axis=0)
+        embeddings = self.embeddingDense(lstmHiddenStates)
+
+        attentionScores = tf.linalg.matmul(
+            embeddings,
+            memory,
+            transpose_b=True
+        ) + memoryLogCounts
+
+        o1 = tf.squeeze(self.outDense(lstmHiddenStates), axis=1)
+
+        if self.attentionTopK is None:
+            o2 = tf.linalg.matvec(tf.nn.softmax(attentionScores), q)
+        else:
+            topKScores, topKSlots = tf.math.top_k(
+                attentionScores,
+                tf.minimum(self.attentionTopK, tf.shape(memory)[0])
+            )
+            o2 = tf.reduce_sum(tf.nn.softmax(topKScores) * tf.gather(q, topKSlots), axis=1)
+
+        bSigmoid = tf.nn.sigmoid(self.b)
+
+        return bSigmoid * o1 + (1 - bSigmoid) * o2, lstmOutputs[1:]
+
+    def computePrediction(self, lstmHiddenState, memory, q, memoryLogCounts=None):
+        """
+        Computes the prediction from the LSTM hidden state by blending the
+        output of the dense layer with the attention weighted memory outputs
+
+        :param lstmHiddenState: Hidden state of the LSTM, it has shape
+        (1, self.lstmStateSize)
+        :param memory: Memory states, it has shape (self.memorySize, self.encoderStateSize)
+        :param q: Memory outputs, it has shape (self.memorySize,)
+        :param memoryLogCounts: Log of the number of windows represented by each
+        memory state (see compactMemory), if None then each memory state represents
+        a single window
+        :return: The predicted value
+        """
+
+        logger = GlobalLogger.getLogger()
 
         embedding = tf.squeeze(self.embeddingDense(lstmHiddenState))
-        logger.log(f'Embedding Shape: {embedding.shape}', 2, self.predictTimestep.__name__)
+        logger.log(f'Embedding Shape: {embedding.shape}', 2, self.computePrediction.__name__)
+
+        if self.attentionTopK is None:
+            attentionWeights = self.computeAttention(embedding, memory, memoryLogCounts)
+        else:
+            attentionWeights, attentionSlots = \
+                self.computeTopKAttention(embedding, memory, memoryLogCounts)
+            q = tf.gather(q, attentionSlots)
 
-        attentionWeights = self.computeAttention(embedding)
-        logger.log(f'Attention Shape: {attentionWeights.shape}', 2, self.predictTimestep.__name__)
+        logger.log(f'Attention Shape: {attentionWeights.shape}', 2, self.computePrediction.__name__)
 
         o1 = tf.squeeze(self.outDense(lstmHiddenState))
-        logger.log(f'Output1: {o1}', 2, self.predictTimestep.__name__)
+        logger.log(f'Output1: {o1}', 2, self.computePrediction.__name__)
 
-        o2 = tf.reduce_sum(attentionWeights * self.q)
-        logger.log(f'Output2: {o2}', 2, self.predictTimestep.__name__)
+        o2 = tf.reduce_sum(attentionWeights * q)
+        logger.log(f'Output2: {o2}', 2, self.computePrediction.__name__)
 
         bSigmoid = tf.nn.sigmoid(self.b)
-        pred = bSigmoid * o1 + (1 - bSigmoid) * o2
 
-        logger.log(f'Prediction: {pred}', 2, self.predictTimestep.__name__)
-
-        return pred
+        return bSigmoid * o1 + (1 - bSigmoid) * o2
 
-    def computeAttention(self, embedding):
+    def computeAttention(self, embedding, memory=None, memoryLogCounts=None):
         """
         Computes Attention Weights by taking softmax of the inner product
         between embedding of the input and the memory states
 
         :param embedding: Embedding of the input
+        :param memory: Memory states, if None then the model's memory is used
+        :param memoryLogCounts: Log of the number of windows represented by each
+        memory state, it is added to the inner products, if None then nothing is added
         :return: Attention Weight Values
         """
 
-        return tf.nn.softmax(tf.squeeze(tf.linalg.matmul(
-            self.memory,
+        if memory is None:
+            memory = self.memory
+
+        attentionScores = tf.squeeze(tf.linalg.matmul(
+            memory,
             tf.expand_dims(embedding, axis=1)
-        )))
+        ))
+
+        if memoryLogCounts is not None:
+            attentionScores += memoryLogCounts
+
+        return tf.nn.softmax(attentionScores)
+
+    def computeTopKAttention(self, embedding, memory=None, memoryLogCounts=None):
+        """
+        Computes Attention Weights over only the attentionTopK memory states
+        which have the highest inner product with the embedding of the input,
+        by taking softmax of these inner products
+
+        :param embedding: Embedding of the input
+        :param memory: Memory states, if None then the model's memory is used
+        :param memoryLogCounts: Log of the number of windows represented by each
+        memory state, it is added to the inner products, if None then nothing is added
+        :return: Attention Weight Values of shape (k,) and the memory slots they
+        correspond to, which has shape (k,), where k = min(attentionTopK, numSlots)
+        """
+
+        if memory is None:
+            memory = self.memory
+
+        attentionScores = tf.linalg.matvec(memory, embedding)
+
+        if memoryLogCounts is not None:
+            attentionScores += memoryLogCounts
+
+        topKScores, topKSlots = tf.math.top_k(
+            attentionScores,
+            tf.minimum(self.attentionTopK, tf.shape(memory)[0])
+        )
+
+        return tf.nn.softmax(topKScores), topKSlots
+
+    def prepareObservation(self, targetValue, exogenousValue):
+        """
+        Prepare a single observation as the features of a single timestep
+
+        :param targetValue: Value of the target variable
+        :param exogenousValue: Exogenous variables, it is None or a numpy array
+        of shape (numExoVariables,)
+        :return: Features, has shape (1, self.inputShape)
+        """
+
+        assert (
+            (exogenousValue is None and self.inputDimension == 1)
+            or
+            (exogenousValue is not None and exogenousValue.shape == (self.inputDimension - 1,))
+        )
+
+        return Utility.prepareDataPred(
+            np.array([targetValue], dtype=np.float64),
+            None if exogenousValue is None else np.expand_dims(exogenousValue, axis=0)
+        )
 
     def buildModel(self):
         """ Build Model Architecture """
 
-        self.gruEncoder = tf.keras.layers.GRUCell(self.encoderStateSize)
+        self.gruEncoder = tf.keras.layers.GRUCell(self.encoderStateSize, dtype=self.dtype)
         self.gruEncoder.build(input_shape=(self.inputDimension,))
 
-        self.lstm = tf.keras.layers.LSTMCell(self.lstmStateSize)
+        self.gruEncoderRnn = tf.keras.layers.RNN(self.gruEncoder, dtype=self.dtype)
+        self.compiledSequenceGradients = None
+        self.compiledSequencePredictions = None
+
+        self.lstm = tf.keras.layers.LSTMCell(self.lstmStateSize, dtype=self.dtype)
         self.lstm.build(input_shape=(self.inputDimension,))
 
-        self.outDense = tf.keras.layers.Dense(1)
+        self.lstmRnn = tf.keras.layers.RNN(
+            self.lstm,
+            return_sequences=True,
+            return_state=True,
+            dtype=self.dtype
+        )
+
+        self.outDense = tf.keras.layers.Dense(1, dtype=self.dtype)
         self.outDense.build(input_shape=(self.lstmStateSize,))
 
         self.embeddingDense = \
-            tf.keras.layers.Dense(self.encoderStateSize)
+            tf.keras.layers.Dense(self.encoderStateSize, dtype=self.dtype)
         self.embeddingDense.build(input_shape=(self.lstmStateSize,))
 
+    def getTrainableVariables(self):
+        """
+        Get the Trainable Variables of the model
+
+        :return: List of trainable variables
+        """
+
+        return \
+            self.gruEncoder.trainable_variables \
+            + self.lstm.trainable_variables \
+            + self.outDense.trainable_variables \
+            + self.embeddingDense.trainable_variables \
+            + [self.b]
+
     def getInitialLstmStates(self):
         """
         Computes Initial LSTM States (i.e. both of the initial states)
@@ -528,7 +1325,7 @@ class ExtremeTime:
 
         return self.lstm.get_initial_state(
             batch_size=1,
-            dtype=tf.float64
+            dtype=self.dtype
         )
 
     def getInitialGruEncoderState(self):
@@ -540,5 +1337,5 @@ class ExtremeTime:
 
         return self.gruEncoder.get_initial_state(
             batch_size=1,
-            dtype=tf.float64
+            dtype=self.dtype
         )
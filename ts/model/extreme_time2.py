@@ -38,8 +38,13 @@ class ExtremeTime2:
         model.inputDimension = loadDict['inputDimension']
         model.embeddingSize = loadDict['embeddingSize']
         model.contextSize = loadDict['contextSize']
+        model.attentionTopK = loadDict.get('attentionTopK', None)
+        model.dtype = tf.as_dtype(loadDict.get('dtype', 'float64'))
+        model.fusedEncoder = loadDict.get('fusedEncoder', False)
         model.memory = loadDict['memory']
         model.context = loadDict['context']
+        model.memoryValues = loadDict.get('memoryValues', None)
+        model.memoryLogCounts = loadDict.get('memoryLogCounts', None)
 
         model.buildModel()
         model.gruInput.set_weights(loadDict['gruInput'])
@@ -58,6 +63,9 @@ class ExtremeTime2:
             embeddingSize=10,
             contextSize=10,
             numExoVariables=0,
+            attentionTopK=None,
+            dtype='float64',
+            fusedEncoder=False,
             loadModel=False
     ):
         """
@@ -71,6 +79,18 @@ class ExtremeTime2:
         :param embeddingSize: Size of the hidden state of the GRU encoder
         :param contextSize: Size of context produced from historical sequences
         :param numExoVariables: Number of exogenous variables the model takes as input
+        :param attentionTopK: If not None, then at every timestep only the
+        attentionTopK memory slots with the highest attention scores are attended
+        to (i.e. the softmax is taken over only these), and only the context of
+        these slots is used for the prediction, else all the memory slots are
+        attended to
+        :param dtype: Floating point type of the model, i.e. of its layers, memory
+        and states, e.g. 'float64' or 'float32' (which is faster). It only applies
+        to this model, the default float type of Keras is left unchanged
+        :param fusedEncoder: If True, then while building the memory, the memory
+        and context GRUs are run together as a single GRU (see runFusedGruOnWindow)
+        which reads each window once, else they are run separately. Both produce
+        the same memory and context
         :param loadModel: True or False - do not use this parameter !,
         this is for internal use only (i.e. it is an implementation detail)
         If True, then object is normally created, else object is created
@@ -78,8 +98,6 @@ class ExtremeTime2:
         is created by the static load method
         """
 
-        tf.keras.backend.set_floatx('float64')
-
         if loadModel:
             return
 
@@ -92,8 +110,13 @@ class ExtremeTime2:
         self.embeddingSize = embeddingSize
         self.contextSize = contextSize
         self.inputDimension = numExoVariables + 1
+        self.attentionTopK = attentionTopK
+        self.dtype = tf.as_dtype(dtype)
+        self.fusedEncoder = fusedEncoder
         self.memory = None
         self.context = None
+        self.memoryValues = None
+        self.memoryLogCounts = None
 
         logger.log('Building Model Parameters', 1, self.__init__.__name__)
 
@@ -112,7 +135,8 @@ class ExtremeTime2:
             optimizer=tf.optimizers.Adam(),
             modelSavePath=None,
             verboseLevel=1,
-            returnLosses=True
+            returnLosses=True,
+            compiled=False
     ):
         """
         Train the Model Parameters on the provided data
@@ -133,6 +157,9 @@ class ExtremeTime2:
         :param returnLosses: If True, then losses are returned, else losses are not
         returned
         is returned, else None is returned
+        :param compiled: If True, then the loss and gradients of each sequence are
+        computed by a graph compiled function (see trainSequenceCompiled), else
+        they are computed eagerly
         """
 
         logger = GlobalLogger.getLogger()
@@ -148,6 +175,7 @@ class ExtremeTime2:
         logger.log('Begin Training', 1, self.train.__name__)
 
         losses = []
+        trainSequence = self.trainSequenceCompiled if compiled else self.trainSequence
 
         for iteration in range(numIterations):
 
@@ -162,7 +190,7 @@ class ExtremeTime2:
                 seqEndTime = min(seqStartTime + sequenceLength, n - 1)
 
                 startTime = time.time()
-                loss = self.trainSequence(X, Y, seqStartTime, seqEndTime, optimizer)
+                loss = trainSequence(X, Y, seqStartTime, seqEndTime, optimizer)
                 endTime = time.time()
                 timeTaken = endTime - startTime
 
@@ -196,6 +224,130 @@ class ExtremeTime2:
         if returnLosses:
             return np.array(losses)
 
+    def trainBatch(
+            self,
+            targetSeriesList,
+            sequenceLength,
+            exogenousSeriesList=None,
+            numIterations=1,
+            optimizer=tf.optimizers.Adam(),
+            modelSavePath=None,
+            verboseLevel=1,
+            returnLosses=True
+    ):
+        """
+        Train the Model Parameters on multiple series at once. The series are
+        treated as independent streams which are advanced in lockstep, each
+        stream has its own input GRU's state and its own memory sampled from
+        its own series. On each sequence, the predictions of all the streams
+        are computed together by a graph compiled function and a single loss,
+        the mean squared error over all the streams, is used for the gradient
+        step. A stream which is shorter than the others stops contributing to
+        the loss once it ends. After training, the model continues from the end
+        of the first series, i.e. its state and memory are those of the first
+        series, as they would be after training on it with train
+        :param targetSeriesList: List of Univariate Series of the Target Variable,
+        each should be a numpy array of shape (n_i + self.forecastHorizon,)
+        :param sequenceLength: Length of each training sequence
+        :param exogenousSeriesList: List of the Series of exogenous Variables
+        corresponding to the target series, each should be a numpy array of shape
+        (n_i, numExoVariables), it can be None only if numExoVariables is 0 in
+        which case the exogenous variables are not considered
+        :param numIterations: Number of iterations of training to be performed
+        :param optimizer: Optimizer of training the parameters
+        :param modelSavePath: Path where to save the model parameters after
+        each training an a sequence, if None then parameters are not saved
+        :param verboseLevel: Verbose level, 0 is nothing, greater values increases
+        the information printed to the console
+        :param returnLosses: If True, then losses are returned, else losses are not
+        returned
+        :return: If returnLosses is True, then numpy array of losses of shape (numSeq,)
+        is returned, else None is returned
+        """
+
+        logger = GlobalLogger.getLogger()
+        verbose = ConsoleLogger(verboseLevel)
+
+        if exogenousSeriesList is None:
+            exogenousSeriesList = [None] * len(targetSeriesList)
+
+        assert (len(targetSeriesList) == len(exogenousSeriesList))
+
+        XList = []
+        YList = []
+        for targetSeries, exogenousSeries in zip(targetSeriesList, exogenousSeriesList):
+            assert (Utility.isExoShapeValid(exogenousSeries, self.inputDimension - 1))
+            X, Y = Utility.prepareDataTrain(targetSeries, exogenousSeries, self.forecastHorizon)
+
+            assert (self.windowSize < X.shape[0])
+            XList.append(X)
+            YList.append(Y)
+
+        nList = [X.shape[0] for X in XList]
+        logger.log(f'Number of streams: {len(XList)}, Train lens: {nList}', 2, self.trainBatch.__name__)
+
+        logger.log('Begin Training', 1, self.trainBatch.__name__)
+
+        losses = []
+        states = self.gruInput.get_initial_state(
+            batch_size=len(XList),
+            dtype=self.dtype
+        )
+
+        for iteration in range(numIterations):
+
+            verbose.log(f'begin iteration {iteration}', 1)
+
+            seqStartTime = self.windowSize
+            cumulIterLoss = 0.0
+            numSeq = 0
+
+            iterStartTime = time.time()
+            while seqStartTime < max(nList):
+
+                startTime = time.time()
+                loss, states = self.trainBatchSequence(
+                    XList, YList,
+                    seqStartTime, sequenceLength,
+                    states,
+                    optimizer
+                )
+                endTime = time.time()
+                timeTaken = endTime - startTime
+
+                cumulIterLoss += loss
+                numSeq += 1
+
+                verbose.log(f'start timestep: {seqStartTime}'
+                            + f' | time taken: {timeTaken : .2f} sec'
+                            + f' | Loss: {loss}', 2)
+
+                seqStartTime += sequenceLength
+
+            iterEndTime = time.time()
+            iterTimeTaken = iterEndTime - iterStartTime
+            avgIterLoss = cumulIterLoss / numSeq
+
+            verbose.log(f'Completed Iteration: {iteration}'
+                        + f' | time taken: {iterTimeTaken : .2f} sec'
+                        + f' | Avg Iteration Loss: {avgIterLoss}', 1)
+
+            if returnLosses:
+                losses.append(avgIterLoss)
+
+            if modelSavePath is not None:
+                self.state = states[:1]
+                self.buildMemory(XList[0], nList[0])
+
+                logger.log(f'Saving Model at {modelSavePath}', 1, self.trainBatch.__name__)
+                self.save(modelSavePath)
+
+        self.state = states[:1]
+        self.buildMemory(XList[0], nList[0])
+
+        if returnLosses:
+            return np.array(losses)
+
     def predict(
             self,
             targetSeries,
@@ -230,6 +382,71 @@ class ExtremeTime2:
 
         return Ypred
 
+    def predictNext(
+            self,
+            targetValue,
+            exogenousValue=None
+    ):
+        """
+        Forecast using the model parameters on a single new observation. The
+        recurrent state carried by the model is advanced by one timestep, hence
+        calling this on every observation of a series gives the same forecasts
+        as calling predict on the whole series
+        :param targetValue: Value of the target variable at the current timestep
+        :param exogenousValue: Exogenous variables at the current timestep, it should
+        be a numpy array of shape (numExoVariables,), it can be None only if
+        numExoVariables is 0
+        :return: Forecast target predicted by the model, the horizon of the target
+        is the same as self.forecastHorizon
+        """
+
+        X = self.prepareObservation(targetValue, exogenousValue)
+
+        return self.predictTimestep(X, 0).numpy()
+
+    def update(
+            self,
+            targetValue,
+            exogenousValue=None
+    ):
+        """
+        Advance the recurrent state carried by the model by one timestep using
+        a single new observation, without computing the forecast
+        :param targetValue: Value of the target variable at the current timestep
+        :param exogenousValue: Exogenous variables at the current timestep, it should
+        be a numpy array of shape (numExoVariables,), it can be None only if
+        numExoVariables is 0
+        :return: None
+        """
+
+        X = self.prepareObservation(targetValue, exogenousValue)
+
+        self.state, _ = self.gruInput(X, self.state)
+
+    def snapshotState(self):
+        """
+        Get a snapshot of the recurrent state carried by the model. Along with
+        restoreState, this allows multiple streams of observations to share a
+        single model, by restoring a stream's state before calling predictNext
+        or update on its observation and taking its snapshot afterwards
+        :return: Snapshot of the input GRU's state
+        """
+
+        return self.state
+
+    def restoreState(self, stateSnapshot):
+        """
+        Restore the recurrent state carried by the model from a snapshot
+        :param stateSnapshot: Snapshot of the input GRU's state returned by snapshotState,
+        if None then the initial state is restored
+        :return: None
+        """
+
+        if stateSnapshot is None:
+            stateSnapshot = self.getInitialState()
+
+        self.state = stateSnapshot
+
     def evaluate(
             self,
             targetSeries,
@@ -304,8 +521,13 @@ class ExtremeTime2:
             'inputDimension': self.inputDimension,
             'embeddingSize': self.embeddingSize,
             'contextSize': self.contextSize,
+            'attentionTopK': self.attentionTopK,
+            'dtype': self.dtype.name,
+            'fusedEncoder': self.fusedEncoder,
             'memory': self.memory,
             'context': self.context,
+            'memoryValues': self.memoryValues,
+            'memoryLogCounts': self.memoryLogCounts,
             'gruInput': self.gruInput.get_weights(),
             'gruMemory': self.gruMemory.get_weights(),
             'gruContext': self.gruContext.get_weights(),
@@ -341,7 +563,7 @@ class ExtremeTime2:
                 pred = self.predictTimestep(X, t)
                 Ypred.append(pred)
 
-            Ypred = tf.convert_to_tensor(Ypred, dtype=tf.float64)
+            Ypred = tf.convert_to_tensor(Ypred, dtype=self.dtype)
             logger.log(f'Prediction Shape: {Ypred.shape}', 2, self.trainSequence.__name__)
 
             loss = tf.keras.losses.MSE(
@@ -350,11 +572,7 @@ class ExtremeTime2:
             )
             logger.log(f'Loss: {loss}', 2, self.trainSequence.__name__)
 
-        trainableVars = \
-            self.gruInput.trainable_variables \
-            + self.gruMemory.trainable_variables \
-            + self.gruContext.trainable_variables \
-            + self.outDense.trainable_variables
+        trainableVars = self.getTrainableVariables()
 
         logger.log('Performing Gradient Descent', 1, self.trainSequence.__name__)
 
@@ -368,6 +586,237 @@ class ExtremeTime2:
 
         return loss
 
+    def trainSequenceCompiled(self, X, Y, seqStartTime, seqEndTime, optimizer):
+        """
+        Same as trainSequence, but the memory build, the prediction rollout
+        and the loss along with its gradients are computed by a graph compiled
+        function. The function has a length agnostic input signature, hence it
+        is traced only once irrespective of the sequence lengths
+        :param X: Features, has shape (n, self.inputShape)
+        :param Y: Targets, has shape (n,)
+        :param seqStartTime: Sequence Start Time
+        :param seqEndTime: Sequence End Time
+        :param optimizer: The optimization algorithm
+        :return: The loss value resulted from training on the sequence
+        """
+
+        logger = GlobalLogger.getLogger()
+        logger.log('Begin Compiled Training on Sequence', 1, self.trainSequenceCompiled.__name__)
+        logger.log(
+            f'Sequence start: {seqStartTime}, Sequence end: {seqEndTime}',
+            2,
+            self.trainSequenceCompiled.__name__
+        )
+
+        if self.compiledSequenceGradients is None:
+            logger.log('Compiling Sequence Gradients', 1, self.trainSequenceCompiled.__name__)
+            self.compiledSequenceGradients = tf.function(
+                self.computeSequenceGradients,
+                input_signature=[
+                    tf.TensorSpec((None, self.windowSize, self.inputDimension), self.dtype),
+                    tf.TensorSpec((None, self.inputDimension), self.dtype),
+                    tf.TensorSpec((None,), self.dtype),
+                    tf.TensorSpec((1, self.embeddingSize), self.dtype)
+                ]
+            )
+
+        windowStartTimes = self.sampleWindowStartTimes(seqStartTime)
+
+        self.memoryValues = self.memoryLogCounts = None
+        loss, grads, self.memory, self.context, self.state = \
+            self.compiledSequenceGradients(
+                tf.convert_to_tensor(self.gatherWindows(X, windowStartTimes), dtype=self.dtype),
+                tf.convert_to_tensor(X[seqStartTime: seqEndTime + 1], dtype=self.dtype),
+                tf.convert_to_tensor(Y[seqStartTime: seqEndTime + 1], dtype=self.dtype),
+                self.state
+            )
+
+        logger.log(f'Loss: {loss}', 2, self.trainSequenceCompiled.__name__)
+        logger.log('Performing Gradient Descent', 1, self.trainSequenceCompiled.__name__)
+
+        optimizer.apply_gradients(zip(
+            grads,
+            self.getTrainableVariables()
+        ))
+
+        return loss
+
+    def trainBatchSequence(self, XList, YList, seqStartTime, sequenceLength, states, optimizer):
+        """
+        Trains on the sequence starting at seqStartTime of every stream together,
+        the sequences are padded to the same length and the padded timesteps are
+        masked out of the loss
+        :param XList: Features of each stream, each has shape (n_i, self.inputShape)
+        :param YList: Targets of each stream, each has shape (n_i,)
+        :param seqStartTime: Sequence Start Time
+        :param sequenceLength: Length of each training sequence
+        :param states: Input GRU's states of the streams, it has shape
+        (numStreams, self.embeddingSize)
+        :param optimizer: The optimization algorithm
+        :return: The loss value resulted from training on the sequences and the
+        input GRU's states of the streams at the end of the sequences
+        """
+
+        logger = GlobalLogger.getLogger()
+        logger.log('Begin Training on Batch Sequence', 1, self.trainBatchSequence.__name__)
+
+        if self.compiledBatchSequenceGradients is None:
+            logger.log('Compiling Batch Sequence Gradients', 1, self.trainBatchSequence.__name__)
+            self.compiledBatchSequenceGradients = tf.function(
+                self.computeBatchSequenceGradients,
+                input_signature=[
+                    tf.TensorSpec(
+                        (None, self.memorySize, self.windowSize, self.inputDimension),
+                        self.dtype
+                    ),
+                    tf.TensorSpec((None, None, self.inputDimension), self.dtype),
+                    tf.TensorSpec((None, None), self.dtype),
+                    tf.TensorSpec((None, None), self.dtype),
+                    tf.TensorSpec((None, self.embeddingSize), self.dtype)
+                ]
+            )
+
+        seqEndTimes = [
+            min(seqStartTime + sequenceLength, X.shape[0] - 1)
+            for X in XList
+        ]
+        seqLength = max(seqEndTimes) - seqStartTime + 1
+        logger.log(f'Sequence start: {seqStartTime}, Sequence ends: {seqEndTimes}', 2, self.trainBatchSequence.__name__)
+
+        windows = np.zeros((len(XList), self.memorySize, self.windowSize, self.inputDimension))
+        Xseq = np.zeros((len(XList), seqLength, self.inputDimension))
+        Yseq = np.zeros((len(XList), seqLength))
+        mask = np.zeros((len(XList), seqLength))
+
+        for i, (X, Y, seqEndTime) in enumerate(zip(XList, YList, seqEndTimes)):
+            windows[i] = self.gatherWindows(
+                X,
+                self.sampleWindowStartTimes(min(seqStartTime, X.shape[0]))
+            )
+
+            streamLength = max(seqEndTime - seqStartTime + 1, 0)
+            Xseq[i, :streamLength] = X[seqStartTime: seqEndTime + 1]
+            Yseq[i, :streamLength] = Y[seqStartTime: seqEndTime + 1]
+            mask[i, :streamLength] = 1
+
+        loss, grads, states = self.compiledBatchSequenceGradients(
+            tf.convert_to_tensor(windows, dtype=self.dtype),
+            tf.convert_to_tensor(Xseq, dtype=self.dtype),
+            tf.convert_to_tensor(Yseq, dtype=self.dtype),
+            tf.convert_to_tensor(mask, dtype=self.dtype),
+            states
+        )
+
+        logger.log(f'Loss: {loss}', 2, self.trainBatchSequence.__name__)
+        logger.log('Performing Gradient Descent', 1, self.trainBatchSequence.__name__)
+
+        optimizer.apply_gradients(zip(
+            grads,
+            self.getTrainableVariables()
+        ))
+
+        return loss, states
+
+    def computeBatchSequenceGradients(self, windows, Xseq, Yseq, mask, states):
+        """
+        Builds the memory and context of every stream from its windows, predicts
+        on every timestep of the sequences of all the streams together and computes
+        the loss over the unmasked timesteps along with its gradients. The state
+        of a stream is not advanced on its masked timesteps. This is meant to be
+        compiled into a graph using tf.function
+        :param windows: Memory windows of the streams, has shape
+        (numStreams, self.memorySize, self.windowSize, self.inputShape)
+        :param Xseq: Sequence features, has shape (numStreams, seqLength, self.inputShape)
+        :param Yseq: Sequence targets, has shape (numStreams, seqLength)
+        :param mask: 1 on the timesteps which are a part of the sequence of the
+        stream and 0 on the padded timesteps, has shape (numStreams, seqLength)
+        :param states: Input GRU's states of the streams at the start of the
+        sequence, has shape (numStreams, self.embeddingSize)
+        :return: loss, gradients of the loss with respect to the trainable variables
+        and the input GRU's states of the streams at the end of the sequence
+        """
+
+        trainableVars = self.getTrainableVariables()
+        numStreams = tf.shape(windows)[0]
+        seqLength = tf.shape(Xseq)[1]
+
+        with tf.GradientTape() as tape:
+            flatWindows = tf.reshape(windows, (-1, self.windowSize, self.inputDimension))
+            memory = tf.reshape(
+                self.gruMemoryRnn(flatWindows),
+                (numStreams, self.memorySize, self.embeddingSize)
+            )
+            context = tf.reshape(
+                self.gruContextRnn(flatWindows),
+                (numStreams, self.memorySize, self.contextSize)
+            )
+
+            def rolloutStep(t, states, Ypred):
+                nextStates, _ = self.gruInput(Xseq[:, t], states)
+                states = tf.where(mask[:, t:t + 1] > 0, nextStates, states)
+
+                pred = self.computeBatchPrediction(nextStates, memory, context)
+                return t + 1, states, Ypred.write(t, pred)
+
+            _, states, Ypred = tf.while_loop(
+                lambda t, *_: t < seqLength,
+                rolloutStep,
+                [
+                    tf.constant(0),
+                    states,
+                    tf.TensorArray(self.dtype, size=seqLength)
+                ]
+            )
+
+            squaredErrors = tf.square(Yseq - tf.transpose(Ypred.stack()))
+            loss = tf.reduce_sum(mask * squaredErrors) / tf.reduce_sum(mask)
+
+        grads = tape.gradient(loss, trainableVars)
+
+        return loss, grads, states
+
+    def computeSequenceGradients(self, windows, Xseq, Yseq, state):
+        """
+        Builds the memory and context from the given windows, predicts on every
+        timestep of the sequence and computes the loss along with its gradients.
+        This is meant to be compiled into a graph using tf.function
+        :param windows: Memory windows, has shape (self.memorySize, self.windowSize, self.inputShape)
+        :param Xseq: Sequence features, has shape (seqLength, self.inputShape)
+        :param Yseq: Sequence targets, has shape (seqLength,)
+        :param state: Input GRU's state at the start of the sequence
+        :return: loss, gradients of the loss with respect to the trainable variables,
+        memory, context and the input GRU's state at the end of the sequence
+        """
+
+        trainableVars = self.getTrainableVariables()
+        seqLength = tf.shape(Xseq)[0]
+
+        with tf.GradientTape() as tape:
+            memory = self.gruMemoryRnn(windows)
+            context = self.gruContextRnn(windows)
+
+            def rolloutStep(t, state, Ypred):
+                state, _ = self.gruInput(tf.expand_dims(Xseq[t], axis=0), state)
+
+                pred = self.computePrediction(state, memory, context)
+                return t + 1, state, Ypred.write(t, pred)
+
+            _, state, Ypred = tf.while_loop(
+                lambda t, *_: t < seqLength,
+                rolloutStep,
+                [
+                    tf.constant(0),
+                    state,
+                    tf.TensorArray(self.dtype, size=seqLength)
+                ]
+            )
+
+            loss = tf.keras.losses.MSE(Yseq, Ypred.stack())
+
+        grads = tape.gradient(loss, trainableVars)
+
+        return loss, grads, memory, context, state
+
     def buildMemory(self, X, currentTime):
         """
         Build Model Memory using the timesteps seen up till now
@@ -382,22 +831,23 @@ class ExtremeTime2:
         logger.log(f'Current Time: {currentTime}', 2, self.buildMemory.__name__)
         assert (currentTime >= self.windowSize)
 
-        sampleLow = 0
-        sampleHigh = currentTime - self.windowSize
+        windowStartTimes = self.sampleWindowStartTimes(currentTime)
 
         self.memory = [None] * self.memorySize
         self.context = [None] * self.memorySize
 
-        for i in range(self.memorySize):
-            windowStartTime = np.random.randint(
-                sampleLow,
-                sampleHigh + 1
-            )
-
-            self.memory[i], self.context[i] = self.runGruOnWindow(X, windowStartTime)
+        if self.fusedEncoder:
+            fusedWeights = self.getFusedEncoderWeights()
+            for i, windowStartTime in enumerate(windowStartTimes):
+                self.memory[i], self.context[i] = \
+                    self.runFusedGruOnWindow(X, windowStartTime, fusedWeights)
+        else:
+            for i, windowStartTime in enumerate(windowStartTimes):
+                self.memory[i], self.context[i] = self.runGruOnWindow(X, windowStartTime)
 
         self.memory = tf.stack(self.memory)
         self.context = tf.stack(self.context)
+        self.memoryValues = self.memoryLogCounts = None
 
         logger.log(
             f'Memory Shape: {self.memory.shape}, Context Shape: {self.context.shape}',
@@ -405,6 +855,92 @@ class ExtremeTime2:
             self.buildMemory.__name__
         )
 
+    def compactMemory(self, numPrototypes, numIterations=20):
+        """
+        Compacts the memory built after training into a smaller number of
+        prototypes, by clustering the memory states using k-means. The output
+        layer has separate weights for the context of each memory slot, hence
+        the contexts cannot be averaged directly. Instead the contribution of
+        the context of each slot to the prediction (i.e. the inner product of
+        the context with the output layer weights of its slot) is computed, and
+        the contribution of a prototype is the mean contribution of its cluster.
+        The log of the size of each cluster is added to the attention scores of
+        its prototype, so that a prototype receives as much attention as its
+        whole cluster would have. The compacted memory is used for prediction
+        and is saved along with the model, it is replaced the next time the
+        memory is built
+        :param numPrototypes: Number of prototypes, clusters to which no memory
+        state is assigned are dropped
+        :param numIterations: Maximum number of iterations of k-means
+        :return: None
+        """
+
+        logger = GlobalLogger.getLogger()
+        logger.log('Compacting Memory', 1, self.compactMemory.__name__)
+
+        assert (self.memory is not None and self.memoryValues is None)
+
+        contextKernel = tf.reshape(
+            self.outDense.kernel[self.embeddingSize:, 0],
+            (self.memorySize, self.contextSize)
+        )
+        contributions = tf.reduce_sum(self.context * contextKernel, axis=1).numpy()
+
+        prototypes, assignments = Utility.kMeans(
+            self.memory.numpy(),
+            numPrototypes,
+            numIterations
+        )
+
+        counts = np.bincount(assignments, minlength=prototypes.shape[0])
+        isNonEmpty = counts > 0
+        memoryValues = np.bincount(assignments, weights=contributions, minlength=prototypes.shape[0])
+
+        self.memory = tf.convert_to_tensor(prototypes[isNonEmpty], dtype=self.dtype)
+        self.context = None
+        self.memoryValues = tf.convert_to_tensor(
+            memoryValues[isNonEmpty] / counts[isNonEmpty],
+            dtype=self.dtype
+        )
+        self.memoryLogCounts = tf.convert_to_tensor(np.log(counts[isNonEmpty]), dtype=self.dtype)
+
+        logger.log(
+            f'Memory Shape: {self.memory.shape}, Values Shape: {self.memoryValues.shape}',
+            2,
+            self.compactMemory.__name__
+        )
+
+    def sampleWindowStartTimes(self, currentTime):
+        """
+        Samples the starting timesteps of the windows which are to be
+        stored in the memory
+        :param currentTime: current timestep, every sampled window ends
+        before the current timestep
+        :return: Window start times, it is a numpy array of shape (self.memorySize,)
+        """
+
+        sampleLow = 0
+        sampleHigh = currentTime - self.windowSize
+
+        return np.array([
+            np.random.randint(sampleLow, sampleHigh + 1)
+            for _ in range(self.memorySize)
+        ])
+
+    def gatherWindows(self, X, windowStartTimes):
+        """
+        Gathers the windows starting at the provided timesteps
+        :param X: Features, has shape (n, self.inputShape)
+        :param windowStartTimes: Starting timestep of each window, it is a numpy
+        array of shape (numWindows,)
+        :return: The windows, it has shape (numWindows, self.windowSize, self.inputShape)
+        """
+
+        return X[
+            np.expand_dims(windowStartTimes, axis=1)
+            + np.arange(self.windowSize)
+        ]
+
     def runGruOnWindow(self, X, windowStartTime):
         """
         Runs GRU on the window and returns the final state
@@ -444,6 +980,111 @@ class ExtremeTime2:
 
         return gruMemoryState, gruContextState
 
+    def runFusedGruOnWindow(self, X, windowStartTime, fusedWeights):
+        """
+        Runs the memory and context GRUs together on the window as a single GRU
+        whose state is the concatenation of their states, and returns the final
+        states. The input projections of the whole window are computed with a
+        single matrix product, and each timestep needs a single product with the
+        block diagonal recurrent kernel, instead of two calls of the GRU cells
+        :param X: Features, has shape (n, self.inputShape)
+        :param windowStartTime: Starting timestep of the window
+        :param fusedWeights: Kernel, recurrent kernel and bias of the fused GRU
+        as returned by getFusedEncoderWeights
+        :return: The final state of the memory GRU, it has shape (self.embeddingSize,)
+        and the final state of the context GRU, it has shape (self.contextSize,)
+        """
+
+        logger = GlobalLogger.getLogger()
+        logger.log(f'Window Start Time: {windowStartTime}', 2, self.runFusedGruOnWindow.__name__)
+
+        kernel, recurrentKernel, bias = fusedWeights
+
+        state = tf.concat(self.getInitialEncoderStates(), axis=1)
+        inputProjections = tf.linalg.matmul(
+            tf.convert_to_tensor(
+                X[windowStartTime: windowStartTime + self.windowSize],
+                dtype=self.dtype
+            ),
+            kernel
+        ) + bias[0]
+
+        for t in range(self.windowSize):
+            inputUpdate, inputReset, inputCandidate = \
+                tf.split(inputProjections[t: t + 1], 3, axis=1)
+            recurrentUpdate, recurrentReset, recurrentCandidate = \
+                tf.split(tf.linalg.matmul(state, recurrentKernel) + bias[1], 3, axis=1)
+
+            update = self.gruMemory.recurrent_activation(inputUpdate + recurrentUpdate)
+            reset = self.gruMemory.recurrent_activation(inputReset + recurrentReset)
+            candidate = self.gruMemory.activation(inputCandidate + reset * recurrentCandidate)
+
+            state = update * state + (1 - update) * candidate
+
+        gruMemoryState = state[0, :self.embeddingSize]
+        gruContextState = state[0, self.embeddingSize:]
+
+        logger.log(
+            f'GRU memory state shape: {gruMemoryState.shape},'
+            + f' context state shape: {gruContextState.shape}',
+            2,
+            self.runFusedGruOnWindow.__name__
+        )
+
+        return gruMemoryState, gruContextState
+
+    def getFusedEncoderWeights(self):
+        """
+        Combines the weights of the memory and context GRUs into the weights of
+        a single GRU whose units are the units of both. The kernel and the bias
+        of each gate are concatenated, and the recurrent kernel of each gate is
+        block diagonal, hence the two sets of units do not interact. The weights
+        are computed from the variables of the GRUs, hence gradients flow back
+        to them
+        :return: Kernel of shape (self.inputShape, 3 * numUnits), recurrent kernel
+        of shape (numUnits, 3 * numUnits) and bias of shape (2, 3 * numUnits),
+        where numUnits = self.embeddingSize + self.contextSize
+        """
+
+        assert (self.gruMemory.reset_after and self.gruContext.reset_after)
+
+        memoryGates = zip(
+            tf.split(self.gruMemory.kernel, 3, axis=1),
+            tf.split(self.gruMemory.recurrent_kernel, 3, axis=1),
+            tf.split(self.gruMemory.bias, 3, axis=1)
+        )
+        contextGates = zip(
+            tf.split(self.gruContext.kernel, 3, axis=1),
+            tf.split(self.gruContext.recurrent_kernel, 3, axis=1),
+            tf.split(self.gruContext.bias, 3, axis=1)
+        )
+
+        kernel = []
+        recurrentKernel = []
+        bias = []
+
+        for (memoryKernel, memoryRecurrentKernel, memoryBias), \
+                (contextKernel, contextRecurrentKernel, contextBias) \
+                in zip(memoryGates, contextGates):
+
+            kernel += [memoryKernel, contextKernel]
+            bias += [memoryBias, contextBias]
+            recurrentKernel.append(tf.concat([
+                tf.concat([
+                    memoryRecurrentKernel,
+                    tf.zeros((self.embeddingSize, self.contextSize), dtype=self.dtype)
+                ], axis=1),
+                tf.concat([
+                    tf.zeros((self.contextSize, self.embeddingSize), dtype=self.dtype),
+                    contextRecurrentKernel
+                ], axis=1)
+            ], axis=0))
+
+        return \
+            tf.concat(kernel, axis=1), \
+            tf.concat(recurrentKernel, axis=1), \
+            tf.concat(bias, axis=1)
+
     def predictTimestep(self, X, currentTime):
         """
         Predict on a Single Timestep
@@ -460,55 +1101,259 @@ class ExtremeTime2:
             self.state
         )
 
-        embedding = tf.squeeze(self.state)
+        if self.memoryValues is None:
+            pred = self.computePrediction(self.state, self.memory, self.context)
+        else:
+            pred = self.computeCompactPrediction(
+                self.state,
+                self.memory,
+                self.memoryValues,
+                self.memoryLogCounts
+            )
+
+        logger.log(f'Prediction: {pred}', 2, self.predictTimestep.__name__)
+
+        return pred
+
+    def computePrediction(self, state, memory, context):
+        """
+        Computes the prediction from the input GRU's state using the attention
+        weighted context of the memory
+        :param state: Input GRU's state, it has shape (1, self.embeddingSize)
+        :param memory: Memory states, it has shape (self.memorySize, self.embeddingSize)
+        :param context: Context of the memory, it has shape (self.memorySize, self.contextSize)
+        :return: The predicted value
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        embedding = tf.squeeze(state)
 
-        attentionWeights = self.computeAttention(embedding)
-        logger.log(f'Attention Shape: {attentionWeights.shape}', 2, self.predictTimestep.__name__)
+        if self.attentionTopK is not None:
+            return self.computeTopKPrediction(embedding, memory, context)
+
+        attentionWeights = self.computeAttention(embedding, memory)
+        logger.log(f'Attention Shape: {attentionWeights.shape}', 2, self.computePrediction.__name__)
 
         weightedContext = \
-            tf.expand_dims(attentionWeights, axis=1) * self.context
+            tf.expand_dims(attentionWeights, axis=1) * context
 
         concatVector = tf.concat([
             embedding,
             tf.reshape(weightedContext, (tf.size(weightedContext),))
         ], axis=0)
 
-        logger.log(f'Concat Vector Shape: {concatVector.shape}', 2, self.predictTimestep.__name__)
+        logger.log(f'Concat Vector Shape: {concatVector.shape}', 2, self.computePrediction.__name__)
 
-        pred = tf.squeeze(self.outDense(tf.expand_dims(concatVector, axis=0)))
-        logger.log(f'Prediction: {pred}', 2, self.predictTimestep.__name__)
+        return tf.squeeze(self.outDense(tf.expand_dims(concatVector, axis=0)))
 
-        return pred
+    def computeTopKPrediction(self, embedding, memory, context):
+        """
+        Computes the prediction using only the context of the attentionTopK
+        memory slots which are attended to. The weighted context of every other
+        slot is zero, hence only the rows of the output layer's kernel which
+        correspond to the attended slots are gathered and used
+        :param embedding: Embedding of the input, it has shape (self.embeddingSize,)
+        :param memory: Memory states, it has shape (self.memorySize, self.embeddingSize)
+        :param context: Context of the memory, it has shape (self.memorySize, self.contextSize)
+        :return: The predicted value
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        attentionWeights, attentionSlots = self.computeTopKAttention(embedding, memory)
+        logger.log(f'Attention Shape: {attentionWeights.shape}', 2, self.computeTopKPrediction.__name__)
+
+        weightedContext = \
+            tf.expand_dims(attentionWeights, axis=1) * tf.gather(context, attentionSlots)
+
+        embeddingKernel = self.outDense.kernel[:self.embeddingSize, 0]
+        contextKernel = tf.gather(
+            tf.reshape(
+                self.outDense.kernel[self.embeddingSize:, 0],
+                (self.memorySize, self.contextSize)
+            ),
+            attentionSlots
+        )
+
+        return \
+            tf.reduce_sum(embedding * embeddingKernel) \
+            + tf.reduce_sum(weightedContext * contextKernel) \
+            + self.outDense.bias[0]
+
+    def computeBatchPrediction(self, states, memory, context):
+        """
+        Computes the predictions of multiple streams from their input GRU's
+        states using the attention weighted context of their memory
+        :param states: Input GRU's states, it has shape (numStreams, self.embeddingSize)
+        :param memory: Memory states of the streams, it has shape
+        (numStreams, self.memorySize, self.embeddingSize)
+        :param context: Context of the memory of the streams, it has shape
+        (numStreams, self.memorySize, self.contextSize)
+        :return: The predicted values, it has shape (numStreams,)
+        """
+
+        attentionScores = tf.linalg.matvec(memory, states)
+        contextKernel = tf.reshape(
+            self.outDense.kernel[self.embeddingSize:, 0],
+            (self.memorySize, self.contextSize)
+        )
+
+        if self.attentionTopK is None:
+            attentionWeights = tf.nn.softmax(attentionScores)
+            contextKernel = tf.expand_dims(contextKernel, axis=0)
+        else:
+            topKScores, topKSlots = tf.math.top_k(
+                attentionScores,
+                min(self.attentionTopK, self.memorySize)
+            )
+            attentionWeights = tf.nn.softmax(topKScores)
+            context = tf.gather(context, topKSlots, batch_dims=1)
+            contextKernel = tf.gather(contextKernel, topKSlots)
+
+        weightedContext = tf.expand_dims(attentionWeights, axis=2) * context
+
+        return \
+            tf.linalg.matvec(states, self.outDense.kernel[:self.embeddingSize, 0]) \
+            + tf.reduce_sum(weightedContext * contextKernel, axis=[1, 2]) \
+            + self.outDense.bias[0]
+
+    def computeCompactPrediction(self, state, memory, memoryValues, memoryLogCounts):
+        """
+        Computes the prediction from the input GRU's state using the compacted
+        memory (see compactMemory), the attention weighted contributions of the
+        prototypes take the place of the attention weighted context
+        :param state: Input GRU's state, it has shape (1, self.embeddingSize)
+        :param memory: Prototype memory states, it has shape (numPrototypes, self.embeddingSize)
+        :param memoryValues: Contributions of the prototypes, it has shape (numPrototypes,)
+        :param memoryLogCounts: Log of the number of memory slots represented by
+        each prototype, it has shape (numPrototypes,)
+        :return: The predicted value
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        embedding = tf.squeeze(state)
+
+        if self.attentionTopK is None:
+            attentionWeights = self.computeAttention(embedding, memory, memoryLogCounts)
+        else:
+            attentionWeights, attentionSlots = \
+                self.computeTopKAttention(embedding, memory, memoryLogCounts)
+            memoryValues = tf.gather(memoryValues, attentionSlots)
+
+        logger.log(f'Attention Shape: {attentionWeights.shape}', 2, self.computeCompactPrediction.__name__)
 
-    def computeAttention(self, embedding):
+        return \
+            tf.reduce_sum(embedding * self.outDense.kernel[:self.embeddingSize, 0]) \
+            + tf.reduce_sum(attentionWeights * memoryValues) \
+            + self.outDense.bias[0]
+
+    def computeAttention(self, embedding, memory=None, memoryLogCounts=None):
         """
         Computes Attention Weights by taking softmax of the inner product
         between embedding of the input and the memory states
         :param embedding: Embedding of the input, it has shape (self.embeddingSize,)
+        :param memory: Memory states, if None then the model's memory is used
+        :param memoryLogCounts: Log of the number of memory slots represented by each
+        memory state, it is added to the inner products, if None then nothing is added
         :return: Attention Weight Values
         """
 
-        return tf.nn.softmax(tf.squeeze(tf.linalg.matmul(
-            self.memory,
+        if memory is None:
+            memory = self.memory
+
+        attentionScores = tf.squeeze(tf.linalg.matmul(
+            memory,
             tf.expand_dims(embedding, axis=1)
-        )))
+        ))
+
+        if memoryLogCounts is not None:
+            attentionScores += memoryLogCounts
+
+        return tf.nn.softmax(attentionScores)
+
+    def computeTopKAttention(self, embedding, memory=None, memoryLogCounts=None):
+        """
+        Computes Attention Weights over only the attentionTopK memory states
+        which have the highest inner product with the embedding of the input,
+        by taking softmax of these inner products
+        :param embedding: Embedding of the input, it has shape (self.embeddingSize,)
+        :param memory: Memory states, if None then the model's memory is used
+        :param memoryLogCounts: Log of the number of memory slots represented by each
+        memory state, it is added to the inner products, if None then nothing is added
+        :return: Attention Weight Values of shape (k,) and the memory slots they
+        correspond to, which has shape (k,), where k = min(attentionTopK, numSlots)
+        """
+
+        if memory is None:
+            memory = self.memory
+
+        attentionScores = tf.linalg.matvec(memory, embedding)
+
+        if memoryLogCounts is not None:
+            attentionScores += memoryLogCounts
+
+        topKScores, topKSlots = tf.math.top_k(
+            attentionScores,
+            tf.minimum(self.attentionTopK, tf.shape(memory)[0])
+        )
+
+        return tf.nn.softmax(topKScores), topKSlots
+
+    def prepareObservation(self, targetValue, exogenousValue):
+        """
+        Prepare a single observation as the features of a single timestep
+        :param targetValue: Value of the target variable
+        :param exogenousValue: Exogenous variables, it is None or a numpy array
+        of shape (numExoVariables,)
+        :return: Features, has shape (1, self.inputShape)
+        """
+
+        assert (
+            (exogenousValue is None and self.inputDimension == 1)
+            or
+            (exogenousValue is not None and exogenousValue.shape == (self.inputDimension - 1,))
+        )
+
+        return Utility.prepareDataPred(
+            np.array([targetValue], dtype=np.float64),
+            None if exogenousValue is None else np.expand_dims(exogenousValue, axis=0)
+        )
 
     def buildModel(self):
         """ Build Model Architecture """
 
-        self.gruInput = tf.keras.layers.GRUCell(self.embeddingSize)
+        self.gruInput = tf.keras.layers.GRUCell(self.embeddingSize, dtype=self.dtype)
         self.gruInput.build(input_shape=(self.inputDimension,))
 
-        self.gruMemory = tf.keras.layers.GRUCell(self.embeddingSize)
+        self.gruMemory = tf.keras.layers.GRUCell(self.embeddingSize, dtype=self.dtype)
         self.gruMemory.build(input_shape=(self.inputDimension,))
 
-        self.gruContext = tf.keras.layers.GRUCell(self.contextSize)
+        self.gruContext = tf.keras.layers.GRUCell(self.contextSize, dtype=self.dtype)
         self.gruContext.build(input_shape=(self.inputDimension,))
 
+        self.gruMemoryRnn = tf.keras.layers.RNN(self.gruMemory, dtype=self.dtype)
+        self.gruContextRnn = tf.keras.layers.RNN(self.gruContext, dtype=self.dtype)
+        self.compiledSequenceGradients = None
+        self.compiledBatchSequenceGradients = None
+
         finalWeightSize = self.embeddingSize + self.contextSize * self.memorySize
-        self.outDense = tf.keras.layers.Dense(1)
+        self.outDense = tf.keras.layers.Dense(1, dtype=self.dtype)
         self.outDense.build(input_shape=(finalWeightSize,))
 
+    def getTrainableVariables(self):
+        """
+        Get the Trainable Variables of the model
+        :return: List of trainable variables
+        """
+
+        return \
+            self.gruInput.trainable_variables \
+            + self.gruMemory.trainable_variables \
+            + self.gruContext.trainable_variables \
+            + self.outDense.trainable_variables
+
     def getInitialState(self):
         """
         Computes Initial Input GRU's State
@@ -517,7 +1362,7 @@ class ExtremeTime2:
 
         return self.gruInput.get_initial_state(
             batch_size=1,
-            dtype=tf.float64
+            dtype=self.dtype
         )
 
     def getInitialEncoderStates(self):
@@ -529,8 +1374,8 @@ class ExtremeTime2:
         return \
             self.gruMemory.get_initial_state(
                 batch_size=1,
-                dtype=tf.float64
+                dtype=self.dtype
             ), self.gruContext.get_initial_state(
                 batch_size=1,
-                dtype=tf.float64
+                dtype=self.dtype
             )
@@ -1,6 +1,8 @@
 import pickle
 import numpy as np
 from hmmlearn import hmm
+from scipy.optimize import minimize
+from scipy.special import logsumexp
 
 
 class GmmHmmForecast:
@@ -112,7 +114,16 @@ class GmmHmmForecast:
 
         return list(self.model.monitor_.history)
 
-    def predict(self, X, discParamSet, returnMaxLikelihood=False):
+    def predict(
+            self,
+            X,
+            discParamSet,
+            returnMaxLikelihood=False,
+            slidingWindow=False,
+            searchMode='exhaustive',
+            searchBudget=1000,
+            numRestarts=5
+    ):
         """
         Forecast using the model parameters on the provided input data. A thing
         to note is that only the last prediction is useful, since one already
@@ -125,31 +136,71 @@ class GmmHmmForecast:
         set of allowed values for that value i.e. for the ith component of the
         observation vector, discParamSet[i] is a 1D python list or numpy array
         of shape (ni,) containing all the values from which we predict this ith
-        component.
+        component. It is not used, and can be None, if searchMode is 'continuous'
         :param returnMaxLikelihood: if True, our return value is
         (pred, maxLikelihoodValues), i.e. all the predictions, and the log
         likelihood of each prediction. if False, then our return value is
         just the predictions numpy array.
+        :param slidingWindow: if True, then the forward messages of consecutive
+        conditioning windows are computed incrementally from one another (see
+        computeSlidingNextStateLogProb), hence the cost of each timestep does
+        not grow with d, else the forward algorithm is run on each window
+        :param searchMode: 'exhaustive', 'coordinate' or 'continuous'. If
+        'exhaustive', then the log likelihood of every observation in the
+        cartesian product of discParamSet is computed (see getMostLikelyObs),
+        if 'coordinate', then an approximately most likely observation is
+        searched for by coordinate ascent (see searchMostLikelyObs), whose cost
+        does not grow with the size of the cartesian product, if 'continuous',
+        then the observation is not restricted to discParamSet and the log
+        likelihood is maximized over all real valued observations by gradient
+        based optimization (see optimizeMostLikelyObs)
+        :param searchBudget: maximum number of observations whose log likelihood
+        is computed per timestep, used only if searchMode is 'coordinate' or
+        'continuous'
+        :param numRestarts: number of starting observations of the search,
+        used only if searchMode is 'coordinate' or 'continuous'
         :return: prediction of the value following every 'd' length
         contiguous subsequence of the provided observation sequence. Hence,
         the predictions numpy array 'pred' has shape (n - d, dimension).
         """
 
         assert X.shape[1] == self.dimension
-        assert len(discParamSet) == self.dimension
+        assert searchMode in ('exhaustive', 'coordinate', 'continuous')
+        assert searchMode == 'continuous' or len(discParamSet) == self.dimension
+
+        componentGaussians = self.getComponentGaussians() \
+            if searchMode == 'continuous' else None
 
         pred = []
         maxLikelihoodValues = [] if returnMaxLikelihood else None
 
-        for t in range(self.d, X.shape[0]):
-            # Construct observations using [t-d..t] i.e. current timestep is
+        if slidingWindow:
+            nextStateLogProbs = self.computeSlidingNextStateLogProb(X)
+        else:
+            # Condition on the observations [t-d..t) i.e. current timestep is
             # excluded, since we would be predicting the current timestep
-            x = np.concatenate(
-                (X[t - self.d: t], np.zeros((1, self.dimension))),
-                axis=0
+            nextStateLogProbs = (
+                self.computeNextStateLogProb(self.computeForwardLogProb(X[t - self.d: t]))
+                for t in range(self.d, X.shape[0])
             )
 
-            obs, maxLikelihood = self.getMostLikelyObs(x, discParamSet, 0)
+        for nextStateLogProb in nextStateLogProbs:
+            if searchMode == 'exhaustive':
+                obs, maxLikelihood = self.getMostLikelyObs(nextStateLogProb, discParamSet)
+            elif searchMode == 'coordinate':
+                obs, maxLikelihood = self.searchMostLikelyObs(
+                    nextStateLogProb,
+                    discParamSet,
+                    searchBudget,
+                    numRestarts
+                )
+            else:
+                obs, maxLikelihood = self.optimizeMostLikelyObs(
+                    nextStateLogProb,
+                    componentGaussians,
+                    searchBudget,
+                    numRestarts
+                )
             pred.append(obs)
 
             if returnMaxLikelihood:
@@ -178,51 +229,415 @@ class GmmHmmForecast:
         with open(modelSavePath, 'wb') as fl:
             pickle.dump(saveDict, fl)
 
-    def getMostLikelyObs(self, x, discParamSet, idx):
+    def computeForwardLogProb(self, X):
         """
-        This is a helper function (do not directly call it!). This
-        function assumes that among the 'dimension' many components
-        of the dth (0-based) observation in x, idx many components have
-        been given their values, and all the previous (0..d-1)
-        observation vectors in x have also been given their value, now
-        we want to compute the most optimal set of values for observation
-        components idx..dimension-1, by most optimal we mean values
-        for idx..dimension-1 component of x[d] which gives highest log
-        likelihood value of the sequence x(0)..x(d).
+        Runs the forward algorithm on the observation sequence
+
+        :param X: observation sequence, it is a numpy array of shape (n, dimension)
+        :return: log of the forward message at the last timestep, i.e. a numpy
+        array of shape (numStates,) whose ith value is the log probability of
+        observing X and being in state i at the last timestep. If n is 0,
+        then None is returned
+        """
+
+        if X.shape[0] == 0:
+            return None
+
+        frameLogProb = self.model._compute_log_likelihood(X)
+
+        with np.errstate(divide='ignore'):
+            logTransmat = np.log(self.model.transmat_)
+            logAlpha = np.log(self.model.startprob_) + frameLogProb[0]
+
+        for t in range(1, X.shape[0]):
+            logAlpha = logsumexp(logAlpha[:, np.newaxis] + logTransmat, axis=0) \
+                + frameLogProb[t]
+
+        return logAlpha
+
+    def computeNextStateLogProb(self, logAlpha):
+        """
+        Computes the log probability of the state at the timestep following
+        an observation sequence jointly with the sequence
+
+        :param logAlpha: log of the forward message at the last timestep of the
+        observation sequence (see computeForwardLogProb), None if the sequence
+        is empty
+        :return: numpy array of shape (numStates,) whose ith value is the log
+        probability of observing the sequence and being in state i at the next
+        timestep
+        """
+
+        with np.errstate(divide='ignore'):
+            if logAlpha is None:
+                return np.log(self.model.startprob_)
+
+            return logsumexp(
+                logAlpha[:, np.newaxis] + np.log(self.model.transmat_),
+                axis=0
+            )
+
+    def computeSlidingNextStateLogProb(self, X):
+        """
+        Computes the log probability of each conditioning window [t-d..t) of
+        the observation sequence jointly with the state at timestep t, for
+        every t from d to n - 1, the same as computeNextStateLogProb on the
+        forward message of each window. In the log domain, this is the log
+        start probabilities multiplied by the matrices
+        N_u[i, j] = log P(x_u | state i) + log P(state j | state i) of the
+        timesteps u of the window. Consecutive windows share all but one of
+        these matrices, hence their product is maintained over the sliding
+        window (see SlidingWindowProduct), at a constant amortized number of
+        matrix products per timestep independent of d
+
+        :param X: observation sequence, it is a numpy array of shape (n, dimension)
+        :return: generator of numpy arrays of shape (numStates,), one for each
+        t from d to n - 1
+        """
+
+        frameLogProb = self.model._compute_log_likelihood(X)
+
+        with np.errstate(divide='ignore'):
+            logTransmat = np.log(self.model.transmat_)
+            logStartprob = np.log(self.model.startprob_)
+
+        window = SlidingWindowProduct()
 
+        for t in range(X.shape[0]):
+            if t >= self.d:
+                product = window.product()
+                yield logStartprob if product is None \
+                    else logsumexp(logStartprob[:, np.newaxis] + product, axis=0)
 
-        :param x: observation sequence, it is a numpy array of shape
-        (d + 1, dimension), we want to set the most optimal value of
-        x[d + 1, idx : dimension]
+                if self.d > 0:
+                    window.pop()
+
+            if self.d > 0:
+                window.push(frameLogProb[t][:, np.newaxis] + logTransmat)
+
+    def getMostLikelyObs(
+            self,
+            nextStateLogProb,
+            discParamSet,
+            candidateChunkSize=100000
+    ):
+        """
+        This is a helper function (do not directly call it!). Finds the
+        observation from the cartesian product of the discrete sets of values
+        which maximizes the log likelihood of the conditioning observation
+        sequence followed by it. The forward message of the conditioning
+        sequence is computed once (nextStateLogProb), and the emission log
+        likelihoods of the candidate observations are computed as a batch,
+        candidateChunkSize candidates at a time to bound the memory used
+
+        :param nextStateLogProb: log probability of the conditioning sequence
+        jointly with the state of the next timestep (see computeNextStateLogProb)
         :param discParamSet: for each of the 'dimension' number of components in
         an observation, there should be a numpy array of containing the discrete
         set of allowed values for that value i.e. for the ith component of the
         observation vector, discParamSet[i] is a 1D python list or numpy array
         of shape (ni,) containing all the values from which we predict this ith
         component.
-        :param idx: index of the component of x[d] whose value we are going to
-        fix now, and recursively fix values of components idx+1 .. dimension-1
-        such that they yield maximum likelihood
+        :param candidateChunkSize: number of candidate observations whose log
+        likelihoods are computed together
         :return: a 2-tuple containing (chosen observation, likelihood of the
-        chosen observation), the chosen observation has maximum likelihood
-        given that we are allowed to vary ony these: x[d + 1, idx : dimension]
-        (rest all are fixed)
+        chosen observation), the likelihood is the log likelihood of the
+        conditioning sequence followed by the chosen observation. Among
+        candidates with the same likelihood, the first one in the order of the
+        cartesian product is chosen
         """
 
-        if idx == len(discParamSet):
-            return x[self.d].copy(), self.model.score(x)
+        discParamSet = [np.asarray(paramValues) for paramValues in discParamSet]
+        shape = tuple(paramValues.shape[0] for paramValues in discParamSet)
+        numCandidates = int(np.prod(shape))
 
         chosenObs = None
         maxLikelihood = None
 
-        for paramValue in discParamSet[idx]:
-            x[self.d, idx] = paramValue
+        for chunkStart in range(0, numCandidates, candidateChunkSize):
+            indices = np.unravel_index(
+                np.arange(chunkStart, min(chunkStart + candidateChunkSize, numCandidates)),
+                shape
+            )
+            candidates = np.stack(
+                [paramValues[index] for paramValues, index in zip(discParamSet, indices)],
+                axis=1
+            )
 
-            currObs, currLikelihood = \
-                self.getMostLikelyObs(x, discParamSet, idx + 1)
+            likelihoods = self.computeObsLogLikelihood(nextStateLogProb, candidates)
+            bestIdx = np.argmax(likelihoods)
 
-            if maxLikelihood is None or currLikelihood > maxLikelihood:
-                maxLikelihood = currLikelihood
-                chosenObs = currObs
+            if maxLikelihood is None or likelihoods[bestIdx] > maxLikelihood:
+                maxLikelihood = likelihoods[bestIdx]
+                chosenObs = candidates[bestIdx]
 
         return chosenObs, maxLikelihood
+
+    def searchMostLikelyObs(
+            self,
+            nextStateLogProb,
+            discParamSet,
+            searchBudget=1000,
+            numRestarts=5
+    ):
+        """
+        This is a helper function (do not directly call it!). Searches for an
+        approximately most likely observation by coordinate ascent over the
+        discrete sets of values: starting from an observation, each component
+        in turn is set to the value which maximizes the log likelihood while
+        the other components are fixed, until a sweep over all components does
+        not increase it. The ascent is restarted from the observations nearest
+        to the means of the numRestarts mixture components with the highest
+        probability at the next timestep, and the best of the restarts is chosen
+
+        :param nextStateLogProb: log probability of the conditioning sequence
+        jointly with the state of the next timestep (see computeNextStateLogProb)
+        :param discParamSet: for each of the 'dimension' number of components in
+        an observation, the discrete set of allowed values (see getMostLikelyObs)
+        :param searchBudget: maximum number of observations whose log likelihood
+        is computed, the search stops when computing the next component's values
+        would exceed it, though the starting observation of every restart is
+        always evaluated
+        :param numRestarts: number of starting observations
+        :return: a 2-tuple containing (chosen observation, likelihood of the
+        chosen observation), as in getMostLikelyObs, the likelihood is at most
+        the one of the exhaustive search
+        """
+
+        discParamSet = [np.asarray(paramValues) for paramValues in discParamSet]
+
+        # Probability of each mixture component of each state at the next timestep
+        componentLogProb = nextStateLogProb[:, np.newaxis] + np.log(self.model.weights_)
+        topComponents = np.argsort(componentLogProb, axis=None)[::-1][:numRestarts]
+        means = self.model.means_.reshape(-1, self.dimension)[topComponents]
+
+        # The restarts ascend together, each component update of all of them
+        # is computed as a single batch
+        currObs = np.stack([
+            paramValues[np.argmin(np.abs(paramValues[np.newaxis] - means[:, [i]]), axis=1)]
+            for i, paramValues in enumerate(discParamSet)
+        ], axis=1).astype(float)
+        currLikelihoods = self.computeObsLogLikelihood(nextStateLogProb, currObs)
+        numEvaluations = currObs.shape[0]
+
+        improved = True
+        while improved:
+            improved = False
+
+            for i, paramValues in enumerate(discParamSet):
+                numCandidates = currObs.shape[0] * paramValues.shape[0]
+                if numEvaluations + numCandidates > searchBudget:
+                    improved = False
+                    break
+
+                candidates = np.repeat(currObs, paramValues.shape[0], axis=0)
+                candidates[:, i] = np.tile(paramValues, currObs.shape[0])
+
+                likelihoods = self.computeObsLogLikelihood(nextStateLogProb, candidates) \
+                    .reshape(currObs.shape[0], paramValues.shape[0])
+                numEvaluations += numCandidates
+
+                bestIndices = np.argmax(likelihoods, axis=1)
+                bestLikelihoods = likelihoods[np.arange(currObs.shape[0]), bestIndices]
+
+                isImproved = bestLikelihoods > currLikelihoods
+                if np.any(isImproved):
+                    currObs[isImproved, i] = paramValues[bestIndices[isImproved]]
+                    currLikelihoods[isImproved] = bestLikelihoods[isImproved]
+                    improved = True
+
+        bestRestart = np.argmax(currLikelihoods)
+
+        return currObs[bestRestart], currLikelihoods[bestRestart]
+
+    def optimizeMostLikelyObs(
+            self,
+            nextStateLogProb,
+            componentGaussians,
+            searchBudget=1000,
+            numRestarts=5
+    ):
+        """
+        This is a helper function (do not directly call it!). Finds the real
+        valued observation which maximizes the log likelihood of the conditioning
+        sequence followed by it. This log likelihood is the log of a mixture of
+        the Gaussian mixture components of all the states, weighted by the
+        probability of their state at the next timestep, hence it and its
+        gradient are computed analytically and it is maximized by L-BFGS. The
+        optimization is started from the means of the numRestarts components
+        with the highest densities at their means, and the best of the restarts
+        is chosen, its cost does not depend on any grid of values
+
+        :param nextStateLogProb: log probability of the conditioning sequence
+        jointly with the state of the next timestep (see computeNextStateLogProb)
+        :param componentGaussians: means, precision matrices and log normalizing
+        constants of the mixture components (see getComponentGaussians)
+        :param searchBudget: maximum number of observations whose log likelihood
+        is computed, shared equally among the restarts
+        :param numRestarts: number of starting observations
+        :return: a 2-tuple containing (chosen observation, likelihood of the
+        chosen observation), as in getMostLikelyObs
+        """
+
+        means, precisions, logNormalizers = componentGaussians
+
+        # log of the weight of each component in the mixture along with its
+        # normalizing constant, so that the mixture is a sum of exp(-0.5 * distance)
+        componentLogWeights = (
+            nextStateLogProb[:, np.newaxis] + np.log(self.model.weights_)
+        ).reshape(-1) + logNormalizers
+
+        def negativeLogLikelihood(obs):
+            diff = obs - means
+            precisionDiff = np.einsum('cij,cj->ci', precisions, diff)
+            logTerms = componentLogWeights - 0.5 * np.sum(diff * precisionDiff, axis=1)
+
+            logLikelihood = logsumexp(logTerms)
+            responsibilities = np.exp(logTerms - logLikelihood)
+
+            return -logLikelihood, responsibilities @ precisionDiff
+
+        startComponents = np.argsort(componentLogWeights)[::-1][:numRestarts]
+        maxFunctionEvaluations = max(searchBudget // startComponents.shape[0], 1)
+
+        chosenObs = None
+        minNegativeLogLikelihood = None
+
+        for component in startComponents:
+            result = minimize(
+                negativeLogLikelihood,
+                means[component],
+                method='L-BFGS-B',
+                jac=True,
+                options={'maxfun': maxFunctionEvaluations}
+            )
+
+            if minNegativeLogLikelihood is None or result.fun < minNegativeLogLikelihood:
+                minNegativeLogLikelihood = result.fun
+                chosenObs = result.x
+
+        return chosenObs, -minNegativeLogLikelihood
+
+    def getComponentGaussians(self):
+        """
+        Computes the parameters of the Gaussian mixture components of all
+        the states as full covariance Gaussians, whatever the covariance type
+
+        :return: a 3-tuple containing the means, of shape
+        (numStates * numMixtureComp, dimension), the precision matrices, of shape
+        (numStates * numMixtureComp, dimension, dimension) and the log normalizing
+        constants, of shape (numStates * numMixtureComp,), of the components
+        """
+
+        numStates, numMixtureComp = self.model.weights_.shape
+        covars = self.model.covars_
+
+        if self.model.covariance_type == 'spherical':
+            covars = covars[:, :, np.newaxis, np.newaxis] * np.eye(self.dimension)
+        elif self.model.covariance_type == 'diag':
+            covars = covars[:, :, :, np.newaxis] * np.eye(self.dimension)
+        elif self.model.covariance_type == 'tied':
+            covars = np.repeat(covars[:, np.newaxis], numMixtureComp, axis=1)
+
+        covars = covars.reshape(-1, self.dimension, self.dimension)
+        _, logDets = np.linalg.slogdet(covars)
+
+        return \
+            self.model.means_.reshape(-1, self.dimension), \
+            np.linalg.inv(covars), \
+            -0.5 * (self.dimension * np.log(2 * np.pi) + logDets)
+
+    def computeObsLogLikelihood(self, nextStateLogProb, obs):
+        """
+        Computes the log likelihood of the conditioning observation sequence
+        followed by each of the provided observations
+
+        :param nextStateLogProb: log probability of the conditioning sequence
+        jointly with the state of the next timestep (see computeNextStateLogProb)
+        :param obs: observations, it is a numpy array of shape (m, dimension)
+        :return: numpy array of shape (m,) containing the log likelihoods
+        """
+
+        return logsumexp(
+            nextStateLogProb + self.model._compute_log_likelihood(obs),
+            axis=1
+        )
+
+
+class SlidingWindowProduct:
+    """
+    Maintains the product of the matrices in a sliding window (a queue
+    in which matrices are pushed at the back and popped from the front) in the
+    log domain, i.e. the matrices contain log values and their product is
+    the log of the product of their exponents. The queue is held as two stacks:
+    the matrices pushed at the back along with their running product, and the
+    matrices at the front along with the products of each of them and the ones
+    after it in the front stack. When the front stack is empty on a pop, all the
+    matrices of the back stack are moved to it. Hence each push, pop and product
+    costs a constant amortized number of matrix products
+    """
+
+    def __init__(self):
+        """ Create an empty SlidingWindowProduct """
+
+        self.backMatrices = []
+        self.backProduct = None
+        self.frontProducts = []
+
+    @staticmethod
+    def logMatMul(A, B):
+        """
+        Multiplies matrices in the log domain
+
+        :param A: log matrix of shape (p, q)
+        :param B: log matrix of shape (q, r)
+        :return: log of the product of exp(A) and exp(B), of shape (p, r)
+        """
+
+        return logsumexp(A[:, :, np.newaxis] + B[np.newaxis, :, :], axis=1)
+
+    def push(self, matrix):
+        """
+        Pushes the matrix at the back of the window
+
+        :param matrix: log matrix of shape (k, k)
+        :return: None
+        """
+
+        self.backMatrices.append(matrix)
+        self.backProduct = matrix if self.backProduct is None \
+            else SlidingWindowProduct.logMatMul(self.backProduct, matrix)
+
+    def pop(self):
+        """
+        Pops the matrix at the front of the window, the window must not be empty
+
+        :return: None
+        """
+
+        if len(self.frontProducts) == 0:
+            suffixProduct = None
+            for matrix in reversed(self.backMatrices):
+                suffixProduct = matrix if suffixProduct is None \
+                    else SlidingWindowProduct.logMatMul(matrix, suffixProduct)
+                self.frontProducts.append(suffixProduct)
+
+            self.backMatrices = []
+            self.backProduct = None
+
+        self.frontProducts.pop()
+
+    def product(self):
+        """
+        Computes the product of the matrices in the window, from front to back
+
+        :return: log matrix of shape (k, k), or None if the window is empty
+        """
+
+        if len(self.frontProducts) == 0:
+            return self.backProduct
+
+        if self.backProduct is None:
+            return self.frontProducts[-1]
+
+        return SlidingWindowProduct.logMatMul(self.frontProducts[-1], self.backProduct)
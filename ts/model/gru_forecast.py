@@ -9,11 +9,13 @@ class GruForecast(RnnForecast):
     """ GRU forecasting model """
 
     @staticmethod
-    def load(modelLoadPath):
+    def load(modelLoadPath, warmUp=False):
         """
         Loads the model from the provided filepath
 
         :param modelLoadPath: path from where to load the model
+        :param warmUp: If True, then the compiled inference function of the
+        model is traced on loading (see RnnForecast.warmUp)
         :return: model which is loaded from the given path
         """
 
@@ -33,6 +35,9 @@ class GruForecast(RnnForecast):
         model.buildModel()
         model.model.set_weights(loadDict['weights'])
 
+        if warmUp:
+            model.warmUp()
+
         GlobalLogger.getLogger().log('Loading Complete', 1, GruForecast.load.__name__)
 
         return model
@@ -1,9 +1,11 @@
 import pickle
+import time
 import tensorflow as tf
 import numpy as np
 
-from ts.utility import Utility, ForecastDataSequence, SaveCallback
-from ts.log import GlobalLogger
+from ts.utility import Utility, ForecastDataSequence, BucketedDataSequence, \
+    ForecastDataset, SaveCallback
+from ts.log import GlobalLogger, ConsoleLogger
 
 
 class RnnForecast:
@@ -13,11 +15,14 @@ class RnnForecast:
     """
 
     @staticmethod
-    def load(modelLoadPath):
+    def load(modelLoadPath, warmUp=False):
         """
         Loads the model from the provided filepath
 
         :param modelLoadPath: path from where to load the model
+        :param warmUp: If True, then the compiled inference function of the
+        model is traced on loading (see warmUp), hence the first prediction
+        is as fast as the ones after it
         :return: model which is loaded from the given path
         """
 
@@ -37,6 +42,9 @@ class RnnForecast:
         model.buildModel()
         model.model.set_weights(loadDict['weights'])
 
+        if warmUp:
+            model.warmUp()
+
         GlobalLogger.getLogger().log('Loading Complete', 1, RnnForecast.load.__name__)
 
         return model
@@ -88,7 +96,11 @@ class RnnForecast:
             optimizer=tf.optimizers.Adam(),
             modelSavePath=None,
             verboseLevel=1,
-            returnLosses=True
+            returnLosses=True,
+            batchSize=None,
+            windowLength=None,
+            shuffleBufferSize=1024,
+            bpttLength=None
     ):
         """
         Train the model on the provided data sequences
@@ -104,10 +116,38 @@ class RnnForecast:
         :param verboseLevel: Verbosity Level, higher value means more information
         :param returnLosses: If True, then return losses of every iteration, else
         does not return losses
+        :param batchSize: If None, then each training sequence is a batch. Else
+        if windowLength is None, then the whole training sequences are grouped
+        by their length into mini batches of batchSize sequences, which are
+        padded and whose padded timesteps are masked out of the loss (see
+        BucketedDataSequence). Else the training sequences are cut into
+        non-overlapping windows of windowLength timesteps, which are shuffled
+        together and are provided in mini batches of batchSize windows (see
+        ForecastDataset)
+        :param windowLength: Number of timesteps of each window, used only if
+        batchSize is not None
+        :param shuffleBufferSize: Size of the buffer from which the windows are
+        randomly drawn, used only if batchSize is not None
+        :param bpttLength: If not None, then the model is trained by truncated
+        backpropagation through time, each training sequence is split into
+        chunks of bpttLength timesteps and the parameters are updated after
+        every chunk (see trainTruncated). It cannot be used along with batchSize
         :return: If returnLosses is True, then return list of losses of every
         iteration, else None
         """
 
+        if bpttLength is not None:
+            assert batchSize is None
+            return self.trainTruncated(
+                trainSequences,
+                bpttLength,
+                numIterations,
+                optimizer,
+                modelSavePath,
+                verboseLevel,
+                returnLosses
+            )
+
         logger = GlobalLogger.getLogger()
         logger.log('Compiling Model', 1, self.train.__name__)
 
@@ -115,6 +155,32 @@ class RnnForecast:
             optimizer=optimizer, loss=tf.keras.losses.MeanSquaredError()
         )
 
+        if batchSize is None:
+            trainData = ForecastDataSequence(
+                trainSequences,
+                self.forecastHorizon,
+                self.numTargetVariables,
+                self.numExoVariables
+            )
+        elif windowLength is None:
+            trainData = BucketedDataSequence(
+                trainSequences,
+                self.forecastHorizon,
+                self.numTargetVariables,
+                self.numExoVariables,
+                batchSize
+            )
+        else:
+            trainData = ForecastDataset(
+                trainSequences,
+                self.forecastHorizon,
+                self.numTargetVariables,
+                self.numExoVariables,
+                windowLength=windowLength,
+                batchSize=batchSize,
+                shuffleBufferSize=shuffleBufferSize
+            ).getDataset()
+
         callbacks = None
         if modelSavePath is not None:
             callbacks = [SaveCallback(
@@ -124,12 +190,7 @@ class RnnForecast:
 
         logger.log('Begin Training Model', 1, self.train.__name__)
         history = self.model.fit(
-            ForecastDataSequence(
-                trainSequences,
-                self.forecastHorizon,
-                self.numTargetVariables,
-                self.numExoVariables
-            ),
+            trainData,
             epochs=numIterations,
             verbose=verboseLevel,
             callbacks=callbacks
@@ -138,6 +199,140 @@ class RnnForecast:
         if returnLosses:
             return history.history['loss']
 
+    def trainTruncated(
+            self,
+            trainSequences,
+            bpttLength,
+            numIterations=1,
+            optimizer=tf.optimizers.Adam(),
+            modelSavePath=None,
+            verboseLevel=1,
+            returnLosses=True
+    ):
+        """
+        Train the model on the provided data sequences by truncated
+        backpropagation through time. Each training sequence is split into
+        consecutive chunks of bpttLength timesteps, the states of the recurrent
+        layers at the end of a chunk are carried forward to the next chunk
+        without propagating gradients through them, and the parameters are
+        updated after every chunk. Hence the memory used by training is bounded
+        by the chunk length instead of the sequence length. Training is done on
+        a stateful copy of the model (see buildStatefulModel) whose weights are
+        copied back into the model after every iteration. The copy is kept
+        across calls, so an optimizer passed to successive calls keeps its
+        state (e.g. the moment estimates of Adam) for the same variables
+
+        :param trainSequences: Sequences of data, as described in train
+        :param bpttLength: Number of timesteps of each chunk
+        :param numIterations: Number of iterations of training to be performed
+        :param optimizer: Optimizer using which to train the parameters of the model
+        :param modelSavePath: If not None, then save the model to this path after
+        every iteration of training
+        :param verboseLevel: Verbosity Level, higher value means more information
+        :param returnLosses: If True, then return list of losses of every
+        iteration, else does not return losses
+        :return: If returnLosses is True, then return list of losses of every
+        iteration, else None. The loss of an iteration is the mean of the losses
+        of its chunks weighted by their lengths
+        """
+
+        logger = GlobalLogger.getLogger()
+        verbose = ConsoleLogger(verboseLevel)
+
+        if self.truncatedTrainModel is None:
+            self.truncatedTrainModel = self.buildStatefulModel()
+        else:
+            self.truncatedTrainModel.set_weights(self.model.get_weights())
+
+        statefulModel = self.truncatedTrainModel
+        lossFunc = tf.keras.losses.MeanSquaredError()
+
+        def trainChunk(X, Y):
+            with tf.GradientTape() as tape:
+                loss = lossFunc(Y, statefulModel(X, training=True))
+
+            trainableVars = statefulModel.trainable_variables
+            optimizer.apply_gradients(zip(tape.gradient(loss, trainableVars), trainableVars))
+
+            return loss
+
+        dtype = tf.keras.backend.floatx()
+        compiledTrainChunk = tf.function(
+            trainChunk,
+            input_signature=[
+                tf.TensorSpec(
+                    shape=(1, None, self.numTargetVariables + self.numExoVariables),
+                    dtype=dtype
+                ),
+                tf.TensorSpec(shape=(1, None, self.numTargetVariables), dtype=dtype)
+            ]
+        )
+
+        logger.log('Begin Truncated Training', 1, self.trainTruncated.__name__)
+
+        losses = []
+        for iteration in range(numIterations):
+
+            verbose.log(f'begin iteration {iteration}', 1)
+
+            cumulIterLoss = 0.0
+            numTimesteps = 0
+
+            iterStartTime = time.time()
+            for seq in trainSequences:
+                if type(seq) is tuple:
+                    targetSeries, exogenousSeries = seq
+                else:
+                    targetSeries, exogenousSeries = seq, None
+
+                assert targetSeries.shape[1] == self.numTargetVariables
+                assert Utility.isExoShapeValid(exogenousSeries, self.numExoVariables)
+
+                X, Y = Utility.prepareDataTrain(
+                    targetSeries,
+                    exogenousSeries,
+                    self.forecastHorizon
+                )
+                X = np.expand_dims(X.astype(dtype), axis=0)
+                Y = np.expand_dims(Y.astype(dtype), axis=0)
+
+                statefulModel.reset_states()
+                for chunkStartTime in range(0, X.shape[1], bpttLength):
+                    chunkEndTime = min(chunkStartTime + bpttLength, X.shape[1])
+
+                    loss = compiledTrainChunk(
+                        X[:, chunkStartTime: chunkEndTime],
+                        Y[:, chunkStartTime: chunkEndTime]
+                    ).numpy()
+
+                    cumulIterLoss += loss * (chunkEndTime - chunkStartTime)
+                    numTimesteps += chunkEndTime - chunkStartTime
+
+                    verbose.log(f'start timestep: {chunkStartTime}'
+                                + f' | end timestep: {chunkEndTime}'
+                                + f' | Loss: {loss}', 2)
+
+            iterTimeTaken = time.time() - iterStartTime
+            avgIterLoss = cumulIterLoss / numTimesteps
+
+            verbose.log(f'Completed Iteration: {iteration}'
+                        + f' | time taken: {iterTimeTaken : .2f} sec'
+                        + f' | Avg Iteration Loss: {avgIterLoss}', 1)
+
+            self.model.set_weights(statefulModel.get_weights())
+
+            if returnLosses:
+                losses.append(avgIterLoss)
+
+            if modelSavePath is not None:
+                logger.log(f'Saving Model at {modelSavePath}', 1, self.trainTruncated.__name__)
+                self.save(modelSavePath)
+
+        verbose.close()
+
+        if returnLosses:
+            return losses
+
     def predict(
             self,
             targetSeries,
@@ -172,7 +367,176 @@ class RnnForecast:
         X = Utility.prepareDataPred(targetSeries, exogenousSeries)
 
         logger.log('Begin Prediction', 1, self.predict.__name__)
-        return tf.squeeze(self.model.predict(np.expand_dims(X, axis=0), verbose=0), axis=0)
+        return tf.squeeze(self.forward(np.expand_dims(X, axis=0)), axis=0)
+
+    def predictBatch(
+            self,
+            targetSeriesList,
+            exogenousSeriesList=None,
+            batchSize=64
+    ):
+        """
+        Forecast using the model parameters on many series at once. The series
+        are sorted by their length and consecutive series are padded at their
+        end to the same length and forecast on in a single batch. Since the
+        recurrent layers are causal, padding at the end does not change the
+        forecasts on the timesteps which are not padded
+
+        :param targetSeriesList: List of series of the target variables, each
+        should be a numpy array of shape (n_i, numTargetVariables)
+        :param exogenousSeriesList: List of series of the exogenous variables,
+        each should be a numpy array of shape (n_i, numExoVariables), it can be
+        None only if numExoVariables is 0 in which case the exogenous variables
+        are not considered
+        :param batchSize: Number of series in each batch
+        :return: List of forecast targets predicted by the model, in the order
+        of targetSeriesList, the i'th has shape (n_i, numTargetVariables) and
+        is the same as predict on the i'th series
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        logger.log(f'Number of Series: {len(targetSeriesList)}', 2, self.predictBatch.__name__)
+
+        if exogenousSeriesList is None:
+            exogenousSeriesList = [None] * len(targetSeriesList)
+
+        assert len(exogenousSeriesList) == len(targetSeriesList)
+
+        logger.log('Prepare Data', 1, self.predictBatch.__name__)
+
+        XList = []
+        for targetSeries, exogenousSeries in zip(targetSeriesList, exogenousSeriesList):
+            assert targetSeries.shape[1] == self.numTargetVariables
+            assert Utility.isExoShapeValid(exogenousSeries, self.numExoVariables)
+
+            XList.append(Utility.prepareDataPred(targetSeries, exogenousSeries))
+
+        sortedIndices = np.argsort([X.shape[0] for X in XList], kind='stable')
+        predList = [None] * len(XList)
+
+        logger.log('Begin Prediction', 1, self.predictBatch.__name__)
+
+        for batchStart in range(0, len(XList), batchSize):
+            batchIndices = sortedIndices[batchStart: batchStart + batchSize]
+            maxLength = max(XList[idx].shape[0] for idx in batchIndices)
+
+            Xbatch = np.zeros(
+                (len(batchIndices), maxLength, self.numTargetVariables + self.numExoVariables)
+            )
+            for i, idx in enumerate(batchIndices):
+                Xbatch[i, :XList[idx].shape[0]] = XList[idx]
+
+            Ybatch = self.forward(Xbatch)
+
+            for i, idx in enumerate(batchIndices):
+                predList[idx] = Ybatch[i, :XList[idx].shape[0]]
+
+        return predList
+
+    def rollout(
+            self,
+            targetSeries,
+            steps,
+            exogenousSeries=None,
+            futureExogenousSeries=None
+    ):
+        """
+        Forecast the next steps timesteps of the target variables following the
+        provided history, by autoregressively feeding the forecasts back as the
+        target variables of the next timesteps. The states of the recurrent
+        layers are warmed up on the history only once, after which each fed
+        back timestep costs a single step of the layers from the carried states,
+        hence the cost is proportional to the length of the history plus steps,
+        instead of to their product. The target variables of the timesteps
+        n, ..., n + forecastHorizon - 1 are the forecasts on the last
+        forecastHorizon timesteps of the history, the ones after are forecast
+        on the fed back timesteps
+
+        :param targetSeries: History of the target variables, it should be a
+        numpy array of shape (n, numTargetVariables) where n >= forecastHorizon
+        :param steps: Number of future timesteps to be forecast
+        :param exogenousSeries: History of the exogenous variables, it should be
+        a numpy array of shape (n, numExoVariables), it can be None only if
+        numExoVariables is 0 in which case the exogenous variables are not
+        considered
+        :param futureExogenousSeries: Exogenous variables of the future timesteps
+        n, n + 1, ..., it should be a numpy array of shape (m, numExoVariables)
+        where m >= steps - forecastHorizon, it can be None only if numExoVariables
+        is 0 or steps <= forecastHorizon, since then no timestep is fed back
+        :return: Forecast target variables of the timesteps n, ..., n + steps - 1,
+        numpy array of shape (steps, numTargetVariables)
+        """
+
+        logger = GlobalLogger.getLogger()
+
+        logger.log(f'Target Series Shape: {targetSeries.shape}', 2, self.rollout.__name__)
+        logger.log(f'Rollout Steps: {steps}', 2, self.rollout.__name__)
+
+        numFedBackSteps = max(steps - self.forecastHorizon, 0)
+
+        assert targetSeries.shape[0] >= self.forecastHorizon
+        assert numFedBackSteps == 0 \
+            or Utility.isExoShapeValid(futureExogenousSeries, self.numExoVariables)
+        assert futureExogenousSeries is None \
+            or futureExogenousSeries.shape[0] >= numFedBackSteps
+
+        # The stateful copy is kept between calls and only its weights are
+        # refreshed, so that its inference function is not traced again
+        if self.rolloutForecaster is None:
+            self.rolloutForecaster = RnnStreamForecaster(self)
+        else:
+            self.rolloutForecaster.model.set_weights(self.model.get_weights())
+            self.rolloutForecaster.resetState()
+
+        logger.log('Warming Up States', 1, self.rollout.__name__)
+        historyPred = self.rolloutForecaster.extend(targetSeries, exogenousSeries)
+
+        futurePred = np.zeros((self.forecastHorizon + numFedBackSteps, self.numTargetVariables))
+        futurePred[:self.forecastHorizon] = \
+            historyPred[historyPred.shape[0] - self.forecastHorizon:]
+
+        logger.log('Begin Rollout', 1, self.rollout.__name__)
+        for step in range(numFedBackSteps):
+            futurePred[self.forecastHorizon + step] = self.rolloutForecaster.step(
+                futurePred[step],
+                None if futureExogenousSeries is None else futureExogenousSeries[step]
+            )
+
+        return futurePred[:steps]
+
+    def getStreamForecaster(
+            self,
+            targetSeries=None,
+            exogenousSeries=None
+    ):
+        """
+        Creates a streaming forecaster of this model, which carries the states
+        of the recurrent layers between calls, hence forecasting on newly
+        arrived timesteps does not require running the layers over the whole
+        history again (see RnnStreamForecaster)
+
+        :param targetSeries: If not None, then the history of the target
+        variables on which the states are warmed up, it should be a numpy
+        array of shape (n, numTargetVariables)
+        :param exogenousSeries: History of the exogenous variables, it should be
+        a numpy array of shape (n, numExoVariables), it can be None only if
+        numExoVariables is 0 in which case the exogenous variables are not
+        considered
+        :return: RnnStreamForecaster of this model
+        """
+
+        GlobalLogger.getLogger().log(
+            'Creating Stream Forecaster',
+            1,
+            self.getStreamForecaster.__name__
+        )
+
+        forecaster = RnnStreamForecaster(self)
+        if targetSeries is not None:
+            forecaster.extend(targetSeries, exogenousSeries)
+
+        return forecaster
 
     def evaluate(
             self,
@@ -216,7 +580,7 @@ class RnnForecast:
         X, Ytrue = Utility.prepareDataTrain(targetSeries, exogenousSeries, self.forecastHorizon)
 
         logger.log('Begin Evaluation', 1, self.predict.__name__)
-        Ypred = tf.squeeze(self.model.predict(np.expand_dims(X, axis=0), verbose=0), axis=0)
+        Ypred = tf.squeeze(self.forward(np.expand_dims(X, axis=0)), axis=0)
         loss = tf.keras.losses.MeanSquaredError()(
             Ytrue,
             Ypred
@@ -227,6 +591,41 @@ class RnnForecast:
         else:
             return loss
 
+    def forward(self, X):
+        """
+        Runs the model on the input using a graph compiled function whose
+        input signature does not depend on the number of series or timesteps,
+        hence it is traced only once, on its first call (see warmUp), and
+        not again for inputs of new lengths
+
+        :param X: Input of shape (b, n, numTargetVariables + numExoVariables)
+        :return: Output of the model, numpy array of shape (b, n, numTargetVariables)
+        """
+
+        if self.compiledForward is None:
+            self.compiledForward = tf.function(
+                self.model,
+                input_signature=[tf.TensorSpec(
+                    shape=(None, None, self.numTargetVariables + self.numExoVariables),
+                    dtype=tf.keras.backend.floatx()
+                )]
+            )
+
+        return self.compiledForward(X.astype(tf.keras.backend.floatx())).numpy()
+
+    def warmUp(self):
+        """
+        Traces the compiled inference function used by predict, predictBatch
+        and evaluate (see forward), so that it is not traced on the first
+        prediction, e.g. when the model is loaded by a serving worker
+
+        :return: None
+        """
+
+        GlobalLogger.getLogger().log('Warming Up', 1, self.warmUp.__name__)
+
+        self.forward(np.zeros((1, 1, self.numTargetVariables + self.numExoVariables)))
+
     def save(
             self,
             modelSavePath
@@ -266,6 +665,9 @@ class RnnForecast:
         )
 
         self.model = tf.keras.Sequential()
+        self.compiledForward = None
+        self.rolloutForecaster = None
+        self.truncatedTrainModel = None
 
         for i in range(self.numRnnLayers):
             self.model.add(self.layerClass(**self.layerParameters))
@@ -276,3 +678,136 @@ class RnnForecast:
 
         inputDimension = self.numTargetVariables + self.numExoVariables
         self.model.build(input_shape=(None, None, inputDimension))
+
+    def buildStatefulModel(self):
+        """
+        Builds a copy of the model architecture whose recurrent layers are
+        stateful, i.e. their states are carried from one call to the next,
+        for a batch of a single sequence. The weights of the model are copied
+        into it
+
+        :return: The stateful model
+        """
+
+        statefulModel = tf.keras.Sequential()
+
+        for i in range(self.numRnnLayers):
+            statefulModel.add(self.layerClass(**{**self.layerParameters, 'stateful': True}))
+
+        statefulModel.add(tf.keras.layers.TimeDistributed(
+            tf.keras.layers.Dense(self.numTargetVariables, activation=None)
+        ))
+
+        inputDimension = self.numTargetVariables + self.numExoVariables
+        statefulModel.build(input_shape=(1, None, inputDimension))
+        statefulModel.set_weights(self.model.get_weights())
+
+        return statefulModel
+
+
+class RnnStreamForecaster:
+    """
+    Streaming forecaster of a RnnForecast model. It holds a stateful copy of
+    the layers of the model with the trained weights, whose states are carried
+    between calls, hence appending timesteps costs time proportional to the
+    number of appended timesteps and not to the length of the history. The
+    weights are copied when the forecaster is created, further training of
+    the model is not reflected in it
+    """
+
+    def __init__(self, model):
+        """
+        Create RnnStreamForecaster instance of the provided model, the states
+        of its layers are initially zero, the same as in RnnForecast.predict
+
+        :param model: RnnForecast model using which to forecast
+        """
+
+        self.numTargetVariables = model.numTargetVariables
+        self.numExoVariables = model.numExoVariables
+        inputDimension = self.numTargetVariables + self.numExoVariables
+
+        self.model = model.buildStatefulModel()
+
+        self.compiledForward = tf.function(
+            self.model,
+            input_signature=[tf.TensorSpec(
+                shape=(1, None, inputDimension),
+                dtype=tf.keras.backend.floatx()
+            )]
+        )
+
+    def step(self, targetObs, exogenousObs=None):
+        """
+        Receives the observation of the next timestep and forecasts using it
+        and the carried states
+
+        :param targetObs: Observed target variables, it should be a numpy array
+        of shape (numTargetVariables,)
+        :param exogenousObs: Observed exogenous variables, it should be a numpy
+        array of shape (numExoVariables,), it can be None only if numExoVariables is 0
+        :return: Forecast target of shape (numTargetVariables,), its horizon is
+        the same as the forecastHorizon of the model
+        """
+
+        return self.extend(
+            np.expand_dims(targetObs, axis=0),
+            None if exogenousObs is None else np.expand_dims(exogenousObs, axis=0)
+        )[0]
+
+    def extend(self, targetSeries, exogenousSeries=None):
+        """
+        Receives the observations of the next timesteps and forecasts on each
+        of them using the carried states
+
+        :param targetSeries: Observed target variables, it should be a numpy
+        array of shape (n, numTargetVariables)
+        :param exogenousSeries: Observed exogenous variables, it should be a
+        numpy array of shape (n, numExoVariables), it can be None only if
+        numExoVariables is 0
+        :return: Forecast targets of shape (n, numTargetVariables), the same as
+        the last n forecast targets of RnnForecast.predict on the whole history
+        """
+
+        assert targetSeries.shape[1] == self.numTargetVariables
+        assert Utility.isExoShapeValid(exogenousSeries, self.numExoVariables)
+
+        X = Utility.prepareDataPred(targetSeries, exogenousSeries)
+        X = np.expand_dims(X.astype(tf.keras.backend.floatx()), axis=0)
+
+        return self.compiledForward(X).numpy()[0]
+
+    def getState(self):
+        """
+        Exports the states of the recurrent layers, e.g. for checkpointing
+        a stream
+
+        :return: List containing a list of states (numpy arrays of shape
+        (1, stateSize)) of each recurrent layer
+        """
+
+        return [
+            [state.numpy() for state in layer.states]
+            for layer in self.model.layers[:-1]
+        ]
+
+    def setState(self, state):
+        """
+        Imports the states of the recurrent layers
+
+        :param state: States exported by getState
+        :return: None
+        """
+
+        for layer, layerStates in zip(self.model.layers[:-1], state):
+            for variable, value in zip(layer.states, layerStates):
+                variable.assign(value)
+
+    def resetState(self):
+        """
+        Resets the states of the recurrent layers to zero
+
+        :return: None
+        """
+
+        self.model.reset_states()
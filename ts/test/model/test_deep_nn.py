@@ -1,6 +1,7 @@
 import pytest
 import os
 import numpy as np
+import tensorflow as tf
 from numpy.random import uniform, rand, randint
 from ts.model import DeepNN
 from ts.model.deep_nn import DnnDataSequence
@@ -292,6 +293,35 @@ def test_DnnDataSequence(
             assert np.array_equal(x, X[i - lag])
             assert np.array_equal(y, Y[i - lag])
 
+    X, Y = dnnDataSequence[0]
+    assert dnnDataSequence[0][0] is X and dnnDataSequence[0][1] is Y
+
+
+@pytest.mark.parametrize('Xtemp, lag', [
+    (rand(50, 1), 0),
+    (rand(50, 3), 7),
+    (rand(10, 2), 9),
+    (rand(10, 2), 12)
+], ids=['no-lag', 'lag', 'single-window', 'no-window'])
+def test_buildLagWindows(Xtemp, lag):
+    """
+    Test that the lag windows are a read only view of the feature data
+    which matches stacking the flattened windows
+
+    :param Xtemp: feature data
+    :param lag: lag value
+    """
+
+    X = DeepNN.buildLagWindows(Xtemp, lag)
+
+    numInputs = max(Xtemp.shape[0] - lag, 0)
+    assert X.shape == (numInputs, (lag + 1) * Xtemp.shape[1])
+    assert np.shares_memory(X, Xtemp) or numInputs == 0
+    assert not X.flags.writeable
+
+    for i in range(numInputs):
+        assert np.array_equal(X[i], Xtemp[i: i + lag + 1].flatten())
+
 
 @pytest.mark.parametrize(
     'forecastHorizon, lag, \
@@ -401,3 +431,147 @@ def test_evalOutputShape(
     _, evalOut = model.evaluate(targetEval, exoEval, returnPred=True)
     assert evalOut.shape \
            == (targetEval.shape[0] - forecastHorizon - lag, targetEval.shape[1])
+
+
+@pytest.mark.parametrize(
+    'trainSequences, numTargetVariables, numExoVariables, lag, batchSize', [
+        (
+            [rand(length, 2) for length in list(randint(40, 60, size=(6,)))],
+            2, 0, 5, 16
+        ),
+        (
+            [(rand(length + 1, 2), rand(length, 3))
+             for length in list(randint(40, 60, size=(6,)))],
+            2, 3, 3, 32
+        )
+    ], ids=['nonexo', 'exo'])
+def test_trainMiniBatched(
+    trainSequences, numTargetVariables, numExoVariables, lag, batchSize
+):
+    """ Test training on shuffled mini batches of the inputs of the sequences """
+
+    model = DeepNN(
+        lag=lag,
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+
+    losses = model.train(
+        trainSequences,
+        numIterations=2,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        batchSize=batchSize
+    )
+
+    assert len(losses) == 2
+    assert np.all(np.isfinite(losses))
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, numTargetVariables, numExoVariables, lag, chunkSize', [
+        (rand(300, 1), None, 1, 0, 5, 40),
+        (rand(300, 2), rand(300, 3), 2, 3, 10, 29),
+        (rand(300, 2), rand(300, 3), 2, 3, 10, 290),
+        (rand(300, 1), None, 1, 0, 5, 1000),
+        (rand(5, 1), None, 1, 0, 5, 40),
+        (rand(10, 2), rand(10, 3), 2, 3, 10, 29)
+    ], ids=['nonexo', 'exo', 'exo-single-chunk', 'nonexo-large-chunk', 'nonexo-no-pred', 'exo-no-pred'])
+def test_predictChunks(
+    targetSeries,
+    exogenousSeries,
+    numTargetVariables,
+    numExoVariables,
+    lag,
+    chunkSize
+):
+    """ Test that chunked prediction is the same as prediction on the whole series """
+
+    model = DeepNN(
+        lag=lag,
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+
+    chunks = list(model.predictChunks(targetSeries, exogenousSeries, chunkSize))
+    assert all(chunk.shape[0] <= chunkSize for chunk in chunks)
+    assert sum(chunk.shape[0] for chunk in chunks) == targetSeries.shape[0] - lag
+
+    predictions = model.predict(targetSeries, exogenousSeries)
+    chunkedPredictions = model.predict(targetSeries, exogenousSeries, chunkSize=chunkSize)
+
+    assert chunkedPredictions.shape == predictions.shape
+    assert np.allclose(predictions, chunkedPredictions)
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, numTargetVariables, numExoVariables, lag', [
+        (rand(60, 1), None, 1, 0, 5),
+        (rand(60, 2), rand(60, 3), 2, 3, 10),
+        (rand(60, 1), None, 1, 0, 0)
+    ], ids=['nonexo', 'exo', 'no-lag'])
+def test_onlineForecaster(
+    targetSeries,
+    exogenousSeries,
+    numTargetVariables,
+    numExoVariables,
+    lag
+):
+    """ Test that the online forecasts are the same as the forecasts on the whole series """
+
+    model = DeepNN(
+        lag=lag,
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables,
+        numLayers=2
+    )
+
+    forecaster = model.getOnlineForecaster(
+        targetSeries[:lag],
+        None if exogenousSeries is None else exogenousSeries[:lag]
+    )
+
+    onlinePred = np.array([
+        forecaster.update(
+            targetSeries[i],
+            None if exogenousSeries is None else exogenousSeries[i]
+        )
+        for i in range(lag, targetSeries.shape[0])
+    ])
+
+    X = DeepNN.prepareDataPredDNN(targetSeries, exogenousSeries, lag)
+    assert onlinePred.shape == (targetSeries.shape[0] - lag, numTargetVariables)
+    assert np.allclose(onlinePred, model.model.predict(X, verbose=0), atol=1e-6)
+
+
+@pytest.mark.parametrize('lengths, numTargetVariables, numExoVariables, lag', [
+    ([10, 37, 6, 100], 2, 0, 4),
+    ([20, 12, 64], 1, 3, 2)
+], ids=['nonexo', 'exo'])
+def test_warmUp(lengths, numTargetVariables, numExoVariables, lag):
+    """
+    Test that the inference function of a model loaded with warm up is
+    traced only once, for series of any length
+    """
+
+    model = DeepNN(
+        lag=lag,
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+    model.save(FILE_PATH)
+
+    model = DeepNN.load(FILE_PATH, warmUp=True)
+    assert model.compiledForward.experimental_get_tracing_count() == 1
+
+    for length in lengths:
+        targetSeries = rand(length + 1, numTargetVariables)
+        exogenousSeries = rand(length, numExoVariables) if numExoVariables > 0 else None
+
+        model.predict(targetSeries[:length], exogenousSeries)
+        model.predict(targetSeries[:length], exogenousSeries, chunkSize=3)
+        model.evaluate(targetSeries, exogenousSeries)
+
+    assert model.compiledForward.experimental_get_tracing_count() == 1
+
+    os.remove(FILE_PATH)
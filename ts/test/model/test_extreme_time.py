@@ -1,4 +1,6 @@
 import pytest
+import numpy as np
+import tensorflow as tf
 from numpy.random import rand
 from ts.model import ExtremeTime
 
@@ -105,3 +107,403 @@ def test_evalOutputShape(
 
     _, evalOut = model.evaluate(targetEval, exoEval, returnPred=True)
     assert evalOut.shape == (targetEval.shape[0] - forecastHorizon,)
+
+
+@pytest.mark.parametrize(
+    'X, Y, currentTime', [
+        (rand(100, 1), rand(100), 50),
+        (rand(120, 4), rand(120), 73)
+    ], ids=['nonexo', 'exo'])
+def test_batchEncodingMemory(X, Y, currentTime):
+    """
+    Test that the memory built by encoding all windows together as a
+    batch is the same as the memory built by encoding them one by one
+
+    :param X: features
+    :param Y: targets
+    :param currentTime: time till which memory is built
+    """
+
+    model = ExtremeTime(
+        memorySize=7,
+        windowSize=6,
+        encoderStateSize=5,
+        lstmStateSize=5,
+        numExoVariables=X.shape[1] - 1
+    )
+
+    np.random.seed(0)
+    model.batchEncoding = False
+    model.buildMemory(X, Y, currentTime)
+    memory, q = model.memory.numpy(), model.q.numpy()
+
+    np.random.seed(0)
+    model.batchEncoding = True
+    model.buildMemory(X, Y, currentTime)
+
+    assert np.allclose(memory, model.memory.numpy())
+    assert np.array_equal(q, model.q.numpy())
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, seqLength', [
+        (rand(120), None, 30),
+        (rand(120), rand(119, 3), 40)
+    ], ids=['nonexo', 'exo'])
+def test_compiledTrainLoss(targetSeries, exogenousSeries, seqLength):
+    """
+    Test that training with the compiled training path gives the same
+    losses as training with the eager training path
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param seqLength: train sequence length
+    """
+
+    numExoVariables = 0 if exogenousSeries is None else exogenousSeries.shape[1]
+    losses = []
+    weights = None
+
+    for compiled in [False, True]:
+        model = ExtremeTime(
+            memorySize=5,
+            windowSize=5,
+            encoderStateSize=5,
+            lstmStateSize=5,
+            numExoVariables=numExoVariables
+        )
+
+        layers = [model.gruEncoder, model.lstm, model.outDense, model.embeddingDense]
+        if weights is None:
+            weights = [layer.get_weights() for layer in layers]
+        else:
+            for layer, layerWeights in zip(layers, weights):
+                layer.set_weights(layerWeights)
+
+        np.random.seed(0)
+        losses.append(model.train(
+            targetSeries, seqLength, exogenousSeries,
+            numIterations=2,
+            optimizer=tf.optimizers.SGD(0.1),
+            compiled=compiled
+        ))
+
+    assert np.allclose(losses[0], losses[1])
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, targetTest, exoTest', [
+        (rand(100), None, rand(20), None),
+        (rand(100), rand(99, 3), rand(20), rand(20, 3))
+    ], ids=['nonexo', 'exo'])
+def test_predictNext(targetSeries, exogenousSeries, targetTest, exoTest):
+    """
+    Test that predicting one observation at a time gives the same
+    forecasts as predicting on the whole series
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param targetTest: test target series
+    :param exoTest: test exogenous series (can be None)
+    """
+
+    model = ExtremeTime(
+        memorySize=5,
+        windowSize=5,
+        encoderStateSize=5,
+        lstmStateSize=5,
+        numExoVariables=0 if exoTest is None else exoTest.shape[1]
+    )
+
+    model.train(
+        targetSeries, 30, exogenousSeries,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    stateSnapshot = model.snapshotState()
+    pred = model.predict(targetTest, exoTest)
+
+    model.restoreState(stateSnapshot)
+    predNext = [
+        model.predictNext(targetTest[t], None if exoTest is None else exoTest[t])
+        for t in range(targetTest.shape[0])
+    ]
+
+    assert np.allclose(pred, predNext)
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, targetTest, exoTest', [
+        (rand(100), None, rand(50), None),
+        (rand(100), rand(99, 3), rand(50), rand(50, 3))
+    ], ids=['nonexo', 'exo'])
+def test_vectorizedPredict(targetSeries, exogenousSeries, targetTest, exoTest):
+    """
+    Test that predicting all the timesteps together gives the same
+    forecasts as predicting one timestep at a time
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param targetTest: test target series
+    :param exoTest: test exogenous series (can be None)
+    """
+
+    model = ExtremeTime(
+        memorySize=5,
+        windowSize=5,
+        encoderStateSize=5,
+        lstmStateSize=5,
+        numExoVariables=0 if exoTest is None else exoTest.shape[1]
+    )
+
+    model.train(
+        targetSeries, 30, exogenousSeries,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    stateSnapshot = model.snapshotState()
+    pred = model.predict(targetTest, exoTest)
+
+    model.restoreState(stateSnapshot)
+    predVectorized = model.predict(targetTest, exoTest, vectorized=True)
+
+    assert predVectorized.shape == pred.shape
+    assert np.allclose(pred, predVectorized)
+
+
+@pytest.mark.parametrize(
+    'memoryRefreshFraction, memoryRefreshPeriod', [
+        (0.3, None),
+        (0.5, 1)
+    ], ids=['partial', 'periodic'])
+def test_memoryBank(memoryRefreshFraction, memoryRefreshPeriod):
+    """
+    Test that a memory update re-encodes only the stalest fraction of
+    the memory slots, and that the whole memory is rebuilt once the
+    refresh period is reached
+
+    :param memoryRefreshFraction: fraction of the memory re-encoded
+    on every update
+    :param memoryRefreshPeriod: number of partial refreshes after which
+    the whole memory is rebuilt
+    """
+
+    memorySize = 10
+    X, Y = rand(200, 1), rand(200)
+
+    model = ExtremeTime(
+        memorySize=memorySize,
+        windowSize=5,
+        encoderStateSize=5,
+        lstmStateSize=5,
+        memoryRefreshFraction=memoryRefreshFraction,
+        memoryRefreshPeriod=memoryRefreshPeriod
+    )
+
+    numRefresh = int(np.ceil(memoryRefreshFraction * memorySize))
+
+    model.updateMemory(X, Y, 50)
+    memory = model.memory.numpy()
+
+    model.updateMemory(X, Y, 60)
+    assert np.sum(model.memoryStaleness == 0) == numRefresh
+    assert np.allclose(
+        memory[model.memoryStaleness > 0],
+        model.memory.numpy()[model.memoryStaleness > 0]
+    )
+
+    model.updateMemory(X, Y, 70)
+    if memoryRefreshPeriod is not None:
+        assert np.all(model.memoryStaleness == 0)
+
+    assert np.all(model.memoryWindowStartTimes <= 70 - model.windowSize)
+    assert np.array_equal(
+        model.q.numpy(),
+        Y[model.memoryWindowStartTimes + model.windowSize - 1]
+    )
+
+
+@pytest.mark.parametrize(
+    'targetSeries, targetTest, attentionTopK, isDense', [
+        (rand(100), rand(30), 6, True),
+        (rand(100), rand(30), 2, False)
+    ], ids=['all-slots', 'few-slots'])
+def test_topKAttention(targetSeries, targetTest, attentionTopK, isDense):
+    """
+    Test that attending to the top k memory slots gives the same forecasts
+    as dense attention when k is the memory size, and differing but valid
+    forecasts otherwise
+
+    :param targetSeries: train target series
+    :param targetTest: test target series
+    :param attentionTopK: number of memory slots attended to
+    :param isDense: whether attentionTopK is the memory size
+    """
+
+    model = ExtremeTime(
+        memorySize=6,
+        windowSize=5,
+        encoderStateSize=5,
+        lstmStateSize=5
+    )
+
+    model.train(
+        targetSeries, 30,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    stateSnapshot = model.snapshotState()
+    pred = model.predict(targetTest)
+
+    model.attentionTopK = attentionTopK
+    model.restoreState(stateSnapshot)
+    predTopK = model.predict(targetTest)
+
+    assert predTopK.shape == pred.shape
+    assert np.all(np.isfinite(predTopK))
+    assert np.allclose(pred, predTopK) == isDense
+
+
+@pytest.mark.parametrize(
+    'targetSeries, targetTest, numPrototypes, isExact', [
+        (rand(100), rand(30), 6, True),
+        (rand(100), rand(30), 3, False)
+    ], ids=['all-slots', 'few-prototypes'])
+def test_compactMemory(targetSeries, targetTest, numPrototypes, isExact):
+    """
+    Test that compacting the memory into as many prototypes as memory slots
+    gives the same forecasts as the original memory, and that compacting into
+    fewer prototypes gives valid forecasts from a smaller memory
+
+    :param targetSeries: train target series
+    :param targetTest: test target series
+    :param numPrototypes: number of prototypes
+    :param isExact: whether numPrototypes is the memory size
+    """
+
+    model = ExtremeTime(
+        memorySize=6,
+        windowSize=5,
+        encoderStateSize=5,
+        lstmStateSize=5
+    )
+
+    model.train(
+        targetSeries, 30,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    stateSnapshot = model.snapshotState()
+    pred = model.predict(targetTest)
+
+    model.compactMemory(numPrototypes)
+    assert model.memory.shape[0] <= numPrototypes
+    assert model.q.shape[0] == model.memory.shape[0]
+
+    model.restoreState(stateSnapshot)
+    predCompact = model.predict(targetTest)
+
+    model.restoreState(stateSnapshot)
+    predCompactVectorized = model.predict(targetTest, vectorized=True)
+
+    assert predCompact.shape == pred.shape
+    assert np.all(np.isfinite(predCompact))
+    assert np.allclose(predCompact, predCompactVectorized)
+    if isExact:
+        assert np.allclose(pred, predCompact)
+
+
+@pytest.mark.parametrize(
+    'targetSeries, targetTest, dtype', [
+        (rand(100), rand(30), 'float32'),
+        (rand(100), rand(30), 'float64')
+    ], ids=['float32', 'float64'])
+def test_dtype(targetSeries, targetTest, dtype):
+    """
+    Test that the model computes in its own float type, and that it does not
+    change the default float type of Keras
+
+    :param targetSeries: train target series
+    :param targetTest: test target series
+    :param dtype: float type of the model
+    """
+
+    floatx = tf.keras.backend.floatx()
+
+    model = ExtremeTime(
+        memorySize=6,
+        windowSize=5,
+        encoderStateSize=5,
+        lstmStateSize=5,
+        dtype=dtype
+    )
+
+    model.train(
+        targetSeries, 30,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    pred = model.predict(targetTest)
+
+    assert tf.keras.backend.floatx() == floatx
+    assert pred.dtype == dtype
+    assert model.memory.dtype == dtype
+    assert all(var.dtype == dtype for var in model.getTrainableVariables())
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, seqLength, checkpointLength, memoryRefreshFraction', [
+        (rand(120), None, 30, 7, 1.0),
+        (rand(120), rand(119, 3), 40, 40, 1.0),
+        (rand(120), None, 30, 4, 0.4)
+    ], ids=['nonexo', 'exo', 'partial-refresh'])
+def test_checkpointedTrainLoss(
+    targetSeries, exogenousSeries, seqLength,
+    checkpointLength, memoryRefreshFraction
+):
+    """
+    Test that training with gradient checkpointing gives the same losses as
+    training without it
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param seqLength: train sequence length
+    :param checkpointLength: chunk length of gradient checkpointing
+    :param memoryRefreshFraction: fraction of the memory refreshed per sequence
+    """
+
+    numExoVariables = 0 if exogenousSeries is None else exogenousSeries.shape[1]
+    losses = []
+    weights = None
+
+    for isCheckpointed in [False, True]:
+        model = ExtremeTime(
+            memorySize=5,
+            windowSize=5,
+            encoderStateSize=5,
+            lstmStateSize=5,
+            numExoVariables=numExoVariables,
+            memoryRefreshFraction=memoryRefreshFraction
+        )
+
+        layers = [model.gruEncoder, model.lstm, model.outDense, model.embeddingDense]
+        if weights is None:
+            weights = [layer.get_weights() for layer in layers]
+        else:
+            for layer, layerWeights in zip(layers, weights):
+                layer.set_weights(layerWeights)
+
+        np.random.seed(0)
+        losses.append(model.train(
+            targetSeries, seqLength, exogenousSeries,
+            numIterations=2,
+            optimizer=tf.optimizers.SGD(0.1),
+            checkpointLength=checkpointLength if isCheckpointed else None
+        ))
+
+    assert np.allclose(losses[0], losses[1])
@@ -1,4 +1,6 @@
 import pytest
+import numpy as np
+import tensorflow as tf
 from numpy.random import rand
 from ts.model import ExtremeTime2
 
@@ -105,3 +107,386 @@ def test_evalOutputShape(
 
     _, evalOut = model.evaluate(targetEval, exoEval, returnPred=True)
     assert evalOut.shape == (targetEval.shape[0] - forecastHorizon,)
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, seqLength', [
+        (rand(120), None, 30),
+        (rand(120), rand(119, 3), 40)
+    ], ids=['nonexo', 'exo'])
+def test_compiledTrainLoss(targetSeries, exogenousSeries, seqLength):
+    """
+    Test that training with the compiled training path gives the same
+    losses as training with the eager training path
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param seqLength: train sequence length
+    """
+
+    numExoVariables = 0 if exogenousSeries is None else exogenousSeries.shape[1]
+    losses = []
+    weights = None
+
+    for compiled in [False, True]:
+        model = ExtremeTime2(
+            memorySize=5,
+            windowSize=5,
+            embeddingSize=5,
+            contextSize=5,
+            numExoVariables=numExoVariables
+        )
+
+        layers = [model.gruInput, model.gruMemory, model.gruContext, model.outDense]
+        if weights is None:
+            weights = [layer.get_weights() for layer in layers]
+        else:
+            for layer, layerWeights in zip(layers, weights):
+                layer.set_weights(layerWeights)
+
+        np.random.seed(0)
+        losses.append(model.train(
+            targetSeries, seqLength, exogenousSeries,
+            numIterations=2,
+            optimizer=tf.optimizers.SGD(0.1),
+            compiled=compiled
+        ))
+
+    assert np.allclose(losses[0], losses[1])
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, targetTest, exoTest', [
+        (rand(100), None, rand(20), None),
+        (rand(100), rand(99, 3), rand(20), rand(20, 3))
+    ], ids=['nonexo', 'exo'])
+def test_predictNext(targetSeries, exogenousSeries, targetTest, exoTest):
+    """
+    Test that predicting one observation at a time gives the same
+    forecasts as predicting on the whole series
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param targetTest: test target series
+    :param exoTest: test exogenous series (can be None)
+    """
+
+    model = ExtremeTime2(
+        memorySize=5,
+        windowSize=5,
+        embeddingSize=5,
+        contextSize=5,
+        numExoVariables=0 if exoTest is None else exoTest.shape[1]
+    )
+
+    model.train(
+        targetSeries, 30, exogenousSeries,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    stateSnapshot = model.snapshotState()
+    pred = model.predict(targetTest, exoTest)
+
+    model.restoreState(stateSnapshot)
+    predNext = [
+        model.predictNext(targetTest[t], None if exoTest is None else exoTest[t])
+        for t in range(targetTest.shape[0])
+    ]
+
+    assert np.allclose(pred, predNext)
+
+
+@pytest.mark.parametrize(
+    'targetSeries, targetTest, attentionTopK, isDense', [
+        (rand(100), rand(30), 6, True),
+        (rand(100), rand(30), 2, False)
+    ], ids=['all-slots', 'few-slots'])
+def test_topKAttention(targetSeries, targetTest, attentionTopK, isDense):
+    """
+    Test that attending to the top k memory slots gives the same forecasts
+    as dense attention when k is the memory size, and differing but valid
+    forecasts otherwise
+
+    :param targetSeries: train target series
+    :param targetTest: test target series
+    :param attentionTopK: number of memory slots attended to
+    :param isDense: whether attentionTopK is the memory size
+    """
+
+    model = ExtremeTime2(
+        memorySize=6,
+        windowSize=5,
+        embeddingSize=5,
+        contextSize=5
+    )
+
+    model.train(
+        targetSeries, 30,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    stateSnapshot = model.snapshotState()
+    pred = model.predict(targetTest)
+
+    model.attentionTopK = attentionTopK
+    model.restoreState(stateSnapshot)
+    predTopK = model.predict(targetTest)
+
+    assert predTopK.shape == pred.shape
+    assert np.all(np.isfinite(predTopK))
+    assert np.allclose(pred, predTopK) == isDense
+
+
+@pytest.mark.parametrize(
+    'targetSeries, targetTest, numPrototypes, attentionTopK, isExact', [
+        (rand(100), rand(30), 6, None, True),
+        (rand(100), rand(30), 6, 6, True),
+        (rand(100), rand(30), 3, None, False),
+        (rand(100), rand(30), 3, 2, False)
+    ], ids=['all-slots', 'all-slots-top-k', 'few-prototypes', 'few-prototypes-top-k'])
+def test_compactMemory(targetSeries, targetTest, numPrototypes, attentionTopK, isExact):
+    """
+    Test that compacting the memory into as many prototypes as memory slots
+    gives the same forecasts as the original memory, and that compacting into
+    fewer prototypes gives valid forecasts from a smaller memory
+
+    :param targetSeries: train target series
+    :param targetTest: test target series
+    :param numPrototypes: number of prototypes
+    :param attentionTopK: number of memory slots attended to
+    :param isExact: whether numPrototypes is the memory size
+    """
+
+    model = ExtremeTime2(
+        memorySize=6,
+        windowSize=5,
+        embeddingSize=5,
+        contextSize=5,
+        attentionTopK=attentionTopK
+    )
+
+    model.train(
+        targetSeries, 30,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    stateSnapshot = model.snapshotState()
+    pred = model.predict(targetTest)
+
+    model.compactMemory(numPrototypes)
+    assert model.memory.shape[0] <= numPrototypes
+    assert model.memoryValues.shape[0] == model.memory.shape[0]
+
+    model.restoreState(stateSnapshot)
+    predCompact = model.predict(targetTest)
+
+    assert predCompact.shape == pred.shape
+    assert np.all(np.isfinite(predCompact))
+    if isExact:
+        assert np.allclose(pred, predCompact)
+
+
+@pytest.mark.parametrize(
+    'targetSeries, targetTest, dtype', [
+        (rand(100), rand(30), 'float32'),
+        (rand(100), rand(30), 'float64')
+    ], ids=['float32', 'float64'])
+def test_dtype(targetSeries, targetTest, dtype):
+    """
+    Test that the model computes in its own float type, and that it does not
+    change the default float type of Keras
+
+    :param targetSeries: train target series
+    :param targetTest: test target series
+    :param dtype: float type of the model
+    """
+
+    floatx = tf.keras.backend.floatx()
+
+    model = ExtremeTime2(
+        memorySize=6,
+        windowSize=5,
+        embeddingSize=5,
+        contextSize=5,
+        dtype=dtype
+    )
+
+    model.train(
+        targetSeries, 30,
+        optimizer=tf.optimizers.SGD(0.1),
+        returnLosses=False
+    )
+
+    pred = model.predict(targetTest)
+
+    assert tf.keras.backend.floatx() == floatx
+    assert pred.dtype == dtype
+    assert model.memory.dtype == dtype
+    assert all(var.dtype == dtype for var in model.getTrainableVariables())
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, seqLength', [
+        (rand(120), None, 30),
+        (rand(120), rand(119, 3), 40)
+    ], ids=['nonexo', 'exo'])
+def test_trainBatchSingleSeries(targetSeries, exogenousSeries, seqLength):
+    """
+    Test that training on a batch containing a single series gives the same
+    loss, state and memory as training on the series with the compiled
+    training path
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param seqLength: train sequence length
+    """
+
+    numExoVariables = 0 if exogenousSeries is None else exogenousSeries.shape[1]
+    models = []
+    losses = []
+    weights = None
+
+    for isBatch in [False, True]:
+        model = ExtremeTime2(
+            memorySize=5,
+            windowSize=5,
+            embeddingSize=5,
+            contextSize=5,
+            numExoVariables=numExoVariables
+        )
+
+        layers = [model.gruInput, model.gruMemory, model.gruContext, model.outDense]
+        if weights is None:
+            weights = [layer.get_weights() for layer in layers]
+        else:
+            for layer, layerWeights in zip(layers, weights):
+                layer.set_weights(layerWeights)
+
+        np.random.seed(0)
+        if isBatch:
+            losses.append(model.trainBatch(
+                [targetSeries], seqLength,
+                None if exogenousSeries is None else [exogenousSeries],
+                optimizer=tf.optimizers.SGD(0.1)
+            ))
+        else:
+            losses.append(model.train(
+                targetSeries, seqLength, exogenousSeries,
+                optimizer=tf.optimizers.SGD(0.1),
+                compiled=True
+            ))
+
+        models.append(model)
+
+    assert np.allclose(losses[0], losses[1])
+    assert np.allclose(models[0].state, models[1].state)
+    assert np.allclose(models[0].memory, models[1].memory)
+
+
+@pytest.mark.parametrize(
+    'targetSeriesList, exogenousSeriesList, seqLength, targetTest, exoTest', [
+        (
+            [rand(100), rand(60), rand(130)], None, 25,
+            rand(20), None
+        ),
+        (
+            [rand(100), rand(60)], [rand(99, 2), rand(59, 2)], 25,
+            rand(20), rand(20, 2)
+        )
+    ], ids=['nonexo', 'exo'])
+def test_trainBatch(targetSeriesList, exogenousSeriesList, seqLength, targetTest, exoTest):
+    """
+    Test that training on a batch of series of different lengths gives finite
+    losses and a model which can predict on a single series
+
+    :param targetSeriesList: list of train target series
+    :param exogenousSeriesList: list of train exogenous series (can be None)
+    :param seqLength: train sequence length
+    :param targetTest: test target series
+    :param exoTest: test exogenous series (can be None)
+    """
+
+    model = ExtremeTime2(
+        memorySize=5,
+        windowSize=5,
+        embeddingSize=5,
+        contextSize=5,
+        numExoVariables=0 if exoTest is None else exoTest.shape[1]
+    )
+
+    losses = model.trainBatch(
+        targetSeriesList, seqLength, exogenousSeriesList,
+        numIterations=2,
+        optimizer=tf.optimizers.SGD(0.1)
+    )
+
+    assert losses.shape == (2,)
+    assert np.all(np.isfinite(losses))
+    assert model.state.shape == (1, model.embeddingSize)
+
+    pred = model.predict(targetTest, exoTest)
+    assert pred.shape == (targetTest.shape[0],)
+
+
+@pytest.mark.parametrize(
+    'targetSeries, exogenousSeries, seqLength', [
+        (rand(100), None, 30),
+        (rand(100), rand(99, 3), 40)
+    ], ids=['nonexo', 'exo'])
+def test_fusedEncoder(targetSeries, exogenousSeries, seqLength):
+    """
+    Test that training with the fused encoder gives the same losses as
+    training with the separate encoders, and that a model saved without
+    the fused encoder builds the same memory with it after loading
+
+    :param targetSeries: train target series
+    :param exogenousSeries: train exogenous series (can be None)
+    :param seqLength: train sequence length
+    """
+
+    numExoVariables = 0 if exogenousSeries is None else exogenousSeries.shape[1]
+    losses = []
+    weights = None
+
+    for fusedEncoder in [False, True]:
+        model = ExtremeTime2(
+            memorySize=5,
+            windowSize=5,
+            embeddingSize=5,
+            contextSize=4,
+            numExoVariables=numExoVariables,
+            fusedEncoder=fusedEncoder
+        )
+
+        layers = [model.gruInput, model.gruMemory, model.gruContext, model.outDense]
+        if weights is None:
+            weights = [layer.get_weights() for layer in layers]
+        else:
+            for layer, layerWeights in zip(layers, weights):
+                layer.set_weights(layerWeights)
+
+        np.random.seed(0)
+        losses.append(model.train(
+            targetSeries, seqLength, exogenousSeries,
+            optimizer=tf.optimizers.SGD(0.1)
+        ))
+
+    assert np.allclose(losses[0], losses[1])
+
+    model.fusedEncoder = False
+    model.save(FILE_PATH)
+
+    X = np.random.rand(50, numExoVariables + 1)
+    np.random.seed(0)
+    model.buildMemory(X, 50)
+
+    loadedModel = ExtremeTime2.load(FILE_PATH)
+    loadedModel.fusedEncoder = True
+    np.random.seed(0)
+    loadedModel.buildMemory(X, 50)
+
+    assert np.allclose(model.memory, loadedModel.memory)
+    assert np.allclose(model.context, loadedModel.context)
@@ -1,7 +1,9 @@
 import pytest
 import os
+import itertools
 import numpy as np
 from ts.model import GmmHmmForecast
+from ts.model.gmm_hmm_forecast import SlidingWindowProduct
 
 FILE_PATH = 'model/scratch/model'
 
@@ -57,3 +59,161 @@ def test_predictOutputShape(xTrain, xTest):
     pred = model.predict(xTest, discParamSet)
 
     assert pred.shape == (xTest.shape[0] - latency, dim)
+
+
+@pytest.mark.parametrize('dim, latency, covarianceType', [
+    (2, 3, 'full'),
+    (3, 0, 'diag'),
+    (1, 4, 'spherical'),
+    (2, 2, 'tied')
+], ids=['full', 'diag-no-latency', 'spherical', 'tied'])
+def test_predictExhaustive(dim, latency, covarianceType):
+    """
+    Test that the predictions are the candidates which maximize the log
+    likelihood of the conditioning window followed by them, as computed by
+    scoring every such window
+    """
+
+    xTrain = np.random.uniform(-1, 1, size=(80, dim))
+    xTest = np.random.uniform(-1, 1, size=(latency + 4, dim))
+    discParamSet = [np.random.uniform(-1, 1, size=(4,)) for _ in range(dim)]
+
+    model = GmmHmmForecast(3, 2, dim, d=latency, numIterations=2, covariance_type=covarianceType)
+    model.train([xTrain])
+
+    pred, maxLikelihoodValues = model.predict(xTest, discParamSet, returnMaxLikelihood=True)
+
+    for t in range(latency, xTest.shape[0]):
+        likelihoods = [
+            model.model.score(np.concatenate([xTest[t - latency: t], [candidate]]))
+            for candidate in itertools.product(*discParamSet)
+        ]
+        bestIdx = int(np.argmax(likelihoods))
+
+        assert np.array_equal(pred[t - latency], list(itertools.product(*discParamSet))[bestIdx])
+        assert np.isclose(maxLikelihoodValues[t - latency], likelihoods[bestIdx])
+
+
+@pytest.mark.parametrize('dim, latency, covarianceType', [
+    (2, 3, 'full'),
+    (3, 0, 'diag'),
+    (1, 1, 'spherical'),
+    (2, 17, 'tied')
+], ids=['full', 'diag-no-latency', 'spherical-latency-1', 'tied-long-latency'])
+def test_predictSlidingWindow(dim, latency, covarianceType):
+    """ Test that the sliding window predictions are the same as the ones on each window """
+
+    xTrain = np.random.uniform(-1, 1, size=(80, dim))
+    xTest = np.random.uniform(-1, 1, size=(latency + 30, dim))
+    discParamSet = [np.random.uniform(-1, 1, size=(5,)) for _ in range(dim)]
+
+    model = GmmHmmForecast(3, 2, dim, d=latency, numIterations=2, covariance_type=covarianceType)
+    model.train([xTrain])
+
+    pred, maxLikelihoodValues = model.predict(xTest, discParamSet, returnMaxLikelihood=True)
+    slidingPred, slidingMaxLikelihoodValues = model.predict(
+        xTest, discParamSet, returnMaxLikelihood=True, slidingWindow=True
+    )
+
+    assert np.array_equal(pred, slidingPred)
+    assert np.allclose(maxLikelihoodValues, slidingMaxLikelihoodValues)
+
+
+def test_SlidingWindowProduct():
+    """ Test the product of the matrices of a sliding window in the log domain """
+
+    matrices = [np.log(np.random.uniform(0.1, 1, size=(3, 3))) for _ in range(40)]
+    window = SlidingWindowProduct()
+    assert window.product() is None
+
+    start = 0
+    for end, matrix in enumerate(matrices, 1):
+        window.push(matrix)
+
+        # windows of varying lengths, by popping between 0 and 2 matrices
+        for _ in range(np.random.randint(0, 3)):
+            if start < end - 1:
+                window.pop()
+                start += 1
+
+        expected = np.linalg.multi_dot([np.eye(3)] + [np.exp(m) for m in matrices[start: end]])
+        assert np.allclose(np.exp(window.product()), expected)
+
+
+@pytest.mark.parametrize('dim, numValues, searchBudget', [
+    (1, 12, 1000),
+    (3, 6, 1000),
+    (4, 5, 40),
+    (2, 8, 3)
+], ids=['single-dimension', 'multi-dimension', 'small-budget', 'starts-only'])
+def test_predictCoordinate(dim, numValues, searchBudget):
+    """
+    Test that the coordinate ascent predictions are allowed observations whose
+    log likelihoods are correct and at most the ones of the exhaustive search,
+    and the same as them when there is a single dimension
+    """
+
+    latency = 3
+    xTrain = np.random.uniform(-1, 1, size=(80, dim))
+    xTest = np.random.uniform(-1, 1, size=(latency + 6, dim))
+    discParamSet = [np.random.uniform(-1, 1, size=(numValues,)) for _ in range(dim)]
+
+    model = GmmHmmForecast(3, 2, dim, d=latency, numIterations=2)
+    model.train([xTrain])
+
+    _, maxLikelihoodValues = model.predict(xTest, discParamSet, returnMaxLikelihood=True)
+    pred, searchedLikelihoodValues = model.predict(
+        xTest, discParamSet, returnMaxLikelihood=True,
+        searchMode='coordinate', searchBudget=searchBudget, numRestarts=3
+    )
+
+    assert pred.shape == (xTest.shape[0] - latency, dim)
+
+    for t in range(latency, xTest.shape[0]):
+        obs = pred[t - latency]
+        assert all(obs[i] in discParamSet[i] for i in range(dim))
+
+        assert np.isclose(
+            searchedLikelihoodValues[t - latency],
+            model.model.score(np.concatenate([xTest[t - latency: t], [obs]]))
+        )
+
+    assert np.all(np.array(searchedLikelihoodValues) <= np.array(maxLikelihoodValues) + 1e-9)
+
+    if dim == 1:
+        assert np.allclose(searchedLikelihoodValues, maxLikelihoodValues)
+
+
+@pytest.mark.parametrize('dim, covarianceType', [
+    (1, 'full'),
+    (2, 'diag'),
+    (3, 'spherical'),
+    (2, 'tied')
+], ids=['full', 'diag', 'spherical', 'tied'])
+def test_predictContinuous(dim, covarianceType):
+    """
+    Test that the continuous predictions have correct log likelihoods which
+    are at least the ones of the exhaustive search on a grid
+    """
+
+    latency = 3
+    xTrain = np.random.uniform(-1, 1, size=(80, dim))
+    xTest = np.random.uniform(-1, 1, size=(latency + 5, dim))
+    discParamSet = [np.linspace(-1, 1, 7) for _ in range(dim)]
+
+    model = GmmHmmForecast(3, 2, dim, d=latency, numIterations=2, covariance_type=covarianceType)
+    model.train([xTrain])
+
+    _, gridLikelihoodValues = model.predict(xTest, discParamSet, returnMaxLikelihood=True)
+    pred, maxLikelihoodValues = model.predict(
+        xTest, None, returnMaxLikelihood=True, searchMode='continuous'
+    )
+
+    assert pred.shape == (xTest.shape[0] - latency, dim)
+    assert np.all(np.array(maxLikelihoodValues) >= np.array(gridLikelihoodValues) - 1e-6)
+
+    for t in range(latency, xTest.shape[0]):
+        assert np.isclose(
+            maxLikelihoodValues[t - latency],
+            model.model.score(np.concatenate([xTest[t - latency: t], [pred[t - latency]]]))
+        )
@@ -4,6 +4,7 @@ import numpy as np
 import tensorflow as tf
 from numpy.random import uniform, rand, randint
 from ts.model import RnnForecast
+from ts.utility import BucketedDataSequence
 
 FILE_PATH = 'model/scratch/model'
 
@@ -173,3 +174,384 @@ def test_evalOutputShape(
     _, evalOut = model.evaluate(targetEval, exoEval, returnPred=True)
     assert evalOut.shape \
            == (targetEval.shape[0] - forecastHorizon, targetEval.shape[1])
+
+
+@pytest.mark.parametrize(
+    'trainSequences, numTargetVariables, numExoVariables, windowLength, batchSize', [
+        (
+            [rand(length, 2) for length in list(randint(40, 60, size=(6,)))],
+            2, 0, 10, 4
+        ),
+        (
+            [(rand(length + 1, 2), rand(length, 3))
+             for length in list(randint(40, 60, size=(6,)))],
+            2, 3, 15, 8
+        )
+    ], ids=['nonexo', 'exo'])
+def test_trainMiniBatched(
+    trainSequences, numTargetVariables, numExoVariables, windowLength, batchSize
+):
+    """ Test training on shuffled mini batches of windows of the sequences """
+
+    model = RnnForecast(
+        forecastHorizon=1,
+        layerClass=tf.keras.layers.SimpleRNN,
+        layerParameters={
+            'units': 10,
+            'return_sequences': True
+        },
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+
+    losses = model.train(
+        trainSequences,
+        numIterations=2,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        batchSize=batchSize,
+        windowLength=windowLength
+    )
+
+    assert len(losses) == 2
+    assert np.all(np.isfinite(losses))
+
+
+@pytest.mark.parametrize(
+    'layerClass, numRnnLayers, targetSeries, exogenousSeries', [
+        (tf.keras.layers.SimpleRNN, 1, rand(60, 2), None),
+        (tf.keras.layers.GRU, 2, rand(60, 2), rand(60, 3)),
+        (tf.keras.layers.LSTM, 2, rand(60, 1), rand(60, 2))
+    ], ids=['simple-rnn', 'gru-exo', 'lstm-exo'])
+def test_streamForecaster(layerClass, numRnnLayers, targetSeries, exogenousSeries):
+    """
+    Test that the streaming forecasts are the same as the forecasts on the
+    whole series, and that the exported states resume the stream
+    """
+
+    numExoVariables = 0 if exogenousSeries is None else exogenousSeries.shape[1]
+
+    model = RnnForecast(
+        forecastHorizon=1,
+        layerClass=layerClass,
+        layerParameters={'units': 8, 'return_sequences': True},
+        numRnnLayers=numRnnLayers,
+        numTargetVariables=targetSeries.shape[1],
+        numExoVariables=numExoVariables
+    )
+
+    def exo(start, end):
+        return None if exogenousSeries is None else exogenousSeries[start:end]
+
+    pred = np.reshape(model.predict(targetSeries, exogenousSeries), targetSeries.shape)
+
+    forecaster = model.getStreamForecaster(targetSeries[:20], exo(0, 20))
+    state = forecaster.getState()
+
+    stepPred = np.array([
+        forecaster.step(targetSeries[i], None if exogenousSeries is None else exogenousSeries[i])
+        for i in range(20, 40)
+    ])
+    extendPred = forecaster.extend(targetSeries[40:], exo(40, None))
+
+    assert np.allclose(np.concatenate([stepPred, extendPred]), pred[20:], atol=1e-5)
+
+    forecaster.setState(state)
+    assert np.allclose(forecaster.extend(targetSeries[20:], exo(20, None)), pred[20:], atol=1e-5)
+
+    forecaster.resetState()
+    assert np.allclose(forecaster.extend(targetSeries, exogenousSeries), pred, atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    'trainSequences, numTargetVariables, numExoVariables, layerClass', [
+        (
+            [rand(length, 2) for length in list(randint(20, 60, size=(10,)))],
+            2, 0, tf.keras.layers.GRU
+        ),
+        (
+            [(rand(length + 1, 1), rand(length, 3))
+             for length in list(randint(20, 60, size=(10,)))],
+            1, 3, tf.keras.layers.LSTM
+        )
+    ], ids=['nonexo-gru', 'exo-lstm'])
+def test_trainBucketed(trainSequences, numTargetVariables, numExoVariables, layerClass):
+    """
+    Test training on padded mini batches of whole sequences, and that the loss
+    of a padded mini batch is the loss over only its timesteps which are not padded
+    """
+
+    model = RnnForecast(
+        forecastHorizon=1,
+        layerClass=layerClass,
+        layerParameters={'units': 8, 'return_sequences': True},
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+
+    losses = model.train(
+        trainSequences,
+        numIterations=2,
+        optimizer=tf.optimizers.Adam(),
+        verboseLevel=0,
+        batchSize=4
+    )
+
+    assert len(losses) == 2
+    assert np.all(np.isfinite(losses))
+
+    bucketedDataSequence = BucketedDataSequence(
+        trainSequences, 1, numTargetVariables, numExoVariables, 4
+    )
+    X, Y, weights = bucketedDataSequence[0]
+
+    squaredErrors = []
+    for i in range(X.shape[0]):
+        length = np.count_nonzero(weights[i])
+        Ypred = model.model.predict(X[i: i + 1, :length], verbose=0)[0]
+        squaredErrors.append(np.mean(np.square(Ypred - Y[i, :length]), axis=1))
+
+    assert np.isclose(
+        model.model.test_on_batch(X, Y, sample_weight=weights),
+        np.mean(np.concatenate(squaredErrors)),
+        rtol=1e-4
+    )
+
+
+@pytest.mark.parametrize(
+    'trainSequences, numTargetVariables, numExoVariables, layerClass, bpttLength', [
+        ([rand(80, 2)], 2, 0, tf.keras.layers.GRU, 100),
+        ([(rand(81, 1), rand(80, 3))], 1, 3, tf.keras.layers.LSTM, 80)
+    ], ids=['nonexo-gru', 'exo-lstm'])
+def test_trainTruncatedSingleChunk(
+    trainSequences, numTargetVariables, numExoVariables, layerClass, bpttLength
+):
+    """
+    Test that truncated training with chunks longer than the sequence is the
+    same as training on the whole sequence
+    """
+
+    models = [RnnForecast(
+        forecastHorizon=1,
+        layerClass=layerClass,
+        layerParameters={'units': 8, 'return_sequences': True},
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    ) for _ in range(2)]
+    models[1].model.set_weights(models[0].model.get_weights())
+
+    models[0].train(
+        trainSequences, numIterations=2, optimizer=tf.optimizers.SGD(0.1), verboseLevel=0
+    )
+    models[1].train(
+        trainSequences, numIterations=2, optimizer=tf.optimizers.SGD(0.1), verboseLevel=0,
+        bpttLength=bpttLength
+    )
+
+    for weights0, weights1 in zip(models[0].model.get_weights(), models[1].model.get_weights()):
+        assert np.allclose(weights0, weights1, atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    'trainSequences, numTargetVariables, numExoVariables, bpttLength', [
+        ([rand(length, 2) for length in list(randint(40, 60, size=(3,)))], 2, 0, 7),
+        ([(rand(length + 1, 1), rand(length, 3))
+          for length in list(randint(40, 60, size=(3,)))], 1, 3, 16)
+    ], ids=['nonexo', 'exo'])
+def test_trainTruncated(trainSequences, numTargetVariables, numExoVariables, bpttLength):
+    """ Test truncated training, and saving the model after every iteration """
+
+    model = RnnForecast(
+        forecastHorizon=1,
+        layerClass=tf.keras.layers.LSTM,
+        layerParameters={'units': 8, 'return_sequences': True},
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+    weightsBefore = model.model.get_weights()
+
+    losses = model.train(
+        trainSequences,
+        numIterations=3,
+        optimizer=tf.optimizers.Adam(),
+        modelSavePath=FILE_PATH,
+        verboseLevel=0,
+        bpttLength=bpttLength
+    )
+
+    assert len(losses) == 3
+    assert np.all(np.isfinite(losses))
+    assert not all(
+        np.array_equal(before, after)
+        for before, after in zip(weightsBefore, model.model.get_weights())
+    )
+
+    loadedModel = RnnForecast.load(FILE_PATH)
+    for weights, loadedWeights in zip(model.model.get_weights(), loadedModel.model.get_weights()):
+        assert np.array_equal(weights, loadedWeights)
+
+    os.remove(FILE_PATH)
+
+
+@pytest.mark.parametrize(
+    'trainSequences, numTargetVariables, numExoVariables, layerParameters, bpttLength', [
+        ([rand(50, 2)], 2, 0, {'units': 8, 'return_sequences': True}, 7),
+        ([(rand(51, 1), rand(50, 3))], 1, 3,
+         {'units': 8, 'return_sequences': True, 'stateful': False}, 16)
+    ], ids=['nonexo', 'exo-stateful-param'])
+def test_trainTruncatedResume(
+    trainSequences, numTargetVariables, numExoVariables, layerParameters, bpttLength
+):
+    """
+    Test that truncated training in successive calls with the same optimizer
+    is the same as truncated training in a single call
+    """
+
+    models = [RnnForecast(
+        forecastHorizon=1,
+        layerClass=tf.keras.layers.GRU,
+        layerParameters=layerParameters,
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    ) for _ in range(2)]
+    models[1].model.set_weights(models[0].model.get_weights())
+
+    models[0].train(
+        trainSequences, numIterations=2, optimizer=tf.optimizers.Adam(), verboseLevel=0,
+        bpttLength=bpttLength
+    )
+
+    optimizer = tf.optimizers.Adam()
+    for _ in range(2):
+        models[1].train(
+            trainSequences, numIterations=1, optimizer=optimizer, verboseLevel=0,
+            bpttLength=bpttLength
+        )
+
+    for weights0, weights1 in zip(models[0].model.get_weights(), models[1].model.get_weights()):
+        assert np.allclose(weights0, weights1, atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    'targetSeriesList, exogenousSeriesList, numTargetVariables, numExoVariables, batchSize', [
+        ([rand(length, 2) for length in list(randint(10, 60, size=(9,)))], None, 2, 0, 4),
+        (
+            [rand(length, 1) for length in [30, 12, 45, 30, 7]],
+            [rand(length, 3) for length in [30, 12, 45, 30, 7]],
+            1, 3, 2
+        ),
+        ([rand(length, 1) for length in list(randint(10, 60, size=(5,)))], None, 1, 0, 64)
+    ], ids=['nonexo', 'exo', 'single-batch'])
+def test_predictBatch(
+    targetSeriesList, exogenousSeriesList, numTargetVariables, numExoVariables, batchSize
+):
+    """ Test that batched prediction is the same as prediction on each series """
+
+    model = RnnForecast(
+        forecastHorizon=1,
+        layerClass=tf.keras.layers.GRU,
+        layerParameters={'units': 8, 'return_sequences': True},
+        numRnnLayers=2,
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+
+    predList = model.predictBatch(targetSeriesList, exogenousSeriesList, batchSize)
+    assert len(predList) == len(targetSeriesList)
+
+    for i, targetSeries in enumerate(targetSeriesList):
+        exogenousSeries = None if exogenousSeriesList is None else exogenousSeriesList[i]
+
+        assert predList[i].shape == targetSeries.shape
+        assert np.allclose(predList[i], model.predict(targetSeries, exogenousSeries), atol=1e-5)
+
+
+@pytest.mark.parametrize('lengths, numTargetVariables, numExoVariables', [
+    ([10, 37, 5, 100], 2, 0),
+    ([20, 8, 64], 1, 3)
+], ids=['nonexo', 'exo'])
+def test_warmUp(lengths, numTargetVariables, numExoVariables):
+    """
+    Test that the inference function of a model loaded with warm up is
+    traced only once, for series of any length
+    """
+
+    model = RnnForecast(
+        forecastHorizon=1,
+        layerClass=tf.keras.layers.GRU,
+        layerParameters={'units': 8, 'return_sequences': True},
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+    model.save(FILE_PATH)
+
+    model = RnnForecast.load(FILE_PATH, warmUp=True)
+    assert model.compiledForward.experimental_get_tracing_count() == 1
+
+    for length in lengths:
+        targetSeries = rand(length + 1, numTargetVariables)
+        exogenousSeries = rand(length, numExoVariables) if numExoVariables > 0 else None
+
+        model.predict(targetSeries[:length], exogenousSeries)
+        model.evaluate(targetSeries, exogenousSeries)
+
+    model.predictBatch([rand(length, numTargetVariables) for length in lengths], [
+        rand(length, numExoVariables) for length in lengths
+    ] if numExoVariables > 0 else None)
+
+    assert model.compiledForward.experimental_get_tracing_count() == 1
+
+    os.remove(FILE_PATH)
+
+
+@pytest.mark.parametrize(
+    'forecastHorizon, numTargetVariables, numExoVariables, historyLength, steps', [
+        (1, 2, 0, 30, 8),
+        (3, 1, 2, 25, 9),
+        (4, 1, 0, 20, 2)
+    ], ids=['nonexo', 'exo-horizon', 'steps-within-horizon'])
+def test_rollout(forecastHorizon, numTargetVariables, numExoVariables, historyLength, steps):
+    """
+    Test that the rollout is the same as repeatedly predicting on the whole
+    history extended by the forecasts
+    """
+
+    model = RnnForecast(
+        forecastHorizon=forecastHorizon,
+        layerClass=tf.keras.layers.LSTM,
+        layerParameters={'units': 8, 'return_sequences': True},
+        numRnnLayers=2,
+        numTargetVariables=numTargetVariables,
+        numExoVariables=numExoVariables
+    )
+
+    targetSeries = rand(historyLength, numTargetVariables)
+    exogenousSeries, futureExogenousSeries = (
+        rand(historyLength, numExoVariables), rand(steps, numExoVariables)
+    ) if numExoVariables > 0 else (None, None)
+
+    rolloutPred = model.rollout(targetSeries, steps, exogenousSeries, futureExogenousSeries)
+    assert rolloutPred.shape == (steps, numTargetVariables)
+
+    for step in range(steps):
+        n = targetSeries.shape[0]
+        pred = np.reshape(model.predict(targetSeries, exogenousSeries), targetSeries.shape)
+        nextTarget = pred[n - forecastHorizon]
+
+        assert np.allclose(rolloutPred[step], nextTarget, atol=1e-5)
+
+        targetSeries = np.concatenate([targetSeries, nextTarget[np.newaxis]])
+        if exogenousSeries is not None:
+            exogenousSeries = np.concatenate(
+                [exogenousSeries, futureExogenousSeries[step: step + 1]]
+            )
+
+    # the cached stateful copy is refreshed with the weights of the model
+    model.model.set_weights([weights + 0.1 for weights in model.model.get_weights()])
+
+    targetSeries = targetSeries[:1 + forecastHorizon]
+    if exogenousSeries is not None:
+        exogenousSeries = exogenousSeries[:1 + forecastHorizon]
+
+    pred = np.reshape(model.predict(targetSeries, exogenousSeries), targetSeries.shape)
+    assert np.allclose(model.rollout(targetSeries, 1, exogenousSeries), pred[1:2], atol=1e-5)
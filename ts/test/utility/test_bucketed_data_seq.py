@@ -0,0 +1,86 @@
+import pytest
+import numpy as np
+from ts.utility import BucketedDataSequence, Utility
+
+
+@pytest.mark.parametrize(
+    'trainSequences, forecastHorizon, numTargetVariables, numExoVariables, batchSize', [
+        (
+            [np.random.uniform(-10, 10, size=(length, 3))
+             for length in list(np.random.randint(20, 100, size=(20,)))],
+            5, 3, 0, 6
+        ),
+        (
+            [(
+                np.random.uniform(-10, 10, size=(length + 4, 2)),
+                np.random.uniform(-10, 10, size=(length, 3))
+            ) for length in list(np.random.randint(20, 100, size=(9,)))],
+            4, 2, 3, 4
+        ),
+        (
+            [np.random.uniform(-10, 10, size=(length, 1))
+             for length in list(np.random.randint(20, 100, size=(5,)))],
+            1, 1, 0, 1
+        )
+    ], ids=['nonexo', 'exo', 'batch-size-1'])
+def test_BucketedDataSequence(
+    trainSequences,
+    forecastHorizon,
+    numTargetVariables,
+    numExoVariables,
+    batchSize
+):
+    """
+    Tests that the mini batches of BucketedDataSequence contain every training
+    sequence exactly once, padded at its end, with the padded timesteps masked
+
+    :param trainSequences: Sequences (List) of data
+    :param forecastHorizon: How much further in the future the model has to
+    predict the target series variable
+    :param numTargetVariables: Number of target variables the model takes as input
+    :param numExoVariables: Number of exogenous variables the model takes as input
+    :param batchSize: Number of sequences in each mini batch
+    """
+
+    bucketedDataSequence = BucketedDataSequence(
+        trainSequences,
+        forecastHorizon,
+        numTargetVariables,
+        numExoVariables,
+        batchSize
+    )
+
+    assert len(bucketedDataSequence) == int(np.ceil(len(trainSequences) / batchSize))
+
+    seen = []
+    previousMaxLength = 0
+    for idx in range(len(bucketedDataSequence)):
+        X, Y, weights = bucketedDataSequence[idx]
+
+        assert X.shape[0] == Y.shape[0] == weights.shape[0] <= batchSize
+        assert X.shape[:2] == Y.shape[:2] == weights.shape
+        assert X.shape[2] == numTargetVariables + numExoVariables
+        assert Y.shape[2] == numTargetVariables
+
+        # buckets are in increasing order of length
+        assert X.shape[1] >= previousMaxLength
+        previousMaxLength = X.shape[1]
+
+        assert np.isclose(weights.mean(), 1.0)
+
+        for i in range(X.shape[0]):
+            length = np.count_nonzero(weights[i])
+            assert np.all(weights[i, length:] == 0)
+            assert np.all(X[i, length:] == 0) and np.all(Y[i, length:] == 0)
+            seen.append((X[i, :length], Y[i, :length]))
+
+    assert len(seen) == len(trainSequences)
+
+    for seq in trainSequences:
+        targetSeries, exogenousSeries = seq if type(seq) is tuple else (seq, None)
+        X, Y = Utility.prepareDataTrain(targetSeries, exogenousSeries, forecastHorizon)
+
+        assert any(
+            Xseen.shape == X.shape and np.array_equal(Xseen, X) and np.array_equal(Yseen, Y)
+            for Xseen, Yseen in seen
+        )
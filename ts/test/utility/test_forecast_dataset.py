@@ -0,0 +1,101 @@
+import pytest
+import numpy as np
+from ts.utility import ForecastDataset, Utility
+
+
+@pytest.mark.parametrize(
+    'trainSequences, forecastHorizon, numTargetVariables, numExoVariables, \
+    windowLength, windowShift, batchSize, flattenWindows', [
+        (
+            [np.random.uniform(-10, 10, size=(length, 3))
+             for length in list(np.random.randint(50, 100, size=(10,)))],
+            5, 3, 0,
+            20, None, 4, False
+        ),
+        (
+            [(
+                np.random.uniform(-10, 10, size=(length + 7, 2)),
+                np.random.uniform(-10, 10, size=(length, 4))
+            ) for length in list(np.random.randint(50, 100, size=(5,)))],
+            7, 2, 4,
+            12, 5, 16, False
+        ),
+        (
+            [np.random.uniform(-10, 10, size=(length, 1))
+             for length in list(np.random.randint(50, 100, size=(6,)))],
+            3, 1, 0,
+            8, 1, 32, True
+        ),
+        (
+            [(
+                np.random.uniform(-10, 10, size=(length + 2, 3)),
+                np.random.uniform(-10, 10, size=(length, 2))
+            ) for length in list(np.random.randint(10, 30, size=(8,)))],
+            2, 3, 2,
+            15, 1, 7, True
+        )
+    ], ids=['nonexo-seq', 'exo-seq', 'nonexo-flat', 'exo-flat'])
+def test_ForecastDataset(
+    trainSequences,
+    forecastHorizon,
+    numTargetVariables,
+    numExoVariables,
+    windowLength,
+    windowShift,
+    batchSize,
+    flattenWindows
+):
+    """
+    Tests that the mini batches of ForecastDataset contain every window of
+    every training sequence exactly once per epoch, with its correct targets
+
+    :param trainSequences: Sequences (List) of data
+    :param forecastHorizon: How much further in the future the model has to
+    predict the target series variable
+    :param numTargetVariables: Number of target variables the model takes as input
+    :param numExoVariables: Number of exogenous variables the model takes as input
+    :param windowLength: Number of timesteps in each window
+    :param windowShift: Number of timesteps between the starts of consecutive windows
+    :param batchSize: Number of windows in each mini batch
+    :param flattenWindows: Whether the windows are flattened
+    """
+
+    forecastDataset = ForecastDataset(
+        trainSequences,
+        forecastHorizon,
+        numTargetVariables,
+        numExoVariables,
+        windowLength,
+        batchSize,
+        windowShift=windowShift,
+        flattenWindows=flattenWindows,
+        seed=0
+    )
+
+    expectedWindows = []
+    for seq in trainSequences:
+        targetSeries, exogenousSeries = seq if type(seq) is tuple else (seq, None)
+        X, Y = Utility.prepareDataTrain(targetSeries, exogenousSeries, forecastHorizon)
+
+        for start in range(0, X.shape[0] - windowLength + 1, windowShift or windowLength):
+            x = X[start: start + windowLength]
+            y = Y[start: start + windowLength]
+            if flattenWindows:
+                expectedWindows.append((x.flatten(), y[-1]))
+            else:
+                expectedWindows.append((x, y))
+
+    batches = list(forecastDataset.getDataset())
+    assert len(batches) == len(forecastDataset)
+
+    windows = []
+    for X, Y in batches:
+        assert X.shape[0] == Y.shape[0] <= batchSize
+        windows += list(zip(X.numpy(), Y.numpy()))
+
+    assert len(windows) == len(expectedWindows)
+
+    def key(window):
+        return tuple(np.concatenate([window[0].flatten(), window[1].flatten()]))
+
+    assert sorted(map(key, windows)) == sorted(map(key, expectedWindows))
@@ -452,3 +452,35 @@ def test_generateMultipleSequence(
 
     for seq in dataSeq:
         assert minSequenceLength <= seq.shape[0] <= maxSequenceLength
+
+
+@pytest.mark.parametrize('data, numClusters', [
+    (np.random.uniform(-1, 1, size=(100, 3)), 5),
+    (np.random.uniform(-1, 1, size=(40, 7)), 40),
+    (np.random.uniform(-1, 1, size=(10, 2)), 15)
+], ids=['few-clusters', 'all-points', 'more-clusters'])
+def test_kMeans(data, numClusters):
+    """
+    Tests the kMeans static method of the Utility class
+
+    :param data: the data points
+    :param numClusters: number of clusters
+    """
+
+    centroids, assignments = Utility.kMeans(data, numClusters)
+    numClusters = min(numClusters, data.shape[0])
+
+    assert centroids.shape == (numClusters, data.shape[1])
+    assert assignments.shape == (data.shape[0],)
+
+    sqDistances = np.sum(
+        np.square(np.expand_dims(data, axis=1) - centroids),
+        axis=2
+    )
+    assert np.allclose(
+        sqDistances[np.arange(data.shape[0]), assignments],
+        np.min(sqDistances, axis=1)
+    )
+
+    if numClusters == data.shape[0]:
+        assert np.allclose(centroids[assignments], data)
@@ -1,5 +1,7 @@
 from ts.utility.utility import Utility
 from ts.utility.forecast_data_seq import ForecastDataSequence
+from ts.utility.bucketed_data_seq import BucketedDataSequence
+from ts.utility.forecast_dataset import ForecastDataset
 from ts.utility.save_callback import SaveCallback
 from ts.utility.dataset_utility import DatasetUtility
 from ts.utility.metric import Metric
@@ -0,0 +1,104 @@
+import numpy as np
+import tensorflow as tf
+from ts.utility.utility import Utility
+
+
+class BucketedDataSequence(tf.keras.utils.Sequence):
+    """
+    Encapsulates training sequences (data) as mini batches of whole sequences
+    of similar length, accepted by tensorflow based recurrent models for training.
+    The sequences of a mini batch are padded at their end to the length of the
+    longest one and the padded timesteps are masked out of the loss
+    """
+
+    def __init__(
+            self,
+            trainSequences,
+            forecastHorizon,
+            numTargetVariables,
+            numExoVariables,
+            batchSize
+    ):
+        """
+        Create BucketedDataSequence instance using the provided data
+
+        :param trainSequences: Sequences (List) of data, each element in the
+        list is a target sequence of shape (n, numTargetVariables) or a tuple
+        containing a target sequence of shape (n + forecastHorizon, numTargetVariables)
+        and an exogenous sequence of shape (n, numExoVariables)
+        :param forecastHorizon: How much further in the future the model has to
+        predict the target series variable
+        :param numTargetVariables: Number of target variables the model takes as input
+        :param numExoVariables: Number of exogenous variables the model takes as input
+        :param batchSize: Number of sequences in each mini batch, the sequences
+        are sorted by their length and consecutive sequences form a mini batch
+        """
+
+        self.trainSequences = trainSequences
+        self.forecastHorizon = forecastHorizon
+        self.numTargetVariables = numTargetVariables
+        self.numExoVariables = numExoVariables
+        self.batchSize = batchSize
+
+        lengths = [
+            (seq[0] if type(seq) is tuple else seq).shape[0] - forecastHorizon
+            for seq in trainSequences
+        ]
+        sortedIndices = np.argsort(lengths, kind='stable')
+
+        self.buckets = [
+            sortedIndices[start: start + batchSize]
+            for start in range(0, len(trainSequences), batchSize)
+        ]
+
+    def __len__(self):
+        """ returns the number of mini batches """
+
+        return len(self.buckets)
+
+    def __getitem__(self, idx):
+        """
+        Get the 'idx' th mini batch as an input-output-weight 3-tuple, the
+        inputs have shape (b, T, numTargetVariables + numExoVariables), the
+        outputs have shape (b, T, numTargetVariables) and the weights have
+        shape (b, T), where b is the number of sequences of the mini batch and
+        T is the length of the longest one. The weights are zero on the padded
+        timesteps and equal elsewhere, such that the loss is the mean over
+        all the timesteps which are not padded
+        """
+
+        XList = []
+        YList = []
+
+        for seqIdx in self.buckets[idx]:
+            if type(self.trainSequences[seqIdx]) is tuple:
+                targetSeries, exogenousSeries = self.trainSequences[seqIdx]
+            else:
+                targetSeries, exogenousSeries = self.trainSequences[seqIdx], None
+
+            assert targetSeries.shape[1] == self.numTargetVariables
+            assert Utility.isExoShapeValid(exogenousSeries, self.numExoVariables)
+
+            X, Y = Utility.prepareDataTrain(
+                targetSeries,
+                exogenousSeries,
+                self.forecastHorizon
+            )
+
+            XList.append(X)
+            YList.append(Y)
+
+        maxLength = max(X.shape[0] for X in XList)
+
+        Xbatch = np.zeros(
+            (len(XList), maxLength, self.numTargetVariables + self.numExoVariables)
+        )
+        Ybatch = np.zeros((len(YList), maxLength, self.numTargetVariables))
+        mask = np.zeros((len(XList), maxLength))
+
+        for i, (X, Y) in enumerate(zip(XList, YList)):
+            Xbatch[i, :X.shape[0]] = X
+            Ybatch[i, :Y.shape[0]] = Y
+            mask[i, :X.shape[0]] = 1.0
+
+        return Xbatch, Ybatch, mask * (mask.size / mask.sum())
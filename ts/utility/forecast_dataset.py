@@ -0,0 +1,150 @@
+import numpy as np
+import tensorflow as tf
+from ts.utility.utility import Utility
+
+
+class ForecastDataset:
+    """
+    Encapsulates training sequences (data) as a tf.data input pipeline which
+    cuts fixed length windows from all the sequences, shuffles them and
+    provides them as mini batches
+    """
+
+    def __init__(
+            self,
+            trainSequences,
+            forecastHorizon,
+            numTargetVariables,
+            numExoVariables,
+            windowLength,
+            batchSize,
+            windowShift=None,
+            shuffleBufferSize=1024,
+            flattenWindows=False,
+            seed=None
+    ):
+        """
+        Create ForecastDataset instance using the provided data
+
+        :param trainSequences: Sequences (List) of data, each element in the
+        list is a target sequence of shape (n, numTargetVariables) or a tuple
+        containing a target sequence of shape (n + forecastHorizon, numTargetVariables)
+        and an exogenous sequence of shape (n, numExoVariables)
+        :param forecastHorizon: How much further in the future the model has to
+        predict the target series variable
+        :param numTargetVariables: Number of target variables the model takes as input
+        :param numExoVariables: Number of exogenous variables the model takes as input
+        :param windowLength: Number of timesteps in each window, windows never
+        span across two sequences, and a sequence which is shorter than the
+        window length provides no windows
+        :param batchSize: Number of windows in each mini batch
+        :param windowShift: Number of timesteps between the starts of consecutive
+        windows of a sequence, if None then it is windowLength, i.e. the windows
+        do not overlap. The timesteps at the end of a sequence which do not fill
+        a whole window are not used
+        :param shuffleBufferSize: Size of the buffer from which the windows are
+        randomly drawn, the windows are reshuffled on every epoch
+        :param flattenWindows: If True, then each window is flattened into a
+        single input vector whose target is the target of the last timestep of
+        the window (as DeepNN expects), else each window is an input sequence
+        whose targets are the targets of all of its timesteps (as recurrent
+        models expect)
+        :param seed: Seed of the shuffling, if None then it is random
+        """
+
+        self.forecastHorizon = forecastHorizon
+        self.numTargetVariables = numTargetVariables
+        self.numExoVariables = numExoVariables
+        self.windowLength = windowLength
+        self.batchSize = batchSize
+        self.windowShift = windowLength if windowShift is None else windowShift
+        self.shuffleBufferSize = shuffleBufferSize
+        self.flattenWindows = flattenWindows
+        self.seed = seed
+
+        self.X, self.Y, self.windowStartTimes = self.prepareWindows(trainSequences)
+
+    def __len__(self):
+        """ returns the number of mini batches in an epoch """
+
+        return int(np.ceil(self.windowStartTimes.shape[0] / self.batchSize))
+
+    def prepareWindows(self, trainSequences):
+        """
+        Prepares the features and targets of all the sequences as single arrays
+        and finds the start of every window in them
+
+        :param trainSequences: Sequences (List) of data, as described in the
+        constructor
+        :return: Features of shape (N, numTargetVariables + numExoVariables), targets
+        of shape (N, numTargetVariables) and window start times of shape (numWindows,),
+        where N is the total number of timesteps of all the sequences
+        """
+
+        XList = []
+        YList = []
+        windowStartTimesList = []
+        offset = 0
+
+        for seq in trainSequences:
+            if type(seq) is tuple:
+                targetSeries, exogenousSeries = seq
+            else:
+                targetSeries, exogenousSeries = seq, None
+
+            assert targetSeries.shape[1] == self.numTargetVariables
+            assert Utility.isExoShapeValid(exogenousSeries, self.numExoVariables)
+
+            X, Y = Utility.prepareDataTrain(
+                targetSeries,
+                exogenousSeries,
+                self.forecastHorizon
+            )
+
+            XList.append(X)
+            YList.append(Y)
+            windowStartTimesList.append(
+                offset + np.arange(0, X.shape[0] - self.windowLength + 1, self.windowShift)
+            )
+
+            offset += X.shape[0]
+
+        windowStartTimes = np.concatenate(windowStartTimesList)
+        assert windowStartTimes.shape[0] > 0
+
+        return np.concatenate(XList), np.concatenate(YList), windowStartTimes
+
+    def getDataset(self):
+        """
+        Builds the input pipeline, every epoch the window start times are
+        shuffled and batched, then the windows of each mini batch are gathered
+        in parallel and prefetched while the model trains on the previous one
+
+        :return: tf.data.Dataset of (X, Y) mini batches, where X has shape
+        (batchSize, windowLength, numTargetVariables + numExoVariables) and Y
+        has shape (batchSize, windowLength, numTargetVariables), or X has shape
+        (batchSize, windowLength * (numTargetVariables + numExoVariables)) and Y
+        has shape (batchSize, numTargetVariables) if flattenWindows is True. The
+        last mini batch of an epoch may be smaller
+        """
+
+        X = tf.constant(self.X)
+        Y = tf.constant(self.Y)
+        windowOffsets = tf.range(self.windowLength, dtype=tf.int64)
+
+        def gatherWindows(windowStartTimes):
+            windowTimes = tf.expand_dims(windowStartTimes, axis=1) + windowOffsets
+            windows = tf.gather(X, windowTimes)
+
+            if not self.flattenWindows:
+                return windows, tf.gather(Y, windowTimes)
+
+            return \
+                tf.reshape(windows, (tf.shape(windows)[0], -1)), \
+                tf.gather(Y, windowStartTimes + self.windowLength - 1)
+
+        return tf.data.Dataset.from_tensor_slices(self.windowStartTimes) \
+            .shuffle(self.shuffleBufferSize, seed=self.seed, reshuffle_each_iteration=True) \
+            .batch(self.batchSize) \
+            .map(gatherWindows, num_parallel_calls=tf.data.experimental.AUTOTUNE) \
+            .prefetch(tf.data.experimental.AUTOTUNE)
@@ -398,3 +398,59 @@ class Utility:
         assert len(timeSeries.shape) == 1
 
         return timeSeries[timeSeries > threshold]
+
+    @staticmethod
+    def kMeans(data, numClusters, numIterations=20):
+        """
+        Cluster the data points using the k-means (Lloyd's) algorithm, the
+        initial centroids are distinct data points chosen at random
+
+        :param data: the data points, it is a numpy array of shape (n, d)
+        :param numClusters: number of clusters, if it is more than n, then
+        n clusters are formed
+        :param numIterations: maximum number of iterations of the algorithm,
+        it stops earlier if the cluster assignments no longer change
+        :return: the centroids of the clusters which is a numpy array of shape
+        (numClusters, d) and the cluster assignment of each data point which
+        is a numpy array of shape (n,). A cluster to which no data point is
+        assigned keeps its previous centroid
+        """
+
+        n = data.shape[0]
+        numClusters = min(numClusters, n)
+
+        centroids = data[np.random.choice(n, size=numClusters, replace=False)]
+        assignments = Utility.assignClusters(data, centroids)
+
+        for _ in range(numIterations):
+            for cluster in range(numClusters):
+                isInCluster = assignments == cluster
+                if np.any(isInCluster):
+                    centroids[cluster] = np.mean(data[isInCluster], axis=0)
+
+            newAssignments = Utility.assignClusters(data, centroids)
+            if np.array_equal(assignments, newAssignments):
+                break
+
+            assignments = newAssignments
+
+        return centroids, assignments
+
+    @staticmethod
+    def assignClusters(data, centroids):
+        """
+        Assign each data point to the cluster with the nearest centroid
+
+        :param data: the data points, it is a numpy array of shape (n, d)
+        :param centroids: the centroids of the clusters, it is a numpy array
+        of shape (numClusters, d)
+        :return: the cluster assignment of each data point which is a numpy
+        array of shape (n,)
+        """
+
+        sqDistances = \
+            np.sum(np.square(data), axis=1, keepdims=True) \
+            - 2. * np.matmul(data, centroids.T) \
+            + np.sum(np.square(centroids), axis=1)
+
+        return np.argmin(sqDistances, axis=1)